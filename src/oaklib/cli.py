@@ -4,6 +4,7 @@ Command Line Interface to OAK
 
 Executed using "runoak" command
 """
+import itertools
 import logging
 import os
 import subprocess
@@ -18,8 +19,11 @@ import rdflib
 from linkml_runtime.dumpers import yaml_dumper, json_dumper
 from oaklib.datamodels.search import create_search_configuration
 from oaklib.datamodels.validation_datamodel import ValidationConfiguration
-from oaklib.implementations.aggregator.aggregator_implementation import AggregatorImplementation
+from oaklib.implementations.aggregator.aggregator_implementation import AggregatorImplementation, load_implementations
 from oaklib.implementations.sqldb.sql_implementation import SqlImplementation
+from oaklib.implementations.lexical.lexical_annotator_implementation import LexicalAnnotatorImplementation
+from oaklib.utilities.batch_annotator import DOCUMENT_FORMATS, DEFAULT_BATCH_SIZE, DEFAULT_CONCURRENCY, \
+    read_documents, annotate_documents, AnnotationWriter
 from oaklib.interfaces import BasicOntologyInterface, OntologyInterface, ValidatorInterface, SubsetterInterface
 from oaklib.interfaces.mapping_provider_interface import MappingProviderInterface
 from oaklib.interfaces.obograph_interface import OboGraphInterface
@@ -35,10 +39,11 @@ from oaklib.types import PRED_CURIE
 from oaklib.utilities.apikey_manager import set_apikey_value
 from oaklib.utilities.iterator_utils import chunk
 from oaklib.utilities.lexical.lexical_indexer import create_lexical_index, save_lexical_index, lexical_index_to_sssom, \
-    load_lexical_index, load_mapping_rules, add_labels_from_uris
-from oaklib.utilities.mapping.sssom_utils import StreamingSssomWriter
+    load_lexical_index, load_mapping_rules, add_labels_from_uris, lexical_index_to_mappings, incremental_lexmatch, \
+    lexical_index_to_fuzzy_mappings
+from oaklib.utilities.lexical.ngram_index import DEFAULT_NGRAM_SIZE
+from oaklib.utilities.mapping.sssom_utils import StreamingSssomWriter, LEXICAL_MAPPING_COLUMNS
 from oaklib.utilities.obograph_utils import draw_graph, graph_to_image, default_stylemap_path, graph_to_tree
-import sssom.writers as sssom_writers
 from oaklib.datamodels.vocabulary import IS_A, PART_OF, EQUIVALENT_CLASS
 from oaklib.utilities.subsets.slimmer_utils import roll_up_to_named_subset
 from oaklib.utilities.taxon.taxon_constraint_utils import get_term_with_taxon_constraints, test_candidate_taxon_constraint, parse_gain_loss_file
@@ -129,20 +134,19 @@ def main(verbose: int, quiet: bool, input: str, add: List):
         logging.basicConfig(level=logging.WARNING)
     if quiet:
         logging.basicConfig(level=logging.ERROR)
-    resource = OntologyResource()
-    resource.slug = input
-
+    resources = []
     if input:
-        impl_class: Type[OntologyInterface]
         resource = get_resource_from_shorthand(input)
-        impl_class = resource.implementation_class
         logging.info(f'RESOURCE={resource}')
-        settings.impl = impl_class(resource)
+        resources.append(resource)
     if add:
-        impls = [get_implementation_from_shorthand(d) for d in add]
-        if settings.impl:
-            impls = [settings.impl] + impls
-        settings.impl = AggregatorImplementation(implementations=impls)
+        # members of an aggregate are loaded concurrently
+        resources += [get_resource_from_shorthand(d) for d in add]
+        settings.impl = AggregatorImplementation(implementations=load_implementations(resources))
+    elif input:
+        impl_class: Type[OntologyInterface]
+        impl_class = resource.implementation_class
+        settings.impl = impl_class(resource)
 
 
 @main.command()
@@ -227,21 +231,75 @@ def list_subset(subset, output: str):
 
 @main.command()
 @click.argument("words", nargs=-1)
+@click.option("--text-file", "-T",
+              type=click.File(mode="r"),
+              help="File of documents to annotate, one per line; use - for stdin")
+@click.option("--text-format",
+              type=click.Choice(DOCUMENT_FORMATS),
+              help="Format of the text file; defaults to jsonl for files ending in .jsonl, otherwise lines")
+@click.option("--text-field",
+              default="text",
+              show_default=True,
+              help="For jsonl, the field holding the text of each document")
+@click.option("--id-field",
+              default="id",
+              show_default=True,
+              help="For jsonl, the field holding the identifier of each document (defaults to the line number)")
+@click.option("--batch-size",
+              type=int,
+              default=DEFAULT_BATCH_SIZE,
+              show_default=True,
+              help="For local annotation, number of documents annotated together")
+@click.option("--processes",
+              type=int,
+              help="For local annotation, number of worker processes")
+@click.option("--concurrency",
+              type=int,
+              default=DEFAULT_CONCURRENCY,
+              show_default=True,
+              help="For remote annotators, maximum number of concurrent requests")
 @output_option
-def annotate(words, output: str):
+@output_type_option
+def annotate(words, text_file, text_format, text_field, id_field, batch_size, processes, concurrency,
+             output: TextIO, output_type: str):
     """
     Annotate a piece of text using a Named Entity Recognition annotation
 
     Example:
         runoak -i bioportal: annotate "enlarged nucleus in T-cells from peripheral blood"
+
+    If the implementation does not provide its own annotator, then the text is annotated locally,
+    using the labels and synonyms of the ontology:
+
+        runoak -i sqlite:go.db annotate "enlarged nucleus in T-cells from peripheral blood"
+
+    To annotate many documents, pass a file with one document per line, either as plain text or
+    as JSON objects (jsonl). Annotations are written as each batch of documents is done:
+
+        runoak -i sqlite:go.db annotate -T abstracts.jsonl --text-field abstract -O tsv -o annotations.tsv
+
+    Output types are yaml (default for words), tsv (default for files), and jsonl.
+    Each annotation includes the identifier of its document
     """
     impl = settings.impl
-    text = ' '.join(words)
-    if isinstance(impl, TextAnnotatorInterface):
-        for ann in impl.annotate_text(text):
-            print(yaml_dumper.dumps(ann))
-    else:
+    if not isinstance(impl, TextAnnotatorInterface) and isinstance(impl, BasicOntologyInterface):
+        impl = LexicalAnnotatorImplementation(wrapped=impl)
+    if not isinstance(impl, TextAnnotatorInterface):
         raise NotImplementedError(f'Cannot execute this using {impl} of type {type(impl)}')
+    if text_file:
+        if words:
+            raise ValueError('Specify either words or a text file, not both')
+        if text_format is None:
+            text_format = 'jsonl' if text_file.name.endswith('.jsonl') else 'lines'
+        documents = read_documents(text_file, format=text_format, text_field=text_field, id_field=id_field)
+        default_output_type = 'tsv'
+    else:
+        documents = [('1', ' '.join(words))]
+        default_output_type = 'yaml'
+    writer = AnnotationWriter(output, format=output_type if output_type else default_output_type)
+    for document_id, anns in annotate_documents(impl, documents, batch_size=batch_size, processes=processes,
+                                                concurrency=concurrency):
+        writer.emit(document_id, anns)
 
 
 @main.command()
@@ -937,7 +995,8 @@ def set_apikey(endpoint, keyval):
 
 @main.command()
 @click.option("--lexical-index-file", "-L",
-              help="path to lexical index. This is recreated each time unless --no-recreate is passed")
+              help="path to lexical index. This is recreated each time unless --no-recreate is passed."
+                   " Saved in a compact binary format if the path ends in .lexindex, otherwise as YAML")
 @click.option("--rules-file", "-R",
               help="path to rules file. Conforms to rules_datamodel.")
 @click.option("--add-labels/--no-add-labels",
@@ -948,8 +1007,32 @@ def set_apikey(endpoint, keyval):
               default=True,
               show_default=True,
               help="if true and lexical index is specified, always recreate, otherwise load from index")
+@click.option("--max-bucket-size",
+              type=int,
+              help="skip index terms shared by more than this many entities")
+@click.option("--source",
+              "-S",
+              multiple=True,
+              help="comma-separated prefixes or URI namespaces forming one source."
+                   " If given two or more times, only mappings between different sources are generated")
+@click.option("--incremental/--no-incremental",
+              default=False,
+              show_default=True,
+              help="update the lexical index in place, and only output mappings that are new since it was saved")
+@click.option("--removed-output",
+              type=click.File(mode="w"),
+              help="with --incremental, output file for mappings that no longer hold")
+@click.option("--fuzzy-threshold",
+              type=float,
+              help="if set, also map entities whose terms have at least this character n-gram similarity (0-1)")
+@click.option("--ngram-size",
+              type=int,
+              default=DEFAULT_NGRAM_SIZE,
+              show_default=True,
+              help="with --fuzzy-threshold, length of the character n-grams compared")
 @output_option
-def lexmatch(output, recreate, rules_file, lexical_index_file, add_labels):
+def lexmatch(output, recreate, rules_file, lexical_index_file, add_labels, max_bucket_size, source, incremental,
+             removed_output, fuzzy_threshold, ngram_size):
     """
     Generates lexical index and mappings
 
@@ -961,8 +1044,24 @@ def lexmatch(output, recreate, rules_file, lexical_index_file, add_labels):
     Outputting intermediate index:
         lexmatch -i foo.obo -L foo.index.yaml -o foo.sssom.tsv
 
+    Reusing a previously saved binary index:
+        lexmatch -i foo.obo -L foo.lexindex --no-recreate -o foo.sssom.tsv
+
     Using custom rules:
         lexmatch -i foo.obo -R match_rules.yaml -L foo.index.yaml -o foo.sssom.tsv
+
+    Mappings are written as they are generated. Terms shared by many entities generate many pairs,
+    and can be skipped:
+        lexmatch -i foo.obo --max-bucket-size 50 -o foo.sssom.tsv
+
+    Only mapping between sources, e.g. MONDO and DOID:
+        lexmatch -i merged.obo -S MONDO -S DOID -o mondo-doid.sssom.tsv
+
+    Re-matching after edits, re-indexing only the entities that changed since foo.lexindex was saved:
+        lexmatch -i foo.obo -L foo.lexindex --incremental -o new.sssom.tsv --removed-output removed.sssom.tsv
+
+    Also finding near-misses, such as typos, as lower-confidence mappings:
+        lexmatch -i foo.obo --fuzzy-threshold 0.8 -o foo.sssom.tsv
     """
     impl = settings.impl
     if rules_file:
@@ -972,15 +1071,47 @@ def lexmatch(output, recreate, rules_file, lexical_index_file, add_labels):
     if isinstance(impl, BasicOntologyInterface):
         if add_labels:
             add_labels_from_uris(impl)
-        if not recreate and Path(lexical_index_file).exists():
+        if source:
+            source_sets = [set(s.split(',')) for s in source]
+        else:
+            source_sets = None
+        writer = StreamingSssomWriter(output, columns=LEXICAL_MAPPING_COLUMNS, mapping_set_id='default',
+                                      license='CC-0')
+        if incremental and fuzzy_threshold is not None:
+            raise ValueError('--fuzzy-threshold cannot be combined with --incremental')
+        if incremental:
+            if not lexical_index_file or not Path(lexical_index_file).exists():
+                raise ValueError('--incremental requires an existing lexical index (-L)')
             ix = load_lexical_index(lexical_index_file)
+            _, mappings, removed_mappings = incremental_lexmatch(impl, ix, ruleset=ruleset,
+                                                                 max_bucket_size=max_bucket_size,
+                                                                 source_sets=source_sets)
+            save_lexical_index(ix, lexical_index_file)
+            if removed_output:
+                removed_writer = StreamingSssomWriter(removed_output, columns=LEXICAL_MAPPING_COLUMNS,
+                                                      mapping_set_id='default', license='CC-0')
+                for mapping in removed_mappings:
+                    removed_writer.emit(mapping)
+                removed_writer.close()
         else:
-            ix = create_lexical_index(impl)
-        if lexical_index_file:
-            if recreate:
-                save_lexical_index(ix, lexical_index_file)
-        msdf = lexical_index_to_sssom(impl, ix, ruleset=ruleset)
-        sssom_writers.write_table(msdf, output)
+            if not recreate and Path(lexical_index_file).exists():
+                ix = load_lexical_index(lexical_index_file)
+            else:
+                ix = create_lexical_index(impl)
+            if lexical_index_file:
+                if recreate:
+                    save_lexical_index(ix, lexical_index_file)
+            mappings = lexical_index_to_mappings(impl, ix, ruleset=ruleset, max_bucket_size=max_bucket_size,
+                                                 source_sets=source_sets)
+            if fuzzy_threshold is not None:
+                fuzzy_mappings = lexical_index_to_fuzzy_mappings(impl, ix, threshold=fuzzy_threshold,
+                                                                 ngram_size=ngram_size,
+                                                                 max_bucket_size=max_bucket_size,
+                                                                 source_sets=source_sets)
+                mappings = itertools.chain(mappings, fuzzy_mappings)
+        for mapping in mappings:
+            writer.emit(mapping)
+        writer.close()
     else:
         raise NotImplementedError(f'Cannot execute this using {impl} of type {type(impl)}')
 
@@ -1,6 +1,11 @@
+import logging
+import queue
+import threading
 from collections import defaultdict
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import List, Iterable, Tuple, Callable, Optional, Any, Dict
+from typing import List, Iterable, Tuple, Callable, Optional, Any, Dict, Iterator, Set
 
 import sssom
 from oaklib.datamodels.obograph import Node
@@ -13,79 +18,327 @@ from oaklib.datamodels.search import SearchConfiguration
 from oaklib.interfaces.validator_interface import ValidatorInterface
 from oaklib.interfaces.rdf_interface import RdfInterface
 from oaklib.interfaces.relation_graph_interface import RelationGraphInterface
+from oaklib.resource import OntologyResource
 from oaklib.types import CURIE, SUBSET_CURIE
 
 
+def load_implementations(resources: List[OntologyResource], max_workers: int = None) -> List[BasicOntologyInterface]:
+    """
+    Instantiates an implementation for each resource, loading them concurrently
+
+    Each resource must have its implementation_class set, e.g. via :func:`get_resource_from_shorthand`.
+
+    Loading is done in a thread pool, so the loaded implementations are shared directly with the caller
+    rather than serialized back from another process (for pronto, unpickling an ontology costs about as much as
+    parsing it). Parsing of obo files is largely done in fastobo, which does not hold the GIL, so
+    an aggregate of several files should load in roughly the time of its largest member.
+
+    :param resources:
+    :param max_workers: maximum number of concurrent loads (defaults to one per resource)
+    :return: implementations, in the same order as resources
+    """
+    if max_workers is None:
+        max_workers = max(len(resources), 1)
+    def _load(resource: OntologyResource) -> BasicOntologyInterface:
+        logging.info(f'Loading {resource.slug} using {resource.implementation_class}')
+        return resource.implementation_class(resource)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_load, resources))
+
+
+
+# marks the end of the results from one member when merging concurrently
+_MEMBER_DONE = object()
+
+# maximum number of results buffered when merging concurrently
+MERGE_QUEUE_SIZE = 1000
+
+# how often a member blocked on a full buffer checks whether the consumer has stopped
+_PUT_POLL_INTERVAL = 0.1
+
+
+def _member_name(impl: BasicOntologyInterface) -> str:
+    slug = impl.resource.slug if impl.resource else None
+    return f'{type(impl).__name__}({slug})'
+
 
 @dataclass
 class AggregatorImplementation(ValidatorInterface, RdfInterface, RelationGraphInterface, OboGraphInterface, SearchInterface, MappingProviderInterface):
     """
+    Wraps multiple implementations, treating them as if they were a single source
+
+    By default members are queried one at a time, in order. If concurrent is set, then all
+    members are queried at the same time in a thread pool; this is useful when some members are remote:
+
+    .. code:: python
+
+        >>> oi = AggregatorImplementation(implementations=[oi1, oi2], concurrent=True, timeout=10)
+
+    In concurrent mode:
+
+    - results from iterator methods are merged in the order they arrive
+    - single-valued lookups (e.g. labels) return the first value to arrive
+    - for single-valued lookups and maps, members that have not finished within timeout seconds of the call
+      are skipped with a warning
+    - for iterator methods, the timeout applies to each result: if no member produces a result for timeout
+      seconds, iteration stops with a warning, and the results from unfinished members are truncated.
+      A large stream from a healthy member is never cut off
+
+    Lookups run in a thread pool, which is shut down by :meth:`close`, or by using the aggregator as a
+    context manager. Each concurrent iteration reads from its members in its own threads, so that lookups made
+    while iterating (e.g. fetching the label of each CURIE) never wait behind members blocked on a full buffer
+
+    If route_by_prefix is set, then lookups for a single CURIE (labels, aliases, outgoing relationships, nodes,
+    mappings) are only sent to members that contain entities with the same prefix as that CURIE:
+
+    .. code:: python
+
+        >>> oi = AggregatorImplementation(implementations=[go_oi, cl_oi, ols_oi], route_by_prefix=True,
+        ...                               member_prefixes=[None, None, ['MONDO', 'HP']])
+
+    The prefixes for each member are taken from member_prefixes if declared, otherwise they are derived
+    from the member's all_entity_curies. Members that cannot enumerate their entities are consulted for all CURIEs,
+    as are all members for a CURIE whose prefix no member claims.
     """
     implementations: List[BasicOntologyInterface] = None
+    concurrent: bool = False
+    max_workers: int = None
+    timeout: float = None
+    deduplicate_curies: bool = False
+    route_by_prefix: bool = False
+    member_prefixes: List[Optional[List[str]]] = None
+    _executor: ThreadPoolExecutor = None
+    _prefix_routes: Dict[str, List[BasicOntologyInterface]] = None
+
+    def _derive_prefixes(self, impl: BasicOntologyInterface) -> Optional[Set[str]]:
+        try:
+            return {curie.split(':')[0] for curie in impl.all_entity_curies() if ':' in curie}
+        except NotImplementedError:
+            logging.info(f'Cannot derive prefixes for {_member_name(impl)}; will route all CURIEs to it')
+            return None
+
+    def prefix_routes(self) -> Dict[str, List[BasicOntologyInterface]]:
+        """
+        Table mapping each prefix to the members that can answer queries for CURIEs with that prefix
+
+        The table is built on first use
+
+        :return: mapping between prefix and members, in member order
+        """
+        if self._prefix_routes is None:
+            member_prefixes = self.member_prefixes
+            if member_prefixes is None:
+                member_prefixes = [None] * len(self.implementations)
+            if len(member_prefixes) != len(self.implementations):
+                raise ValueError('member_prefixes must have one entry per member')
+            prefix_sets = []
+            for impl, declared in zip(self.implementations, member_prefixes):
+                if declared is None:
+                    prefix_sets.append(self._derive_prefixes(impl))
+                else:
+                    prefix_sets.append(set(declared))
+            all_prefixes = set().union(*[ps for ps in prefix_sets if ps is not None])
+            # members with unknown prefixes (None) are included in every route
+            self._prefix_routes = {pfx: [impl for impl, ps in zip(self.implementations, prefix_sets)
+                                         if ps is None or pfx in ps]
+                                   for pfx in all_prefixes}
+            logging.info(f'Built routing table for {len(all_prefixes)} prefixes')
+        return self._prefix_routes
+
+    def _members_for(self, curie: CURIE) -> List[BasicOntologyInterface]:
+        if not self.route_by_prefix or ':' not in curie:
+            return self.implementations
+        return self.prefix_routes().get(curie.split(':')[0], self.implementations)
+
+    def close(self) -> None:
+        """
+        Shuts down the thread pool used in concurrent mode
+
+        The aggregator can still be used afterwards; a new pool is created when needed
 
-    def _delegate_iterator(self, func: Callable) -> Iterable:
-        for i in self.implementations:
-            for v in func(i):
+        :return:
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def __enter__(self) -> "AggregatorImplementation":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            max_workers = self.max_workers if self.max_workers else max(len(self.implementations), 1)
+            self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        return self._executor
+
+    def _delegate_iterator(self, func: Callable, unique=False,
+                           implementations: List[BasicOntologyInterface] = None) -> Iterable:
+        if implementations is None:
+            implementations = self.implementations
+        if self.concurrent:
+            it = self._merge_concurrently(func, implementations)
+        else:
+            it = (v for i in implementations for v in func(i))
+        if unique:
+            seen = set()
+            for v in it:
+                if v not in seen:
+                    seen.add(v)
+                    yield v
+        else:
+            for v in it:
                 yield v
 
-    def _delegate_simple_tuple_map(self, func: Callable, strict=False) -> Dict[Any, List[Any]]:
+    def _merge_concurrently(self, func: Callable, implementations: List[BasicOntologyInterface]) -> Iterator:
+        # bounded, so that members cannot run far ahead of the consumer
+        results = queue.Queue(maxsize=MERGE_QUEUE_SIZE)
+        # set when the consumer stops, for whatever reason; members then stop producing
+        stop = threading.Event()
+
+        def _put(item: tuple) -> bool:
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=_PUT_POLL_INTERVAL)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def _drain(ix: int, impl: BasicOntologyInterface):
+            try:
+                for v in func(impl):
+                    if not _put((ix, v, None)):
+                        return
+            except Exception as e:
+                _put((ix, _MEMBER_DONE, e))
+                return
+            _put((ix, _MEMBER_DONE, None))
+
+        pending = set(range(len(implementations)))
+        # not run in the shared pool: drains block while the buffer is full, and would starve any lookups
+        # the consumer makes while iterating
+        for ix, impl in enumerate(implementations):
+            threading.Thread(target=_drain, args=(ix, impl), name=f'merge-{_member_name(impl)}',
+                             daemon=True).start()
+        try:
+            while pending:
+                try:
+                    ix, v, e = results.get(timeout=self.timeout)
+                except queue.Empty:
+                    for ix in pending:
+                        logging.warning(f'Timed out waiting for {_member_name(implementations[ix])}; '
+                                        f'results from this member are incomplete')
+                    return
+                if v is _MEMBER_DONE:
+                    pending.discard(ix)
+                    if e is not None:
+                        raise e
+                else:
+                    yield v
+        finally:
+            stop.set()
+
+    def _delegate_simple_tuple_map(self, func: Callable, strict=False,
+                                   implementations: List[BasicOntologyInterface] = None) -> Dict[Any, List[Any]]:
+        if implementations is None:
+            implementations = self.implementations
+        if self.concurrent:
+            submitted = [self._pool().submit(func, i) for i in implementations]
+            done, _ = futures.wait(submitted, timeout=self.timeout)
+            results = []
+            for i, future in zip(implementations, submitted):
+                if future in done:
+                    results.append(future.result())
+                else:
+                    logging.warning(f'Timed out waiting for {_member_name(i)}')
+        else:
+            results = [func(i) for i in implementations]
         m = defaultdict(list)
-        for i in self.implementations:
-            for k, vs in func(i).items():
+        for result in results:
+            for k, vs in result.items():
                 m[k] += vs
         return m
 
-
-    def _delegate_first(self, func: Callable, strict=False) -> Optional[Any]:
-        for i in self.implementations:
-            v = func(i)
-            if v is not None:
-                return v
+    def _delegate_first(self, func: Callable, strict=False, accept: Callable = None,
+                        implementations: List[BasicOntologyInterface] = None) -> Optional[Any]:
+        if implementations is None:
+            implementations = self.implementations
+        if accept is None:
+            accept = lambda v: v is not None
+        if self.concurrent:
+            submitted = [self._pool().submit(func, i) for i in implementations]
+            try:
+                for future in futures.as_completed(submitted, timeout=self.timeout):
+                    v = future.result()
+                    if accept(v):
+                        # first wins; do not start any members still queued
+                        for f in submitted:
+                            f.cancel()
+                        return v
+            except futures.TimeoutError:
+                logging.warning(f'Timed out waiting for {len([f for f in submitted if not f.done()])} members')
+        else:
+            for i in implementations:
+                v = func(i)
+                if accept(v):
+                    return v
         if strict:
             raise ValueError(f'No value for {func}')
 
     def basic_search(self, search_term: str, config: SearchConfiguration = None) -> Iterable[CURIE]:
-        return self._delegate_iterator(lambda i: i.basic_search(search_term, config=config))
+        return self._delegate_iterator(lambda i: i.basic_search(search_term, config=config),
+                                       unique=self.deduplicate_curies)
 
     def validate(self, configuration: ValidationConfiguration = None) -> Iterable[ValidationResult]:
         return self._delegate_iterator(lambda i: i.validate())
 
     def all_entity_curies(self) -> Iterable[CURIE]:
-        return self._delegate_iterator(lambda i: i.all_entity_curies())
+        return self._delegate_iterator(lambda i: i.all_entity_curies(),
+                                       unique=self.deduplicate_curies)
 
     def get_simple_mappings_by_curie(self, curie: CURIE) -> Iterable[Tuple[PRED_CURIE, CURIE]]:
-        return self._delegate_iterator(lambda i: i.get_simple_mappings_by_curie(curie))
+        return self._delegate_iterator(lambda i: i.get_simple_mappings_by_curie(curie),
+                                       implementations=self._members_for(curie))
 
     def get_sssom_mappings_by_curie(self, curie: CURIE) -> Iterable[sssom.Mapping]:
-        return self._delegate_iterator(lambda i: i.get_sssom_mappings_by_curie(curie))
+        return self._delegate_iterator(lambda i: i.get_sssom_mappings_by_curie(curie),
+                                       implementations=self._members_for(curie))
 
     def get_label_by_curie(self, curie: CURIE) -> str:
-        return self._delegate_first(lambda i: i.get_label_by_curie(curie))
+        return self._delegate_first(lambda i: i.get_label_by_curie(curie),
+                                    implementations=self._members_for(curie))
 
     def alias_map_by_curie(self, curie: CURIE) -> ALIAS_MAP:
-        return self._delegate_simple_tuple_map(lambda i: i.alias_map_by_curie(curie))
+        return self._delegate_simple_tuple_map(lambda i: i.alias_map_by_curie(curie),
+                                               implementations=self._members_for(curie))
 
     def all_subset_curies(self) -> Iterable[SUBSET_CURIE]:
-        return self._delegate_iterator(lambda i: i.all_subset_curies())
+        return self._delegate_iterator(lambda i: i.all_subset_curies(),
+                                       unique=self.deduplicate_curies)
 
     def curies_by_subset(self, subset: SUBSET_CURIE) -> Iterable[CURIE]:
-        return self._delegate_iterator(lambda i: i.curies_by_subset(subset))
+        return self._delegate_iterator(lambda i: i.curies_by_subset(subset),
+                                       unique=self.deduplicate_curies)
 
     def node(self, curie: CURIE, strict=False) -> Node:
         # TODO: this implementation is ad-hoc
         # return the first node that has a label populated
-        node: Node = None
-        for i in self.implementations:
-            if isinstance(i, OboGraphInterface):
-                node = i.node(curie)
-                if node.lbl:
-                    return node
+        members = [i for i in self._members_for(curie) if isinstance(i, OboGraphInterface)]
+        node = self._delegate_first(lambda i: i.node(curie), accept=lambda n: n is not None and n.lbl,
+                                    implementations=members)
+        if node is None and members:
+            node = Node(id=curie)
         return node
 
     def get_outgoing_relationships_by_curie(self, curie: CURIE) -> RELATIONSHIP_MAP:
-        return self._delegate_simple_tuple_map(lambda i: i.get_outgoing_relationships_by_curie(curie))
+        return self._delegate_simple_tuple_map(lambda i: i.get_outgoing_relationships_by_curie(curie),
+                                               implementations=self._members_for(curie))
 
     def get_incoming_relationships_by_curie(self, curie: CURIE) -> RELATIONSHIP_MAP:
+        # not routed: incoming edges may come from entities in any member
         return self._delegate_simple_tuple_map(lambda i: i.get_incoming_relationships_by_curie(curie))
 
 
@@ -3,7 +3,6 @@ from dataclasses import dataclass, field
 from typing import Any, Dict, Iterable, Iterator, List, Tuple
 from urllib.parse import quote
 
-import requests
 from oaklib.datamodels.text_annotator import TextAnnotation
 from oaklib.interfaces.basic_ontology_interface import PREFIX_MAP
 from oaklib.interfaces.mapping_provider_interface import MappingProviderInterface
@@ -12,7 +11,8 @@ from oaklib.datamodels.search import SearchConfiguration
 from oaklib.interfaces.text_annotator_interface import TextAnnotatorInterface
 from oaklib.types import CURIE
 from oaklib.utilities.apikey_manager import get_apikey_value
-from oaklib.utilities.rate_limiter import check_limit
+from oaklib.utilities.async_http import arequest_json
+from oaklib.utilities.rate_limiter import limited_request
 from sssom import Mapping
 from sssom.sssom_datamodel import MatchTypeEnum
 
@@ -20,6 +20,8 @@ REST_URL = "http://data.bioontology.org"
 
 ANNOTATION = Dict[str, Any]
 
+MAPPINGS_PARAMS = {'display_links': 'false', 'display_context': 'false'}
+
 # See: 
 #   https://www.bioontology.org/wiki/BioPortal_Mappings 
 #   https://github.com/agroportal/project-management/wiki/Mappings
@@ -74,10 +76,9 @@ class BioportalImplementation(TextAnnotatorInterface, SearchInterface, MappingPr
                   'text': text}
         if self.bioportal_api_key is  None:
             self.load_bioportal_api_key()
-        check_limit()
-        r = requests.get(REST_URL + '/annotator',
-                         headers=self._headers(),
-                         params=params)
+        r = limited_request('GET', REST_URL + '/annotator',
+                            headers=self._headers(),
+                            params=params)
         return self.json_to_results(r.json(), text)
 
     def json_to_results(self, json_list: List[Any], text: str) -> Iterator[TextAnnotation]:
@@ -110,47 +111,70 @@ class BioportalImplementation(TextAnnotatorInterface, SearchInterface, MappingPr
     def basic_search(self, search_term: str, config: SearchConfiguration = SearchConfiguration()) -> Iterable[CURIE]:
         if self.bioportal_api_key is  None:
             self.load_bioportal_api_key()
-        check_limit()
-        r = requests.get(REST_URL + '/search',
-                         headers=self._headers(),
-                         params={'q': search_term, 'include': ['prefLabel']})
+        r = limited_request('GET', REST_URL + '/search',
+                            headers=self._headers(),
+                            params={'q': search_term, 'include': 'prefLabel'})
         obj = r.json()
         collection = obj['collection']
         while len(collection) > 0:
-            result = collection[0]
-            curie = self.uri_to_curie(result['@id'])
-            label = result.get('prefLabel', None)
-            self.label_cache[curie] = label
-            logging.debug(f'M: {curie} => {label}')
-            yield curie
+            yield self._search_result_to_curie(collection[0])
             collection = collection[1:]
             if len(collection) == 0:
                 next_page = obj['links']['nextPage']
                 #print(f'NEXT={next_page}')
                 if next_page:
-                    check_limit()
-                    r = requests.get(next_page, headers=self._headers())
+                    r = limited_request('GET', next_page, headers=self._headers())
                     obj = r.json()
                     collection = obj['collection']
 
 
+    async def abasic_search(self, search_term: str, config: SearchConfiguration = None) -> List[CURIE]:
+        if self.bioportal_api_key is None:
+            self.load_bioportal_api_key()
+        obj = await arequest_json('GET', REST_URL + '/search',
+                                  headers=self._headers(),
+                                  params={'q': search_term, 'include': 'prefLabel'})
+        curies = []
+        while True:
+            curies += [self._search_result_to_curie(result) for result in obj['collection']]
+            next_page = obj['links']['nextPage']
+            if not next_page:
+                return curies
+            obj = await arequest_json('GET', next_page, headers=self._headers())
+
+    def _search_result_to_curie(self, result: Dict[str, Any]) -> CURIE:
+        curie = self.uri_to_curie(result['@id'])
+        label = result.get('prefLabel', None)
+        self.label_cache[curie] = label
+        logging.debug(f'M: {curie} => {label}')
+        return curie
+
     # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
     # Implements: MappingProviderInterface
     # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
 
-    def get_sssom_mappings_by_curie(self, curie: CURIE) -> Iterable[Mapping]:
-        if self.bioportal_api_key is  None:
-            self.load_bioportal_api_key()
+    def _mappings_url(self, curie: CURIE) -> str:
         [prefix, _] = curie.split(':', 2)
         class_uri = quote(self.curie_to_uri(curie), safe='')
         # This may return lots of duplicate mappings
         # See: https://github.com/ncbo/ontologies_linked_data/issues/117
-        req_url = f'{REST_URL}/ontologies/{prefix}/classes/{class_uri}/mappings'
-        response = requests.get(req_url, headers=self._headers(), params={'display_links': 'false', 'display_context': 'false'})
+        return f'{REST_URL}/ontologies/{prefix}/classes/{class_uri}/mappings'
+
+    def get_sssom_mappings_by_curie(self, curie: CURIE) -> Iterable[Mapping]:
+        if self.bioportal_api_key is  None:
+            self.load_bioportal_api_key()
+        response = limited_request('GET', self._mappings_url(curie), headers=self._headers(),
+                                   params=MAPPINGS_PARAMS)
         body = response.json()
         for result in body:
             yield self.result_to_mapping(result)
 
+    async def aget_sssom_mappings_by_curie(self, curie: CURIE) -> List[Mapping]:
+        if self.bioportal_api_key is None:
+            self.load_bioportal_api_key()
+        body = await arequest_json('GET', self._mappings_url(curie), headers=self._headers(), params=MAPPINGS_PARAMS)
+        return [self.result_to_mapping(result) for result in body]
+
 
     def result_to_mapping(self, result: Dict[str, Any]) -> Mapping:
         mapping = Mapping(
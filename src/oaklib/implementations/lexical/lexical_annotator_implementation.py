@@ -0,0 +1,88 @@
+import logging
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from oaklib.datamodels.lexical_index import LexicalIndex
+from oaklib.datamodels.text_annotator import TextAnnotation
+from oaklib.interfaces.basic_ontology_interface import BasicOntologyInterface, ALIAS_MAP, PRED_CURIE
+from oaklib.interfaces.text_annotator_interface import TextAnnotatorInterface, TEXT
+from oaklib.types import CURIE
+from oaklib.utilities.lexical.lexical_annotator import LexicalAnnotator, DEFAULT_MIN_LENGTH
+from oaklib.utilities.lexical.lexical_indexer import create_lexical_index
+
+
+@dataclass
+class LexicalAnnotatorImplementation(TextAnnotatorInterface):
+    """
+    Annotates texts locally, using the labels and synonyms of any other implementation
+
+    .. code:: python
+
+        >>> oi = LexicalAnnotatorImplementation(wrapped=ProntoImplementation(resource))
+        >>> for ann in oi.annotate_text('enlarged nucleus in T-cells'):
+        ...     print(ann.object_id, ann.object_label)
+
+    The terms are compiled into a :class:`LexicalAnnotator` on first use, from lexical_index if set,
+    otherwise from a lexical index created from the wrapped implementation. Lookups other than annotation
+    are passed to the wrapped implementation.
+    """
+    wrapped: BasicOntologyInterface = None
+    lexical_index: LexicalIndex = None
+    predicates: List[PRED_CURIE] = None
+    min_length: int = DEFAULT_MIN_LENGTH
+    longest_match_only: bool = False
+    annotator: LexicalAnnotator = None
+
+    def __post_init__(self):
+        if self.resource is None and self.wrapped is not None:
+            self.resource = self.wrapped.resource
+
+    def compiled_annotator(self) -> LexicalAnnotator:
+        """
+        The compiled terms, built on first use
+
+        :return:
+        """
+        if self.annotator is None:
+            lexical_index = self.lexical_index
+            if lexical_index is None:
+                if self.wrapped is None:
+                    raise ValueError('Either a lexical index or a wrapped implementation is required')
+                logging.info(f'Creating lexical index for {self.wrapped}')
+                lexical_index = create_lexical_index(self.wrapped)
+            self.annotator = LexicalAnnotator.from_lexical_index(lexical_index, predicates=self.predicates,
+                                                                 min_length=self.min_length,
+                                                                 longest_match_only=self.longest_match_only)
+        return self.annotator
+
+    # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+    # Implements: BasicOntologyInterface
+    # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def all_entity_curies(self) -> Iterable[CURIE]:
+        return self.wrapped.all_entity_curies()
+
+    def get_label_by_curie(self, curie: CURIE) -> Optional[str]:
+        return self.wrapped.get_label_by_curie(curie)
+
+    def get_labels_for_curies(self, curies: Iterable[CURIE]) -> Iterable[Tuple[CURIE, str]]:
+        return self.wrapped.get_labels_for_curies(curies)
+
+    def alias_map_by_curie(self, curie: CURIE) -> ALIAS_MAP:
+        return self.wrapped.alias_map_by_curie(curie)
+
+    # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+    # Implements: TextAnnotatorInterface
+    # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+    def annotate_text(self, text: TEXT) -> Iterator[TextAnnotation]:
+        return iter(self.compiled_annotator().annotate(text))
+
+    def annotate_texts(self, texts: Iterable[TEXT]) -> Iterator[List[TextAnnotation]]:
+        """
+        Annotates many texts
+
+        :param texts:
+        :return: iterator over the annotations of each text, in the same order as texts
+        """
+        return self.compiled_annotator().annotate_batch(texts)
@@ -1,6 +1,5 @@
 import urllib
 
-import requests
 import logging
 from dataclasses import dataclass, field
 from typing import Any, List, Dict, Union, Iterator, Iterable, Tuple
@@ -16,6 +15,8 @@ from oaklib.interfaces.search_interface import SearchInterface
 from oaklib.datamodels.search import SearchConfiguration
 from oaklib.interfaces.text_annotator_interface import TextAnnotatorInterface
 from oaklib.types import CURIE, PRED_CURIE
+from oaklib.utilities.async_http import arequest_json
+from oaklib.utilities.rate_limiter import limited_request
 from sssom import Mapping
 from sssom.sssom_datamodel import MatchTypeEnum
 from sssom.sssom_document import MappingSetDocument
@@ -69,7 +70,7 @@ class OlsImplementation(TextAnnotatorInterface, SearchInterface, MappingProvider
     # Implements: OboGraphInterface
     # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
 
-    def ancestors(self, start_curies: Union[CURIE, List[CURIE]], predicates: List[PRED_CURIE] = None) -> Iterable[CURIE]:
+    def _ancestors_urls(self, start_curies: Union[CURIE, List[CURIE]], predicates: List[PRED_CURIE] = None) -> List[str]:
         query = 'hierarchicalAncestors'
         if predicates:
             if predicates == [IS_A]:
@@ -78,16 +79,21 @@ class OlsImplementation(TextAnnotatorInterface, SearchInterface, MappingProvider
                 raise NotImplementedError(f'OLS always include {IS_A}, you selected: {predicates}')
         if not isinstance(start_curies, list):
             start_curies = [start_curies]
-        ancs = set()
         ontology = self.focus_ontology
+        urls = []
         for curie in start_curies:
             term_id = self.curie_to_uri(curie)
             # must be double encoded https://www.ebi.ac.uk/ols/docs/api
             term_id_quoted = urllib.parse.quote(term_id, safe='')
             term_id_quoted = urllib.parse.quote(term_id_quoted, safe='')
-            url = f'{self.ols_base_url}{ontology}/terms/{term_id_quoted}/{query}'
+            urls.append(f'{self.ols_base_url}{ontology}/terms/{term_id_quoted}/{query}')
+        return urls
+
+    def ancestors(self, start_curies: Union[CURIE, List[CURIE]], predicates: List[PRED_CURIE] = None) -> Iterable[CURIE]:
+        ancs = set()
+        for url in self._ancestors_urls(start_curies, predicates):
             logging.debug(f'URL={url}')
-            result = requests.get(url)
+            result = limited_request('GET', url)
             obj = result.json()
             if result.status_code == 200 and '_embedded' in obj:
                 ancs.update([x['obo_id'] for x in obj['_embedded']['terms']])
@@ -96,6 +102,19 @@ class OlsImplementation(TextAnnotatorInterface, SearchInterface, MappingProvider
                 ancs = []
         return list(ancs)
 
+    async def aancestors(self, start_curies: Union[CURIE, List[CURIE]],
+                         predicates: List[PRED_CURIE] = None) -> List[CURIE]:
+        ancs = set()
+        for url in self._ancestors_urls(start_curies, predicates):
+            logging.debug(f'URL={url}')
+            obj = await arequest_json('GET', url, raise_for_status=False)
+            if '_embedded' in obj:
+                ancs.update([x['obo_id'] for x in obj['_embedded']['terms']])
+            else:
+                logging.debug(f'No ancestors for {url} (maybe ontology not indexed in OLS?)')
+                return []
+        return list(ancs)
+
     # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
     # Implements: SearchInterface
     # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
@@ -108,11 +127,16 @@ class OlsImplementation(TextAnnotatorInterface, SearchInterface, MappingProvider
     # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
 
     def get_sssom_mappings_by_curie(self, curie: Union[str, CURIE]) -> Iterator[Mapping]:
-        result = requests.get(self.base_url, params=dict(fromId=curie))
+        result = limited_request('GET', self.base_url, params=dict(fromId=curie))
         obj = result.json()
         container = load_oxo_payload(obj)
         return self.convert_payload(container)
 
+    async def aget_sssom_mappings_by_curie(self, curie: Union[str, CURIE]) -> List[Mapping]:
+        obj = await arequest_json('GET', self.base_url, params=dict(fromId=curie))
+        container = load_oxo_payload(obj)
+        return list(self.convert_payload(container))
+
     def convert_payload(self, container: oxo.Container) -> Iterator[Mapping]:
         oxo_mappings = container._embedded.mappings
         mappings: Mapping = []
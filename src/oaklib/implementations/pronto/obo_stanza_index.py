@@ -0,0 +1,212 @@
+"""
+OBO Stanza Index
+----------------
+
+Byte-offset index over the stanzas of an OBO format file, allowing individual
+stanzas to be parsed on demand rather than materializing the whole ontology.
+
+This is used by :class:`.ProntoImplementation` when a resource is loaded lazily
+"""
+import io
+import logging
+import mmap
+import os
+import re
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Tuple, Iterable, Optional, Set, List, Union
+
+import pronto
+from oaklib.types import CURIE
+from pronto import Ontology
+
+STANZA_RE = re.compile(rb'^\[(Term|Typedef|Instance)\][ \t]*\r?$', re.MULTILINE)
+ID_RE = re.compile(rb'^id:[ \t]*(\S+)', re.MULTILINE)
+QUALIFIER_RE = re.compile(r'\{.*\}')
+
+# tags whose values reference other entities; these must be resolvable
+# when a stanza is parsed in isolation
+REFERENCE_TAGS = {'is_a', 'relationship', 'intersection_of', 'union_of', 'disjoint_from', 'equivalent_to',
+                  'inverse_of', 'transitive_over', 'holds_over_chain', 'equivalent_to_chain', 'disjoint_over',
+                  'domain', 'range'}
+
+OFFSETS = Tuple[int, int]
+
+
+def _stanza_references(stanza: bytes) -> Set[CURIE]:
+    refs = set()
+    for line in stanza.decode('utf-8').splitlines():
+        if ':' not in line:
+            continue
+        tag, val = line.split(':', 1)
+        if tag.strip() not in REFERENCE_TAGS:
+            continue
+        val = QUALIFIER_RE.sub('', val.split(' !')[0])
+        refs.update(val.split())
+    return refs
+
+
+@dataclass
+class OboStanzaIndex:
+    """
+    An index of the byte offsets of each stanza in an OBO file
+
+    The file is scanned once when the index is created; stanzas are then parsed with pronto
+    on demand from a memory-mapped view of the file, and parsed entities are cached.
+
+    .. code:: python
+
+        >>> index = OboStanzaIndex.from_path('ncbitaxon.obo')
+        >>> index.entity('NCBITaxon:9606').name
+        'Homo sapiens'
+    """
+    path: Union[str, Path] = None
+    header: bytes = None
+    term_offsets: Dict[CURIE, OFFSETS] = field(default_factory=lambda: {})
+    typedef_offsets: Dict[CURIE, OFFSETS] = field(default_factory=lambda: {})
+    cache_size: int = 10000
+    _mmap: mmap.mmap = None
+    _typedef_ontology: Ontology = None
+    _relationships: Dict[CURIE, pronto.Relationship] = None
+    _cache: OrderedDict = field(default_factory=lambda: OrderedDict())
+
+    @classmethod
+    def from_path(cls, path: Union[str, Path], **kwargs) -> "OboStanzaIndex":
+        """
+        Scans an OBO file recording the location of each stanza
+
+        :param path:
+        :param kwargs:
+        :return:
+        """
+        index = OboStanzaIndex(path=path, **kwargs)
+        index.build()
+        return index
+
+    def build(self) -> None:
+        with open(self.path, 'rb') as stream:
+            if os.fstat(stream.fileno()).st_size == 0:
+                # empty files cannot be memory-mapped
+                self._mmap = b''
+            else:
+                self._mmap = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        mm = self._mmap
+        starts: List[Tuple[int, bytes]] = [(m.start(), m.group(1)) for m in STANZA_RE.finditer(mm)]
+        self.header = mm[0:starts[0][0]] if starts else mm[:]
+        for i, (start, stanza_type) in enumerate(starts):
+            end = starts[i + 1][0] if i + 1 < len(starts) else len(mm)
+            m = ID_RE.search(mm, start, end)
+            if m is None:
+                logging.warning(f'Stanza with no id at byte {start} in {self.path}')
+                continue
+            curie = m.group(1).decode('utf-8')
+            if stanza_type == b'Typedef':
+                self.typedef_offsets[curie] = start, end
+            else:
+                self.term_offsets[curie] = start, end
+        logging.info(f'Indexed {len(self.term_offsets)} terms and {len(self.typedef_offsets)} typedefs in {self.path}')
+
+    def close(self) -> None:
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+        self._mmap = None
+
+    def stanza(self, curie: CURIE) -> Optional[bytes]:
+        """
+        Raw text of the stanza for a term or typedef
+
+        :param curie:
+        :return: stanza bytes, or None if not in the file
+        """
+        offsets = self.term_offsets.get(curie, self.typedef_offsets.get(curie, None))
+        if offsets is None:
+            return None
+        start, end = offsets
+        return self._mmap[start:end]
+
+    def term_curies(self) -> Iterable[CURIE]:
+        return iter(self.term_offsets.keys())
+
+    def typedef_curies(self) -> Iterable[CURIE]:
+        return iter(self.typedef_offsets.keys())
+
+    def typedef_ontology(self) -> Ontology:
+        """
+        An ontology consisting of the header plus all Typedef stanzas
+
+        Typedefs are typically few in number, so these are parsed eagerly on first use
+
+        :return:
+        """
+        if self._typedef_ontology is None:
+            self._typedef_ontology = self._parse_fragment(list(self.typedef_offsets.keys()))
+            relationships = {}
+            for r in self._typedef_ontology.relationships():
+                relationships.setdefault(r.id, r)
+                # pronto gives relations shorthand IDs for RO and BFO; see ProntoImplementation._entity
+                for x in r.xrefs:
+                    if x.id.startswith('RO:') or x.id.startswith('BFO:'):
+                        relationships.setdefault(x.id, r)
+            self._relationships = relationships
+        return self._typedef_ontology
+
+    def relationship(self, curie: CURIE) -> Optional[pronto.Relationship]:
+        """
+        Lookup a typedef by CURIE, or, for RO and BFO, by xref
+
+        The lookup table is built once, when the typedefs are first parsed
+
+        :param curie:
+        :return:
+        """
+        if not self.typedef_offsets:
+            return None
+        if self._relationships is None:
+            self.typedef_ontology()
+        return self._relationships.get(curie, None)
+
+    def entity(self, curie: CURIE) -> Optional[Union[pronto.Term, pronto.Relationship]]:
+        """
+        Lookup a pronto entity by CURIE, parsing its stanza if required
+
+        :param curie:
+        :return: pronto Term or Relationship, or None if not present
+        """
+        r = self.relationship(curie)
+        if r is not None:
+            return r
+        if curie not in self.term_offsets:
+            return None
+        cache = self._cache
+        if curie in cache:
+            cache.move_to_end(curie)
+            return cache[curie]
+        stanza = self.stanza(curie)
+        typedef_refs = [ref for ref in _stanza_references(stanza) if ref in self.typedef_offsets]
+        t = self._parse_fragment([curie] + typedef_refs)[curie]
+        cache[curie] = t
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return t
+
+    def _parse_fragment(self, curies: List[CURIE]) -> Ontology:
+        """
+        Parses the header plus a selection of stanzas as a standalone ontology
+
+        Any entity referenced from the selected stanzas is added as an empty stub, so that pronto
+        can resolve the reference without the rest of the file being parsed
+
+        :param curies: stanzas to include in full
+        :return:
+        """
+        stanzas = [self.stanza(curie) for curie in curies]
+        refs = set()
+        for stanza in stanzas:
+            refs.update(_stanza_references(stanza))
+        stubs = []
+        for ref in sorted(refs.difference(curies)):
+            stanza_type = 'Typedef' if ref in self.typedef_offsets else 'Term'
+            stubs.append(f'[{stanza_type}]\nid: {ref}\n\n'.encode('utf-8'))
+        doc = b'\n'.join([self.header] + stanzas + stubs)
+        return Ontology(io.BytesIO(doc))
@@ -8,7 +8,7 @@ import sssom
 from deprecated import deprecated
 from oaklib.datamodels.search_datamodel import SearchProperty, SearchTermSyntax
 from oaklib.interfaces.basic_ontology_interface import RELATIONSHIP_MAP, PRED_CURIE, ALIAS_MAP, \
-    METADATA_MAP, PREFIX_MAP
+    METADATA_MAP, PREFIX_MAP, RELATIONSHIP
 from oaklib.interfaces.mapping_provider_interface import MappingProviderInterface
 from oaklib.interfaces.obograph_interface import OboGraphInterface
 from oaklib.interfaces.search_interface import SearchInterface
@@ -16,6 +16,7 @@ from oaklib.datamodels.search import SearchConfiguration
 from oaklib.interfaces.validator_interface import ValidatorInterface
 from oaklib.interfaces.rdf_interface import RdfInterface
 from oaklib.interfaces.relation_graph_interface import RelationGraphInterface
+from oaklib.implementations.pronto.obo_stanza_index import OboStanzaIndex
 from oaklib.resource import OntologyResource
 from oaklib.types import CURIE, SUBSET_CURIE
 from oaklib.datamodels import obograph
@@ -48,6 +49,17 @@ class ProntoImplementation(ValidatorInterface, RdfInterface, RelationGraphInterf
         >>> resource = OntologyResource(local=False, slug='go.obo'))
         >>> oi = ProntoImplementation.create(resource)
 
+    Large local obo files can be loaded lazily; the file is scanned once to index the location of each
+    stanza, and terms are only parsed when they are looked up:
+
+    .. code:: python
+
+        >>> resource = OntologyResource(slug='ncbitaxon.obo', directory='input', local=True, lazy=True)
+        >>> oi = ProntoImplementation(resource)
+
+    Operations that need to visit every term (e.g. search, subsets, incoming relationships) will
+    parse the whole file on first use
+
     Currently this implementation implements most of the BaseOntologyInterface
 
     .. code:: python
@@ -61,6 +73,7 @@ class ProntoImplementation(ValidatorInterface, RdfInterface, RelationGraphInterf
 
     """
     wrapped_ontology: Ontology = None
+    obo_index: OboStanzaIndex = None
 
     def __post_init__(self):
         if self.wrapped_ontology is None:
@@ -68,11 +81,29 @@ class ProntoImplementation(ValidatorInterface, RdfInterface, RelationGraphInterf
             if resource is None:
                 ontology = Ontology()
             elif resource.local:
+                if resource.lazy:
+                    if resource.format == 'obo' or str(resource.local_path).endswith('.obo'):
+                        self.obo_index = OboStanzaIndex.from_path(resource.local_path)
+                        return
+                    logging.warning(f'Lazy loading only supported for obo format; loading all of {resource.slug}')
                 ontology = Ontology(str(resource.local_path))
             else:
                 ontology = Ontology.from_obo_library(resource.slug)
             self.wrapped_ontology = ontology
 
+    def _ontology(self) -> Ontology:
+        """
+        The wrapped pronto ontology, fully parsing the file first if it was loaded lazily
+
+        :return:
+        """
+        if self.wrapped_ontology is None:
+            logging.info(f'Parsing all of {self.resource.local_path}')
+            self.wrapped_ontology = Ontology(str(self.resource.local_path))
+            self.obo_index.close()
+            self.obo_index = None
+        return self.wrapped_ontology
+
     @classmethod
     @deprecated('old style')
     def create(cls, resource: OntologyResource = None) -> "ProntoImplementation":
@@ -81,7 +112,7 @@ class ProntoImplementation(ValidatorInterface, RdfInterface, RelationGraphInterf
     def store(self, resource: OntologyResource = None) -> None:
         if resource is None:
             resource = self.resource
-        ontology = self.wrapped_ontology
+        ontology = self._ontology()
         if resource.local:
             with open(str(resource.local_path), 'wb') as f:
                 ontology.dump(f, format=resource.format)
@@ -96,6 +127,8 @@ class ProntoImplementation(ValidatorInterface, RdfInterface, RelationGraphInterf
         return {}
 
     def _entity(self, curie: CURIE):
+        if self.wrapped_ontology is None:
+            return self.obo_index.entity(curie)
         for r in self.wrapped_ontology.relationships():
             # see https://owlcollab.github.io/oboformat/doc/obo-syntax.html#4.4.1
             # pronto gives relations shorthand IDs for RO and BFO, as it is providing
@@ -111,18 +144,26 @@ class ProntoImplementation(ValidatorInterface, RdfInterface, RelationGraphInterf
             return None
 
     def _create(self, curie: CURIE, exist_ok = True):
-        if curie in self.wrapped_ontology:
-            return self.wrapped_ontology[curie]
+        ontology = self._ontology()
+        if curie in ontology:
+            return ontology[curie]
         else:
-            return self.wrapped_ontology.create_term(curie)
+            return ontology.create_term(curie)
 
     def _create_pred(self, curie: CURIE, exist_ok = True):
-        if curie in self.wrapped_ontology:
-            return self.wrapped_ontology[curie]
+        ontology = self._ontology()
+        if curie in ontology:
+            return ontology[curie]
         else:
-            return self.wrapped_ontology.create_relationship(curie)
+            return ontology.create_relationship(curie)
 
     def all_entity_curies(self) -> Iterable[CURIE]:
+        if self.wrapped_ontology is None:
+            yield from self.obo_index.term_curies()
+            yield from self.obo_index.typedef_curies()
+            for t in self.obo_index.typedef_ontology().synonym_types():
+                yield t.id
+            return
         for t in self.wrapped_ontology.terms():
             yield t.id
         # note what Pronto calls "relationship" is actually "relationship type"
@@ -133,13 +174,13 @@ class ProntoImplementation(ValidatorInterface, RdfInterface, RelationGraphInterf
 
     def all_subset_curies(self) -> Iterable[CURIE]:
         subsets = set()
-        for t in self.wrapped_ontology.terms():
+        for t in self._ontology().terms():
             subsets.update(t.subsets)
         for subset in subsets:
             yield subset
 
     def curies_by_subset(self, subset: SUBSET_CURIE) -> Iterable[CURIE]:
-        for t in self.wrapped_ontology.terms():
+        for t in self._ontology().terms():
             if subset in t.subsets:
                 yield t.id
 
@@ -154,6 +195,7 @@ class ProntoImplementation(ValidatorInterface, RdfInterface, RelationGraphInterf
                 return None
 
     def set_label_for_curie(self, curie: CURIE, label: str) -> bool:
+        self._ontology()
         t = self._entity(curie)
         if t:
             curr = t.name
@@ -164,7 +206,7 @@ class ProntoImplementation(ValidatorInterface, RdfInterface, RelationGraphInterf
                 return False
 
     def get_curies_by_label(self, label: str) -> List[CURIE]:
-        return [t.id for t in self.wrapped_ontology.terms() if t.name == label]
+        return [t.id for t in self._ontology().terms() if t.name == label]
 
     def _get_pronto_relationship_type_curie(self, rel_type: pronto.Relationship) -> CURIE:
         for x in rel_type.xrefs:
@@ -186,7 +228,23 @@ class ProntoImplementation(ValidatorInterface, RdfInterface, RelationGraphInterf
             rels = {}
         return rels
 
+    def all_relationships(self) -> Iterable[RELATIONSHIP]:
+        # single pass over all terms; avoids a lookup per term via get_outgoing_relationships_by_curie
+        ontology = self._ontology()
+        pred_map = {r.id: self._get_pronto_relationship_type_curie(r) for r in ontology.relationships()}
+        for term in ontology.terms():
+            curie = term.id
+            for p in term.superclasses(distance=1, with_self=False):
+                yield curie, IS_A, p.id
+            for rel_type, parents in term.relationships.items():
+                pred = pred_map.get(rel_type.id, None)
+                if pred is None:
+                    pred = self._get_pronto_relationship_type_curie(rel_type)
+                for p in parents:
+                    yield curie, pred, p.id
+
     def get_incoming_relationships_by_curie(self, curie: CURIE, isa_only: bool = False) -> RELATIONSHIP_MAP:
+        self._ontology()
         term = self._entity(curie)
         if isinstance(term, Term):
             # only "Terms" in pronto have relationships
@@ -207,7 +265,7 @@ class ProntoImplementation(ValidatorInterface, RdfInterface, RelationGraphInterf
 
 
     def create_entity(self, curie: CURIE, label: str = None, relationships: RELATIONSHIP_MAP = None) -> CURIE:
-        ont = self.wrapped_ontology
+        ont = self._ontology()
         t = ont.create_term(curie)
         t.name = label
         for pred, fillers in relationships.items():
@@ -216,6 +274,7 @@ class ProntoImplementation(ValidatorInterface, RdfInterface, RelationGraphInterf
         return curie
 
     def add_relationship(self, curie: CURIE, predicate: PRED_CURIE, filler: CURIE):
+        self._ontology()
         t = self._entity(curie)
         filler_term = self._create(filler)
         if predicate == IS_A:
@@ -354,7 +413,7 @@ class ProntoImplementation(ValidatorInterface, RdfInterface, RelationGraphInterf
             mfunc = lambda label: search_term in str(label)
         else:
             mfunc = lambda label: label == search_term
-        for t in self.wrapped_ontology.terms():
+        for t in self._ontology().terms():
             if t.name and mfunc(t.name):
                 matches.append(t.id)
                 logging.info(f'Name match to {t.id}')
@@ -0,0 +1,108 @@
+"""
+Local SPARQL Graphs
+-------------------
+
+Loads ontology files into in-process rdflib graphs, and evaluates SPARQL queries over them,
+returning results in the same form as a remote endpoint.
+
+Parsing a large OWL file can take minutes. If a store directory is given, the parsed graph is saved there
+as a snapshot, and later runs load the snapshot instead of re-parsing the file. A snapshot is only
+used while the file it was made from is unchanged (same path, size and modification time)
+"""
+import hashlib
+import logging
+import os
+import pickle
+from pathlib import Path
+from typing import Iterator, List, Optional, Union
+
+import rdflib
+from rdflib import URIRef, BNode, Literal
+
+SNAPSHOT_SUFFIX = '.rdflib.pickle'
+
+# oaklib resource formats that rdflib knows by another name
+RDFLIB_FORMATS = {'owl': 'xml', 'rdfxml': 'xml', 'ttl': 'turtle'}
+
+
+def _snapshot_path(path: Path, store_directory: Path) -> Path:
+    stat = path.stat()
+    fingerprint = f'{path.resolve()}|{stat.st_size}|{stat.st_mtime_ns}|{rdflib.__version__}'
+    digest = hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()[0:16]
+    return store_directory / f'{path.name}.{digest}{SNAPSHOT_SUFFIX}'
+
+
+def load_graph(path: Union[str, Path], format: str = None,
+               store_directory: Optional[Union[str, Path]] = None) -> rdflib.Graph:
+    """
+    Parses a file into an rdflib graph, using a saved snapshot if there is one
+
+    .. note::
+
+       snapshots are pickled; only use a store directory that you trust
+
+    :param path: file to parse
+    :param format: rdflib format (guessed from the file extension by default)
+    :param store_directory: directory in which parsed graphs are saved (no snapshots are used if not set)
+    :return: graph
+    """
+    path = Path(path)
+    snapshot = None
+    if store_directory is not None:
+        store_directory = Path(store_directory).expanduser()
+        snapshot = _snapshot_path(path, store_directory)
+        if snapshot.exists():
+            logging.info(f'Loading {path} from {snapshot}')
+            with open(snapshot, 'rb') as stream:
+                return pickle.load(stream)
+    logging.info(f'Parsing {path}')
+    graph = rdflib.Graph()
+    graph.parse(str(path), format=RDFLIB_FORMATS.get(format, format))
+    if snapshot is not None:
+        store_directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = snapshot.with_suffix('.tmp')
+        with open(tmp_path, 'wb') as stream:
+            pickle.dump(graph, stream, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, snapshot)
+        logging.info(f'Saved {path} to {snapshot}')
+    return graph
+
+
+def _binding(v) -> dict:
+    if isinstance(v, URIRef):
+        return {'type': 'uri', 'value': str(v)}
+    elif isinstance(v, BNode):
+        return {'type': 'bnode', 'value': str(v)}
+    elif isinstance(v, Literal):
+        b = {'type': 'literal', 'value': str(v)}
+        if v.language:
+            b['xml:lang'] = v.language
+        if v.datatype:
+            b['datatype'] = str(v.datatype)
+        return b
+    else:
+        raise ValueError(f'Unexpected value in query result: {v}')
+
+
+def iter_query_graph(graph: rdflib.Graph, query: str) -> Iterator[dict]:
+    """
+    Evaluates a SELECT query over a graph
+
+    :param graph:
+    :param query: SPARQL query string
+    :return: iterator over bindings, as in the SPARQL JSON results format
+    """
+    result = graph.query(query)
+    for row in result:
+        yield {str(var): _binding(v) for var, v in zip(result.vars, row) if v is not None}
+
+
+def query_graph(graph: rdflib.Graph, query: str) -> List[dict]:
+    """
+    As :func:`iter_query_graph`, returning a list
+
+    :param graph:
+    :param query: SPARQL query string
+    :return: bindings
+    """
+    return list(iter_query_graph(graph, query))
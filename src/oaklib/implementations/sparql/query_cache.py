@@ -0,0 +1,193 @@
+"""
+SPARQL Query Cache
+------------------
+
+Caches the results of queries made by :class:`.SparqlImplementation` and its subclasses,
+so that repeated queries (e.g. the same label lookup during graph construction) are not re-sent
+to the endpoint.
+
+Results are keyed by endpoint URL, named graph, and the query text (with whitespace normalized)
+"""
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Tuple, Any, Union, List
+
+from appdirs import user_cache_dir
+
+from oaklib.datamodels.vocabulary import APP_NAME
+from oaklib.types import URI
+
+CACHE_KEY = Tuple[Optional[URI], Optional[URI], str]
+BINDINGS = List[dict]
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+DISK_CACHE_FILE_NAME = 'sparql-cache.db'
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalizes a query string such that trivially different forms of the same query share a cache entry
+
+    :param query:
+    :return:
+    """
+    return WHITESPACE_RE.sub(' ', query).strip()
+
+
+def cache_key(endpoint: Optional[URI], graph: Optional[URI], query: str) -> CACHE_KEY:
+    return endpoint, graph, normalize_query(query)
+
+
+def _copy_bindings(bindings: BINDINGS) -> BINDINGS:
+    # bindings map each variable to a dict describing its value; both levels are copied,
+    # so that callers cannot modify cached results
+    return [{var: dict(v) for var, v in binding.items()} for binding in bindings]
+
+
+@dataclass
+class SparqlQueryCache:
+    """
+    A two-tier cache for SPARQL query results
+
+    The first tier is an in-memory LRU cache holding up to max_size results. If a directory is set,
+    results are also written to a sqlite database in that directory, where they persist across processes.
+    In both tiers, results expire once they are older than ttl seconds:
+
+    .. code:: python
+
+        >>> cache = SparqlQueryCache(directory='~/.cache/oaklib', ttl=24 * 60 * 60)
+        >>> oi = UbergraphImplementation(query_cache=cache)
+
+    A cache can be shared between implementations; keys include the endpoint, so different endpoints
+    do not collide
+    """
+    max_size: int = 10000
+    directory: Union[str, Path] = None
+    ttl: float = None
+    hits: int = 0
+    misses: int = 0
+    _memory: OrderedDict = field(default_factory=lambda: OrderedDict())
+    _lock: Any = field(default_factory=lambda: threading.RLock())
+    _connection: sqlite3.Connection = None
+
+    def get(self, key: CACHE_KEY) -> Optional[BINDINGS]:
+        """
+        Lookup a query result
+
+        :param key: (endpoint, graph, query) tuple, see :func:`cache_key`
+        :return: a copy of the cached bindings, or None if not cached or expired
+        """
+        with self._lock:
+            if key in self._memory:
+                created, bindings = self._memory[key]
+                if self._expired(created):
+                    del self._memory[key]
+                else:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return _copy_bindings(bindings)
+            if self.directory is not None:
+                entry = self._disk_get(key)
+                if entry is not None:
+                    created, bindings = entry
+                    self._memory_put(key, bindings, created)
+                    self.hits += 1
+                    return _copy_bindings(bindings)
+            self.misses += 1
+            return None
+
+    def put(self, key: CACHE_KEY, bindings: BINDINGS) -> None:
+        """
+        Store a query result
+
+        :param key: (endpoint, graph, query) tuple, see :func:`cache_key`
+        :param bindings:
+        :return:
+        """
+        with self._lock:
+            self._memory_put(key, _copy_bindings(bindings), time.time())
+            if self.directory is not None:
+                self._disk_put(key, bindings)
+
+    def clear(self) -> None:
+        """
+        Removes all entries from both tiers
+        """
+        with self._lock:
+            self._memory.clear()
+            conn = self._disk() if self.directory is not None else None
+            if conn is not None:
+                conn.execute('DELETE FROM query_result')
+                conn.commit()
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def _memory_put(self, key: CACHE_KEY, bindings: BINDINGS, created: float) -> None:
+        self._memory[key] = created, bindings
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+    def _disk(self) -> Optional[sqlite3.Connection]:
+        if self._connection is None:
+            directory = Path(self.directory).expanduser()
+            path = directory / DISK_CACHE_FILE_NAME
+            try:
+                directory.mkdir(parents=True, exist_ok=True)
+                logging.info(f'Using SPARQL query cache in {path}')
+                self._connection = sqlite3.connect(str(path), check_same_thread=False)
+                self._connection.execute('CREATE TABLE IF NOT EXISTS query_result '
+                                         '(key TEXT PRIMARY KEY, created REAL, bindings TEXT)')
+            except (OSError, sqlite3.Error) as e:
+                logging.warning(f'Cannot use {path} ({e}); caching in memory only')
+                self.directory = None
+                self._connection = None
+        return self._connection
+
+    @staticmethod
+    def _disk_key(key: CACHE_KEY) -> str:
+        return hashlib.sha256(json.dumps(list(key)).encode('utf-8')).hexdigest()
+
+    def _disk_get(self, key: CACHE_KEY) -> Optional[Tuple[float, BINDINGS]]:
+        conn = self._disk()
+        if conn is None:
+            return None
+        row = conn.execute('SELECT created, bindings FROM query_result WHERE key = ?',
+                           (self._disk_key(key),)).fetchone()
+        if row is None:
+            return None
+        created, bindings = row
+        if self._expired(created):
+            logging.debug(f'Expired cache entry for {key}')
+            return None
+        return created, json.loads(bindings)
+
+    def _disk_put(self, key: CACHE_KEY, bindings: BINDINGS) -> None:
+        conn = self._disk()
+        if conn is None:
+            return
+        conn.execute('INSERT OR REPLACE INTO query_result VALUES (?, ?, ?)',
+                     (self._disk_key(key), time.time(), json.dumps(bindings)))
+        conn.commit()
+
+
+# shared by all SPARQL implementations unless a cache is passed explicitly; bounded, so that a long-running
+# process neither grows without limit nor serves results from an endpoint that has since been updated
+DEFAULT_QUERY_CACHE_MAX_SIZE = 1000
+DEFAULT_QUERY_CACHE_TTL = 60 * 60
+DEFAULT_QUERY_CACHE = SparqlQueryCache(max_size=DEFAULT_QUERY_CACHE_MAX_SIZE, ttl=DEFAULT_QUERY_CACHE_TTL)
+
+# results of slow queries over slowly changing data, such as the list of named graphs, persist here between runs
+DEFAULT_CACHE_DIRECTORY = user_cache_dir(APP_NAME)
+NAMED_GRAPHS_TTL = 7 * 24 * 60 * 60
+DEFAULT_NAMED_GRAPH_CACHE = SparqlQueryCache(max_size=100, directory=DEFAULT_CACHE_DIRECTORY, ttl=NAMED_GRAPHS_TTL)
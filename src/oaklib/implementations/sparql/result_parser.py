@@ -0,0 +1,164 @@
+"""
+Streaming SPARQL Result Parsers
+-------------------------------
+
+Parse SPARQL SELECT results incrementally, yielding each binding as soon as it has been received,
+so that large result sets can be processed in constant memory.
+
+Both parsers take an iterable of chunks (bytes or str), such as :meth:`requests.Response.iter_content`,
+and yield bindings in the form used by the
+`SPARQL 1.1 JSON results format <https://www.w3.org/TR/sparql11-results-json/>`_:
+
+.. code:: python
+
+    >>> for binding in iter_json_bindings(response.iter_content(65536)):
+    ...     print(binding['s']['value'])
+"""
+import codecs
+import json
+import re
+from typing import Iterable, Iterator, Union, Dict, List
+
+BINDING = Dict[str, Dict[str, str]]
+CHUNK = Union[bytes, str]
+
+SPARQL_RESULTS_JSON = 'application/sparql-results+json'
+SPARQL_RESULTS_TSV = 'text/tab-separated-values'
+
+XSD = 'http://www.w3.org/2001/XMLSchema#'
+
+_BINDINGS_START_RE = re.compile(r'"bindings"\s*:\s*\[')
+_SEPARATOR_RE = re.compile(r'[\s,]*')
+# enough to hold the start of the bindings array, should it be split between chunks
+_MAX_KEY_LENGTH = 64
+
+_LITERAL_RE = re.compile(r'^"(.*)"(?:@([A-Za-z0-9-]+)|\^\^<([^>]*)>)?$', re.DOTALL)
+_ESCAPE_RE = re.compile(r'\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)')
+_ESCAPES = {'t': '\t', 'n': '\n', 'r': '\r', 'b': '\b', 'f': '\f', '"': '"', "'": "'", '\\': '\\'}
+_INTEGER_RE = re.compile(r'^[+-]?\d+$')
+_DECIMAL_RE = re.compile(r'^[+-]?\d*\.\d+$')
+
+
+def _text(chunks: Iterable[CHUNK]) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    for chunk in chunks:
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk)
+        if chunk:
+            yield chunk
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def iter_json_bindings(chunks: Iterable[CHUNK]) -> Iterator[BINDING]:
+    """
+    Parses SPARQL JSON results incrementally
+
+    :param chunks: the response body, in pieces
+    :return: iterator over bindings
+    """
+    decoder = json.JSONDecoder()
+    text = _text(chunks)
+    buf = ''
+    for chunk in text:
+        buf += chunk
+        m = _BINDINGS_START_RE.search(buf)
+        if m:
+            buf = buf[m.end():]
+            break
+        buf = buf[-_MAX_KEY_LENGTH:]
+    else:
+        raise ValueError('No bindings found in SPARQL results')
+    pos = 0
+    while True:
+        pos = _SEPARATOR_RE.match(buf, pos).end()
+        if pos < len(buf):
+            if buf[pos] == ']':
+                return
+            try:
+                binding, pos = decoder.raw_decode(buf, pos)
+                yield binding
+                continue
+            except json.JSONDecodeError:
+                # binding is incomplete; read more
+                pass
+        chunk = next(text, None)
+        if chunk is None:
+            raise ValueError('SPARQL results ended unexpectedly')
+        buf = buf[pos:] + chunk
+        pos = 0
+
+
+def _unescape(s: str) -> str:
+    def _replace(m: re.Match) -> str:
+        c = m.group(1)
+        if c[0] in 'uU' and len(c) > 1:
+            return chr(int(c[1:], 16))
+        return _ESCAPES.get(c, c)
+    return _ESCAPE_RE.sub(_replace, s)
+
+
+def parse_tsv_term(term: str) -> Dict[str, str]:
+    """
+    Parses an RDF term, as serialized in SPARQL TSV results
+
+    :param term: e.g. ``<http://purl.obolibrary.org/obo/GO_0005634>`` or ``"nucleus"@en``
+    :return: term in SPARQL JSON form
+    """
+    if term.startswith('<') and term.endswith('>'):
+        return {'type': 'uri', 'value': term[1:-1]}
+    if term.startswith('_:'):
+        return {'type': 'bnode', 'value': term[2:]}
+    m = _LITERAL_RE.match(term)
+    if m:
+        v = {'type': 'literal', 'value': _unescape(m.group(1))}
+        if m.group(2):
+            v['xml:lang'] = m.group(2)
+        elif m.group(3):
+            v['datatype'] = m.group(3)
+        return v
+    # abbreviated literals
+    if term in ('true', 'false'):
+        datatype = 'boolean'
+    elif _INTEGER_RE.match(term):
+        datatype = 'integer'
+    elif _DECIMAL_RE.match(term):
+        datatype = 'decimal'
+    else:
+        datatype = 'double'
+    return {'type': 'literal', 'value': term, 'datatype': f'{XSD}{datatype}'}
+
+
+def _lines(text: Iterable[str]) -> Iterator[str]:
+    buf = ''
+    for chunk in text:
+        buf += chunk
+        lines = buf.split('\n')
+        buf = lines.pop()
+        for line in lines:
+            yield line.rstrip('\r')
+    if buf:
+        yield buf.rstrip('\r')
+
+
+def iter_tsv_bindings(chunks: Iterable[CHUNK]) -> Iterator[BINDING]:
+    """
+    Parses SPARQL TSV results incrementally
+
+    :param chunks: the response body, in pieces
+    :return: iterator over bindings, as for :func:`iter_json_bindings`
+    """
+    lines = _lines(_text(chunks))
+    header = next(lines, None)
+    if header is None:
+        raise ValueError('No header found in SPARQL results')
+    variables: List[str] = [v.lstrip('?$') for v in header.split('\t')]
+    for line in lines:
+        if not line:
+            continue
+        binding = {}
+        for var, term in zip(variables, line.split('\t')):
+            if term:
+                binding[var] = parse_tsv_term(term)
+        yield binding
@@ -1,32 +1,61 @@
+import asyncio
+import copy
 import logging
+import threading
 from collections import defaultdict
 from dataclasses import dataclass, field
-from typing import List, Iterable, Tuple, Optional, Union, Iterator
+from pathlib import Path
+from typing import List, Iterable, Tuple, Optional, Union, Iterator, Set
 
 import SPARQLWrapper
 import rdflib
 import sssom
 from SPARQLWrapper import JSON
+from oaklib.datamodels import obograph
 from oaklib.datamodels.search_datamodel import SearchTermSyntax
+from oaklib.implementations.sparql.local_graph import load_graph, query_graph, iter_query_graph
+from oaklib.implementations.sparql.query_cache import SparqlQueryCache, DEFAULT_QUERY_CACHE, cache_key, \
+    DEFAULT_NAMED_GRAPH_CACHE
 from oaklib.implementations.sparql.sparql_query import SparqlQuery
+from oaklib.implementations.sparql.sparql_transport import SparqlHttpTransport
 from oaklib.interfaces.basic_ontology_interface import RELATIONSHIP_MAP, PRED_CURIE, ALIAS_MAP, \
-    PREFIX_MAP
+    PREFIX_MAP, RELATIONSHIP
 from oaklib.interfaces.rdf_interface import TRIPLE, RdfInterface
 from oaklib.datamodels.search import SearchConfiguration, search_properties_to_predicates
 from oaklib.resource import OntologyResource
 from oaklib.types import CURIE, URI
 from oaklib.datamodels.vocabulary import IS_A, HAS_DEFINITION_URI, LABEL_PREDICATE, OBO_PURL, ALL_MATCH_PREDICATES, \
     DEFAULT_PREFIX_MAP, SYNONYM_PREDICATES
+from oaklib.utilities.iterator_utils import chunk_to_lists
 from oaklib.utilities.rate_limiter import check_limit
-from rdflib import URIRef, RDFS, Literal, BNode
+from rdflib import URIRef, RDFS, OWL, Literal, BNode
 from sssom.sssom_datamodel import MatchTypeEnum
 
 VAL_VAR = 'v'
+NAMED_GRAPHS_QUERY = 'SELECT DISTINCT ?g WHERE { GRAPH ?g { ?s ?p ?o }}'
+CLOSURE_PREFIX_MAP = {'rdfs': str(RDFS), 'owl': str(OWL)}
 LANGUAGE_TAG = str
 
 def _sparql_values(var_name: str, vals: List[str]):
     return f'VALUES ?{var_name} {{ {" ".join(vals)} }}'
 
+def _walk(relationships: List[RELATIONSHIP], start_curies: List[CURIE], up=True) -> Set[CURIE]:
+    # nodes reachable from start_curies, following relationships upwards (or downwards)
+    succ = defaultdict(list)
+    for s, _, o in relationships:
+        if up:
+            succ[s].append(o)
+        else:
+            succ[o].append(s)
+    reached = set(start_curies)
+    stack = list(start_curies)
+    while stack:
+        for n in succ[stack.pop()]:
+            if n not in reached:
+                reached.add(n)
+                stack.append(n)
+    return reached
+
 def _as_rdf_obj(v) -> URIRef:
     val = v['value']
     if v['type'] == 'uri':
@@ -47,30 +76,76 @@ class SparqlImplementation(RdfInterface):
 
     - :class:`.OntobeeImplementation`
     - :class:`.UbergraphImplementation`
+
+    Query results are cached in memory; the cache is shared between all instances by default, and holds up to
+    1000 results for up to an hour.
+    To also cache results on disk, or to disable caching, pass a :class:`.SparqlQueryCache` or None as query_cache
+
+    Queries to remote endpoints are sent using a :class:`.SparqlHttpTransport`, which reuses connections
+    between queries. If a sparql_wrapper is passed in without a transport, then the wrapper is used instead
+
+    The async methods (e.g. aget_label_by_curie) send the same queries without blocking, sharing the
+    same cache and rate limit as their blocking counterparts:
+
+    .. code:: python
+
+        >>> async with client_session():
+        ...     labels = await asyncio.gather(*[oi.aget_label_by_curie(curie) for curie in curies])
+
+    Wrapping concurrent calls in :func:`.client_session` lets them share connections
+
+    If the resource is local, the file is loaded into an in-process rdflib graph and queries are evaluated
+    over it, with no network access. To avoid re-parsing large files on every run, set graph_store_directory:
+
+    .. code:: python
+
+        >>> oi = SparqlImplementation(OntologyResource('go.owl', local=True), graph_store_directory='~/.cache/oaklib')
+
+    Ancestors and descendants are fetched in a single query using property paths over rdfs:subClassOf
+    and existential restrictions, rather than by walking the graph one node at a time
     """
     sparql_wrapper: SPARQLWrapper = None
+    transport: SparqlHttpTransport = None
     graph: rdflib.Graph = None
     multilingual: bool = None
     preferred_language: LANGUAGE_TAG = field(default_factory=lambda: "en")
+    query_cache: Optional[SparqlQueryCache] = field(default_factory=lambda: DEFAULT_QUERY_CACHE)
+    values_chunk_size: int = 200
+    graph_store_directory: Optional[Union[str, Path]] = None
+    named_graph_cache: Optional[SparqlQueryCache] = field(default_factory=lambda: DEFAULT_NAMED_GRAPH_CACHE)
     _list_of_named_graphs: List[str] = None
+    _namespaces: List[Tuple[URI, str]] = None
+    _thread_local: threading.local = field(default_factory=lambda: threading.local())
 
     def __post_init__(self):
-        if self.sparql_wrapper is None:
+        if self.sparql_wrapper is None and self.graph is None:
             resource = self.resource
             if resource is None:
                 resource = OntologyResource()
-            if resource.url is None:
-                resource.url = self._default_url()
             if resource.local:
-                self.graph = rdflib.Graph()
-                self.graph.parse(resource.local_path)
+                self.graph = load_graph(resource.local_path, format=resource.format,
+                                        store_directory=self.graph_store_directory)
             else:
+                if resource.url is None:
+                    resource.url = self._default_url()
                 self.sparql_wrapper = SPARQLWrapper.SPARQLWrapper(resource.url)
+                if self.transport is None:
+                    self.transport = SparqlHttpTransport.for_endpoint(resource.url)
 
     @property
     def named_graph(self) -> Optional[str]:
         return None
 
+    @property
+    def follows_subclass_axioms(self) -> bool:
+        """
+        True if relationships are read from rdfs:subClassOf axioms, which closure queries follow with property paths
+
+        Backends that model relationships differently override this along with :meth:`ancestors` and
+        :meth:`descendants`; their descendant graphs are then built from :meth:`_direct_relationships`
+        """
+        return True
+
     def _default_url(self) -> str:
         raise NotImplementedError
 
@@ -104,44 +179,142 @@ class SparqlImplementation(RdfInterface):
 
     def uri_to_curie(self, uri: URI, strict=True) -> Optional[CURIE]:
         # TODO: do not hardcode OBO
-        pm = self.get_prefix_map()
-        for k, v in pm.items():
-            if uri.startswith(v):
-                return uri.replace(v, f'{k}:')
+        if self._namespaces is None:
+            # longest first, so that the most specific namespace wins; for small prefix maps such as the default,
+            # a scan is faster than any index
+            self._namespaces = sorted(((v, k) for k, v in self.get_prefix_map().items()), key=lambda t: -len(t[0]))
+        for namespace, prefix in self._namespaces:
+            if uri.startswith(namespace):
+                return f'{prefix}:{uri[len(namespace):]}'
         if uri.startswith(OBO_PURL):
             uri = uri.replace(OBO_PURL, "")
             return uri.replace('_', ':')
         return uri
 
     def list_of_named_graphs(self) -> List[URI]:
-        if self._list_of_named_graphs:
+        """
+        All named graphs in the endpoint
+
+        Listing graphs requires a scan of the whole endpoint, so the list is kept in the named_graph_cache,
+        which by default persists between runs in the user cache directory for a week
+
+        :return: graph URIs
+        """
+        if self._list_of_named_graphs is not None:
             return self._list_of_named_graphs
-        query = "select DISTINCT ?g WHERE { GRAPH ?g { ?s ?p ?o }}"
-        sw = self.sparql_wrapper
-        sw.setQuery(query)
-        sw.setReturnFormat(JSON)
-        check_limit()
-        ret = sw.queryAndConvert()
-        logging.info(f'RET={ret}')
-        self._list_of_named_graphs = [row['g']['value'] for row in ret["results"]["bindings"]]
+        if self.graph is not None and not isinstance(self.graph, rdflib.ConjunctiveGraph):
+            # a plain rdflib graph has no named graphs, and cannot evaluate queries over them
+            return []
+        cache = self.named_graph_cache if self.graph is None else None
+        bindings = None
+        if cache is not None:
+            key = cache_key(self._endpoint_url(), None, NAMED_GRAPHS_QUERY)
+            bindings = cache.get(key)
+        if bindings is None:
+            bindings = self._execute_query(NAMED_GRAPHS_QUERY)
+            if cache is not None:
+                cache.put(key, bindings)
+        self._list_of_named_graphs = [row['g']['value'] for row in bindings]
         return self._list_of_named_graphs
 
-    def _query(self, query: Union[str, SparqlQuery], prefixes: PREFIX_MAP = {}):
+    def _prepare_query(self, query: Union[str, SparqlQuery], prefixes: PREFIX_MAP) -> Tuple[Optional[URI], str]:
         ng = self.named_graph
         if isinstance(query, SparqlQuery) and ng:
             query.graph = ng
         if isinstance(query, SparqlQuery):
             query = query.query_str()
-        sw = self.sparql_wrapper
         for k, v in prefixes.items():
             query = f'PREFIX {k}: <{v}>\n' + query
-        logging.info(f'QUERY={query} // sw={sw}')
-        sw.setQuery(query)
-        sw.setReturnFormat(JSON)
-        check_limit()
-        ret = sw.queryAndConvert()
-        logging.info(f'RET={ret}')
-        return ret["results"]["bindings"]
+        return ng, query
+
+    def _query(self, query: Union[str, SparqlQuery], prefixes: PREFIX_MAP = {}):
+        ng, query = self._prepare_query(query, prefixes)
+        cache = self.query_cache if self.graph is None else None
+        if cache is not None:
+            key = cache_key(self._endpoint_url(), ng, query)
+            bindings = cache.get(key)
+            if bindings is not None:
+                logging.debug(f'Cached result for QUERY={query}')
+                return bindings
+        bindings = self._execute_query(query)
+        if cache is not None:
+            cache.put(key, bindings)
+        return bindings
+
+    async def _aquery(self, query: Union[str, SparqlQuery], prefixes: PREFIX_MAP = {}):
+        # as _query, without blocking the event loop
+        ng, query = self._prepare_query(query, prefixes)
+        cache = self.query_cache if self.graph is None else None
+        if cache is not None:
+            key = cache_key(self._endpoint_url(), ng, query)
+            bindings = cache.get(key)
+            if bindings is not None:
+                logging.debug(f'Cached result for QUERY={query}')
+                return bindings
+        if self.transport is not None:
+            logging.info(f'QUERY={query} // endpoint={self.transport.endpoint}')
+            ret = await self.transport.aquery(query)
+            bindings = ret["results"]["bindings"]
+        else:
+            bindings = await asyncio.to_thread(self._execute_query, query)
+        if cache is not None:
+            cache.put(key, bindings)
+        return bindings
+
+    def _endpoint_url(self) -> Optional[URI]:
+        if self.graph is not None:
+            return None
+        if self.transport is not None:
+            return self.transport.endpoint
+        return self.sparql_wrapper.endpoint
+
+    def _thread_sparql_wrapper(self) -> SPARQLWrapper:
+        # a SPARQLWrapper holds the current query as state, so each thread gets its own copy
+        if threading.current_thread() is threading.main_thread():
+            return self.sparql_wrapper
+        sw = getattr(self._thread_local, 'sparql_wrapper', None)
+        if sw is None:
+            sw = copy.copy(self.sparql_wrapper)
+            self._thread_local.sparql_wrapper = sw
+        return sw
+
+    def _execute_query(self, query: str) -> List[dict]:
+        if self.graph is not None:
+            logging.info(f'QUERY={query} // local graph')
+            return query_graph(self.graph, query)
+        if self.transport is not None:
+            logging.info(f'QUERY={query} // endpoint={self.transport.endpoint}')
+            ret = self.transport.query(query)
+        else:
+            sw = self._thread_sparql_wrapper()
+            logging.info(f'QUERY={query} // sw={sw}')
+            sw.setQuery(query)
+            sw.setReturnFormat(JSON)
+            check_limit(sw.endpoint)
+            ret = sw.queryAndConvert()
+        bindings = ret["results"]["bindings"]
+        logging.debug(f'Got {len(bindings)} bindings')
+        return bindings
+
+    def _iter_query(self, query: Union[str, SparqlQuery], prefixes: PREFIX_MAP = {}) -> Iterator[dict]:
+        """
+        As _query, but yields bindings as they arrive from the endpoint, without caching
+
+        Use this for queries with results too large to hold in memory
+
+        :param query:
+        :param prefixes:
+        :return: iterator over bindings
+        """
+        _, query = self._prepare_query(query, prefixes)
+        if self.graph is not None:
+            logging.info(f'QUERY={query} // local graph')
+            yield from iter_query_graph(self.graph, query)
+        elif self.transport is not None:
+            logging.info(f'QUERY={query} // endpoint={self.transport.endpoint} (streaming)')
+            yield from self.transport.iter_query(query)
+        else:
+            yield from self._execute_query(query)
 
     def _triples(self, subject: CURIE = None, predicate: PRED_CURIE = None, object: PRED_CURIE = None, graph: CURIE = None) -> Iterable[Tuple]:
         vars = []
@@ -160,7 +333,7 @@ class SparqlImplementation(RdfInterface):
         else:
             graph_uri = _urify_arg(graph, 'g')
         vars_str = ' '.join([f'?{v}' for v in vars])
-        bindings = self._query(f"SELECT DISTINCT {vars_str} WHERE {{ GRAPH {graph_uri} {{ {subject_uri} {predicate_uri} {object_uri} }}}}")
+        bindings = self._iter_query(f"SELECT DISTINCT {vars_str} WHERE {{ GRAPH {graph_uri} {{ {subject_uri} {predicate_uri} {object_uri} }}}}")
         for row in bindings:
             yield tuple([row[v]['value'] for v in vars])
 
@@ -187,20 +360,25 @@ class SparqlImplementation(RdfInterface):
                 rels[pred].append(obj)
         return rels
 
-    def _get_anns(self, curie: CURIE, pred: Union[URIRef, CURIE]):
+    def _anns_query(self, curie: CURIE, pred: Union[URIRef, CURIE]) -> SparqlQuery:
         uri = self.curie_to_sparql(curie)
         pred = self.curie_to_sparql(pred)
         query = SparqlQuery(select=['?v'],
                             where=[f'{uri} {pred} ?v'])
         if self.multilingual:
             query.where.append(f'FILTER (LANG(?v) = "{self.preferred_language}")')
+        return query
+
+    def _get_anns(self, curie: CURIE, pred: Union[URIRef, CURIE]):
         #bindings = self._query(f"SELECT ?{VAL_VAR} WHERE {{ <{uri}> <{pred}> ?v }}")
-        #print(query.query_str())
-        bindings = self._query(query)
+        bindings = self._query(self._anns_query(curie, pred))
         return list(set([row[VAL_VAR]['value'] for row in bindings]))
 
-    def get_label_by_curie(self, curie: CURIE):
-        labels = self._get_anns(curie, RDFS.label)
+    async def _aget_anns(self, curie: CURIE, pred: Union[URIRef, CURIE]):
+        bindings = await self._aquery(self._anns_query(curie, pred))
+        return list(set([row[VAL_VAR]['value'] for row in bindings]))
+
+    def _single_label(self, curie: CURIE, labels: List[str]) -> Optional[str]:
         if labels:
             if len(labels) > 1:
                 logging.warning(f'Multiple labels for {curie} = {labels}')
@@ -208,28 +386,91 @@ class SparqlImplementation(RdfInterface):
         else:
             return None
 
+    def get_label_by_curie(self, curie: CURIE):
+        return self._single_label(curie, self._get_anns(curie, RDFS.label))
+
+    async def aget_label_by_curie(self, curie: CURIE) -> Optional[str]:
+        return self._single_label(curie, await self._aget_anns(curie, RDFS.label))
+
+
+    def get_annotations_for_curies(self, curies: Iterable[CURIE],
+                                   predicates: List[Union[URIRef, PRED_CURIE]]) -> Iterator[Tuple[CURIE, PRED_CURIE, str]]:
+        """
+        Retrieves annotation values for multiple entities at once
+
+        Entities are queried in chunks of values_chunk_size using a VALUES block, and results are
+        yielded as each chunk completes
+
+        :param curies: entities to retrieve annotations for
+        :param predicates: annotation properties, e.g. rdfs:label
+        :return: iterator over (entity, predicate, value) tuples
+        """
+        for curie, pred_uri, v in self._annotation_rows(curies, predicates):
+            yield curie, self.uri_to_curie(pred_uri), v
+
+    def _annotation_rows(self, curies: Iterable[CURIE],
+                         predicates: List[Union[URIRef, PRED_CURIE]]) -> Iterator[Tuple[CURIE, URI, str]]:
+        # as get_annotations_for_curies, with predicates left as URIs
+        pred_uris = [self.curie_to_sparql(pred) for pred in predicates]
+        for curie_chunk in chunk_to_lists(curies, self.values_chunk_size):
+            uri_map = {self.curie_to_uri(curie): curie for curie in curie_chunk}
+            query = SparqlQuery(select=['?s', '?p', '?v'],
+                                where=['?s ?p ?v',
+                                       _sparql_values('s', [f'<{uri}>' for uri in uri_map.keys()]),
+                                       _sparql_values('p', pred_uris)])
+            if self.multilingual:
+                query.where.append(f'FILTER (LANG(?v) = "{self.preferred_language}")')
+            for row in self._query(query):
+                s_uri = row['s']['value']
+                yield uri_map.get(s_uri, self.uri_to_curie(s_uri)), row['p']['value'], row['v']['value']
 
     def get_labels_for_curies(self, curies: Iterable[CURIE]) -> Iterable[Tuple[CURIE, str]]:
-        uri_map = {self.curie_to_uri(curie): curie for curie in curies}
-        uris = [f'<{uri}>' for uri in uri_map.keys()]
-        query = SparqlQuery(select=['?s ?label'],
-                            where=[f'?s <{RDFS.label}> ?label',
-                                   _sparql_values('s', uris)])
-        if self.multilingual:
-            query.where.append(f'FILTER (LANG(?label) = "{self.preferred_language}")')
-        bindings = self._query(query)
-        label_map = {}
-        for row in bindings:
-            curie, label = self.uri_to_curie(row['s']['value']), row['label']['value']
-            if curie in label_map:
-                if label_map[curie] != label:
-                    logging.warning(f'Multiple labels for {curie} = {label_map[curie]} != {label}')
-            else:
-                label_map[curie] = label
-                yield curie, label
-        for curie in curies:
-            if curie not in label_map:
-                yield curie, None
+        for curie_chunk in chunk_to_lists(curies, self.values_chunk_size):
+            label_map = {}
+            for curie, _, label in self.get_annotations_for_curies(curie_chunk, [RDFS.label]):
+                if curie in label_map:
+                    if label_map[curie] != label:
+                        logging.warning(f'Multiple labels for {curie} = {label_map[curie]} != {label}')
+                else:
+                    label_map[curie] = label
+                    yield curie, label
+            for curie in curie_chunk:
+                if curie not in label_map:
+                    yield curie, None
+
+    def get_definitions_for_curies(self, curies: Iterable[CURIE]) -> Iterable[Tuple[CURIE, Optional[str]]]:
+        """
+        Retrieves definitions for multiple entities at once
+
+        :param curies:
+        :return: iterator over (entity, definition) pairs, with None for entities without a definition
+        """
+        for curie_chunk in chunk_to_lists(curies, self.values_chunk_size):
+            defn_map = {}
+            for curie, _, defn in self.get_annotations_for_curies(curie_chunk, [HAS_DEFINITION_URI]):
+                if curie in defn_map:
+                    logging.error(f'Multiple definitions for {curie} = {defn_map[curie]} != {defn}')
+                else:
+                    defn_map[curie] = defn
+                    yield curie, defn
+            for curie in curie_chunk:
+                if curie not in defn_map:
+                    yield curie, None
+
+    def alias_maps_for_curies(self, curies: Iterable[CURIE]) -> Iterable[Tuple[CURIE, ALIAS_MAP]]:
+        """
+        Retrieves aliases for multiple entities at once
+
+        :param curies:
+        :return: iterator over (entity, alias map) pairs, as for :meth:`alias_map_by_curie`
+        """
+        for curie_chunk in chunk_to_lists(curies, self.values_chunk_size):
+            alias_maps = {curie: defaultdict(list) for curie in curie_chunk}
+            # keyed by predicate URI, as for alias_map_by_curie
+            for curie, pred_uri, alias in self._annotation_rows(curie_chunk, self._alias_predicates()):
+                alias_maps[curie][pred_uri].append(alias)
+            for curie in curie_chunk:
+                yield curie, alias_maps[curie]
 
     def _alias_predicates(self) -> List[PRED_CURIE]:
         # different implementations can override this; e.g Wikidata uses skos:altLabel
@@ -288,10 +529,10 @@ class SparqlImplementation(RdfInterface):
     # Implements: SearchInterface
     # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
 
-    def basic_search(self, search_term: str, config: SearchConfiguration = SearchConfiguration()) -> Iterable[CURIE]:
+    def _basic_search_query(self, search_term: str, config: SearchConfiguration) -> Optional[SparqlQuery]:
         if ':' in search_term and ' ' not in search_term:
             logging.debug(f'Not performing search on what looks like a CURIE: {search_term}')
-            return
+            return None
         if self._is_blazegraph():
             filter_clause = f'?v bds:search "{search_term}"'
         else:
@@ -315,46 +556,161 @@ class SparqlImplementation(RdfInterface):
         else:
             where = [f'?s ?p ?v ',
                      f'VALUES ?p {{ {" ".join(preds)} }}']
-        query = SparqlQuery(select=['?s'],
-                            where=where + [filter_clause])
+        return SparqlQuery(select=['?s'],
+                           where=where + [filter_clause])
+
+    def basic_search(self, search_term: str, config: SearchConfiguration = SearchConfiguration()) -> Iterable[CURIE]:
+        query = self._basic_search_query(search_term, config)
+        if query is None:
+            return
         bindings = self._query(query, prefixes=DEFAULT_PREFIX_MAP)
         for row in bindings:
             yield self.uri_to_curie(row['s']['value'])
 
+    async def abasic_search(self, search_term: str, config: SearchConfiguration = None) -> List[CURIE]:
+        if config is None:
+            config = SearchConfiguration()
+        query = self._basic_search_query(search_term, config)
+        if query is None:
+            return []
+        bindings = await self._aquery(query, prefixes=DEFAULT_PREFIX_MAP)
+        return [self.uri_to_curie(row['s']['value']) for row in bindings]
+
     # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
     # Implements: OboGraphInterface
     # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+    def _closure_query(self, start_curies: List[CURIE], predicates: List[PRED_CURIE] = None,
+                       up=True) -> SparqlQuery:
+        # A property path finds the closure in a single query; paths cannot test owl:onProperty,
+        # so when existential restrictions are followed the path may overshoot, and the
+        # relationships returned are filtered with _walk
+        isa_only = predicates is not None and set(predicates) == {IS_A}
+        if isa_only:
+            path = 'rdfs:subClassOf'
+            edge = '?s rdfs:subClassOf ?o . BIND(rdfs:subClassOf AS ?p)'
+        else:
+            path = '(rdfs:subClassOf|rdfs:subClassOf/owl:someValuesFrom)'
+            edge = ('{ ?s rdfs:subClassOf ?o . BIND(rdfs:subClassOf AS ?p) } UNION '
+                    '{ ?s rdfs:subClassOf [ owl:onProperty ?p ; owl:someValuesFrom ?o ] }')
+        where = [f'?start {path}* ?s' if up else f'?s {path}* ?start',
+                 edge,
+                 'FILTER (isIRI(?s) && isIRI(?o) && ?o != owl:Thing)',
+                 _sparql_values('start', [self.curie_to_sparql(curie) for curie in start_curies])]
+        if predicates and not isa_only:
+            where.append(_sparql_values('p', [self.curie_to_sparql(pred) for pred in predicates]))
+        return SparqlQuery(select=['?s', '?p', '?o'], distinct=True, where=where)
+
+    def _closure_relationships(self, bindings: List[dict], start_curies: List[CURIE], up=True) -> List[RELATIONSHIP]:
+        rels = [(self.uri_to_curie(row['s']['value']), self.uri_to_curie(row['p']['value']),
+                 self.uri_to_curie(row['o']['value'])) for row in bindings]
+        reached = _walk(rels, start_curies, up=up)
+        return [rel for rel in rels if rel[0] in reached and rel[2] in reached]
+
+    def _closure(self, start_curies: Union[CURIE, List[CURIE]], predicates: List[PRED_CURIE] = None,
+                 up=True) -> List[RELATIONSHIP]:
+        """
+        All relationships in the ancestor (or descendant) graph of start_curies
+
+        :param start_curies:
+        :param predicates: follow subClassOf and existential restrictions over these (all if not set)
+        :param up: if false, walk down to descendants
+        :return:
+        """
+        if not isinstance(start_curies, list):
+            start_curies = [start_curies]
+        bindings = self._query(self._closure_query(start_curies, predicates, up), prefixes=CLOSURE_PREFIX_MAP)
+        return self._closure_relationships(bindings, start_curies, up)
+
+    def _closure_nodes(self, start_curies: Union[CURIE, List[CURIE]],
+                       relationships: List[RELATIONSHIP]) -> List[CURIE]:
+        if not isinstance(start_curies, list):
+            start_curies = [start_curies]
+        nodes = {curie: None for curie in start_curies}
+        for s, _, o in relationships:
+            nodes[s] = None
+            nodes[o] = None
+        return list(nodes)
+
+    def ancestors(self, start_curies: Union[CURIE, List[CURIE]], predicates: List[PRED_CURIE] = None) -> Iterable[CURIE]:
+        yield from self._closure_nodes(start_curies, self._closure(start_curies, predicates))
+
+    async def aancestors(self, start_curies: Union[CURIE, List[CURIE]],
+                         predicates: List[PRED_CURIE] = None) -> List[CURIE]:
+        if not isinstance(start_curies, list):
+            start_curies = [start_curies]
+        bindings = await self._aquery(self._closure_query(start_curies, predicates), prefixes=CLOSURE_PREFIX_MAP)
+        return self._closure_nodes(start_curies, self._closure_relationships(bindings, start_curies))
+
     def descendants(self, start_curies: Union[CURIE, List[CURIE]], predicates: List[PRED_CURIE] = None) -> Iterable[CURIE]:
-        if not predicates or predicates != [IS_A]:
-            raise ValueError(f'Generic SPARQL only supports relational queries over IS_a')
-        query_uris = [self.curie_to_sparql(curie) for curie in start_curies]
-        where = [f'?s rdfs:subClassOf* ?o',
-                 _sparql_values('o', query_uris)]
-        query = SparqlQuery(select=['?s'],
-                            distinct=True,
-                            where=where)
-        bindings = self._query(query.query_str())
-        for row in bindings:
-            yield self.uri_to_curie(row['s']['value'])
+        yield from self._closure_nodes(start_curies, self._closure(start_curies, predicates, up=False))
+
+    def _closure_graph(self, start_curies: Union[CURIE, List[CURIE]], relationships: List[RELATIONSHIP]) -> obograph.Graph:
+        curies = self._closure_nodes(start_curies, relationships)
+        nodes = [obograph.Node(id=curie, lbl=label) for curie, label in self.get_labels_for_curies(curies)]
+        edges = [obograph.Edge(sub=s, pred=p, obj=o) for s, p, o in relationships]
+        return obograph.Graph(id='query', nodes=nodes, edges=edges)
 
+    def ancestor_graph(self, start_curies: Union[CURIE, List[CURIE]], predicates: List[PRED_CURIE] = None) -> obograph.Graph:
+        return self._closure_graph(start_curies, self._closure(start_curies, predicates))
+
+    def _direct_relationships(self, subjects: List[CURIE],
+                              predicates: List[PRED_CURIE] = None) -> Iterable[RELATIONSHIP]:
+        """
+        Relationships asserted directly on each subject, between named entities
+
+        :param subjects:
+        :param predicates: all predicates if not set
+        :return: iterator over (subject, predicate, object) tuples
+        """
+        pred_uris = [self.curie_to_sparql(pred) for pred in predicates] if predicates else None
+        for curie_chunk in chunk_to_lists(subjects, self.values_chunk_size):
+            where = ['?s ?p ?o',
+                     'FILTER (isIRI(?o))',
+                     _sparql_values('s', [self.curie_to_sparql(curie) for curie in curie_chunk])]
+            if pred_uris:
+                where.append(_sparql_values('p', pred_uris))
+            for row in self._query(SparqlQuery(select=['?s', '?p', '?o'], distinct=True, where=where)):
+                yield (self.uri_to_curie(row['s']['value']), self.uri_to_curie(row['p']['value']),
+                       self.uri_to_curie(row['o']['value']))
+
+    def descendant_graph(self, start_curies: Union[CURIE, List[CURIE]], predicates: List[PRED_CURIE] = None) -> obograph.Graph:
+        if self.follows_subclass_axioms:
+            return self._closure_graph(start_curies, self._closure(start_curies, predicates, up=False))
+        if not isinstance(start_curies, list):
+            start_curies = [start_curies]
+        descs = list(dict.fromkeys(start_curies + list(self.descendants(start_curies, predicates))))
+        logging.info(f'NUM DESCS: {len(descs)}')
+        desc_set = set(descs)
+        relationships = [rel for rel in self._direct_relationships(descs, predicates) if rel[2] in desc_set]
+        logging.info(f'NUM EDGES: {len(relationships)}')
+        return self._closure_graph(descs, relationships)
 
     # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
     # Implements: MappingProviderInterface
     # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
 
-    def get_sssom_mappings_by_curie(self, curie: CURIE) -> Iterable[sssom.Mapping]:
+    def _sssom_mappings_query(self, curie: CURIE) -> SparqlQuery:
         pred_uris = [self.curie_to_sparql(pred) for pred in ALL_MATCH_PREDICATES]
-        query = SparqlQuery(select=['?p', '?o'],
-                            where=[f'{self.curie_to_sparql(curie)} ?p ?o',
-                                   f'VALUES ?p {{ {" ".join(pred_uris)} }}'
-                                   ])
-        bindings = self._query(query)
+        return SparqlQuery(select=['?p', '?o'],
+                           where=[f'{self.curie_to_sparql(curie)} ?p ?o',
+                                  f'VALUES ?p {{ {" ".join(pred_uris)} }}'
+                                  ])
+
+    def _binding_to_mapping(self, curie: CURIE, row: dict) -> sssom.Mapping:
+        return sssom.Mapping(subject_id=curie,
+                             predicate_id=self.uri_to_curie(row['p']['value']),
+                             object_id=self.uri_to_curie(row['o']['value']),
+                             match_type=MatchTypeEnum.Unspecified,
+                             )
+
+    def get_sssom_mappings_by_curie(self, curie: CURIE) -> Iterable[sssom.Mapping]:
+        bindings = self._query(self._sssom_mappings_query(curie))
         for row in bindings:
-            yield sssom.Mapping(subject_id=curie,
-                                predicate_id=self.uri_to_curie(row['p']['value']),
-                                object_id=self.uri_to_curie(row['o']['value']),
-                                match_type=MatchTypeEnum.Unspecified,
-                                )
+            yield self._binding_to_mapping(curie, row)
+
+    async def aget_sssom_mappings_by_curie(self, curie: CURIE) -> List[sssom.Mapping]:
+        bindings = await self._aquery(self._sssom_mappings_query(curie))
+        return [self._binding_to_mapping(curie, row) for row in bindings]
 
     # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
     # Implements: RdfInterface
@@ -367,7 +723,7 @@ class SparqlImplementation(RdfInterface):
                             where=['?s ?p ?o .'
                                    '?seed (rdfs:subClassOf|owl:onProperty|owl:someValuesFrom|^owl:annotatedSource)* ?s',
                                     _sparql_values('seed', seed_uris)])
-        bindings = self._query(query)
+        bindings = self._iter_query(query)
         for row in bindings:
             triple = (row['s'], row['p'], row['o'])
             if map_to_curies:
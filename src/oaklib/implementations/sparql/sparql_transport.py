@@ -0,0 +1,147 @@
+"""
+SPARQL HTTP Transport
+---------------------
+
+Sends SPARQL queries to remote endpoints over pooled, keep-alive HTTP connections.
+"""
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterator
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from oaklib import __version__
+from oaklib.implementations.sparql.result_parser import SPARQL_RESULTS_JSON, SPARQL_RESULTS_TSV, BINDING, \
+    iter_json_bindings, iter_tsv_bindings
+from oaklib.types import URI
+from oaklib.utilities.async_http import arequest_json
+from oaklib.utilities.rate_limiter import limited_request
+
+USER_AGENT = f'oaklib/{__version__} (https://github.com/INCATools/ontology-access-kit)'
+
+# queries whose url-encoded form is longer than this are sent as POST
+MAX_GET_LENGTH = 2000
+
+# bytes read at a time when streaming results
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class SparqlHttpTransport:
+    """
+    Sends SPARQL queries to an endpoint using a shared :class:`requests.Session`
+
+    Connections are kept alive and reused between queries, responses are gzip-compressed,
+    and queries too long to fit in a URL are sent as POST. Queries are subject to the rate limit
+    for the endpoint's host.
+
+    Transports are typically obtained via :meth:`for_endpoint`, so that all implementations
+    using the same endpoint share one connection pool:
+
+    .. code:: python
+
+        >>> transport = SparqlHttpTransport.for_endpoint('https://ubergraph.apps.renci.org/sparql')
+        >>> bindings = transport.query('SELECT ?s WHERE { ?s a owl:Class } LIMIT 1')['results']['bindings']
+    """
+    endpoint: URI = None
+    session: requests.Session = None
+    pool_size: int = 16
+    timeout: float = 300
+    max_get_length: int = MAX_GET_LENGTH
+
+    def __post_init__(self):
+        if self.session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update({'Accept': SPARQL_RESULTS_JSON,
+                                    'Accept-Encoding': 'gzip, deflate',
+                                    'User-Agent': USER_AGENT})
+            self.session = session
+
+    @classmethod
+    def for_endpoint(cls, endpoint: URI) -> "SparqlHttpTransport":
+        """
+        Shared transport for an endpoint, created on first use
+
+        :param endpoint: URL of the SPARQL endpoint
+        :return:
+        """
+        with _TRANSPORTS_LOCK:
+            if endpoint not in _TRANSPORTS:
+                _TRANSPORTS[endpoint] = cls(endpoint)
+            return _TRANSPORTS[endpoint]
+
+    def query(self, query: str) -> Dict:
+        """
+        Sends a SELECT query
+
+        :param query: SPARQL query string
+        :return: SPARQL JSON results object
+        """
+        response = self._request(query)
+        response.raise_for_status()
+        return response.json()
+
+    def iter_query(self, query: str, results_format: str = SPARQL_RESULTS_JSON) -> Iterator[BINDING]:
+        """
+        Sends a SELECT query, yielding bindings as they arrive
+
+        Results are parsed as they are read, so memory use does not grow with the size of the results
+
+        :param query: SPARQL query string
+        :param results_format: SPARQL_RESULTS_JSON or SPARQL_RESULTS_TSV
+        :return: iterator over bindings
+        """
+        if results_format == SPARQL_RESULTS_TSV:
+            parse = iter_tsv_bindings
+        elif results_format == SPARQL_RESULTS_JSON:
+            parse = iter_json_bindings
+        else:
+            raise ValueError(f'Cannot stream results in {results_format}')
+        response = self._request(query, headers={'Accept': results_format}, stream=True)
+        try:
+            response.raise_for_status()
+            yield from parse(response.iter_content(chunk_size=STREAM_CHUNK_SIZE))
+        finally:
+            response.close()
+
+    def _request(self, query: str, **kwargs) -> requests.Response:
+        params = {'query': query}
+        if self._use_post(params):
+            logging.debug(f'Using POST for query of length {len(query)}')
+            return limited_request('POST', self.endpoint, session=self.session, data=params,
+                                   timeout=self.timeout, **kwargs)
+        else:
+            return limited_request('GET', self.endpoint, session=self.session, params=params,
+                                   timeout=self.timeout, **kwargs)
+
+    async def aquery(self, query: str) -> Dict:
+        """
+        Sends a SELECT query without blocking the event loop
+
+        :param query: SPARQL query string
+        :return: SPARQL JSON results object
+        """
+        params = {'query': query}
+        headers = dict(self.session.headers)
+        if self._use_post(params):
+            return await arequest_json('POST', self.endpoint, data=params, headers=headers, timeout=self.timeout,
+                                       session=self.session)
+        else:
+            return await arequest_json('GET', self.endpoint, params=params, headers=headers, timeout=self.timeout,
+                                       session=self.session)
+
+    def _use_post(self, params: Dict[str, str]) -> bool:
+        return len(self.endpoint) + len(urlencode(params)) + 1 > self.max_get_length
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_TRANSPORTS: Dict[URI, SparqlHttpTransport] = {}
+_TRANSPORTS_LOCK = threading.Lock()
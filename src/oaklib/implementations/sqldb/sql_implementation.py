@@ -106,6 +106,21 @@ class SqlImplementation(RelationGraphInterface, OboGraphInterface, ValidatorInte
             m[row.predicate].append(row.value)
         return m
 
+    def alias_map_for_curies(self, curies: Iterable[CURIE]) -> Iterable[Tuple[CURIE, ALIAS_MAP]]:
+        curies = list(curies)
+        labels = {}
+        for curie, label in self.get_labels_for_curies(curies):
+            labels.setdefault(curie, label)
+        synonyms = defaultdict(list)
+        for row in self.session.query(HasSynonymStatement).filter(HasSynonymStatement.subject.in_(tuple(curies))):
+            synonyms[row.subject].append(row)
+        for curie in curies:
+            m = defaultdict(list)
+            m[LABEL_PREDICATE] = [labels.get(curie, None)]
+            for row in synonyms[curie]:
+                m[row.predicate].append(row.value)
+            yield curie, m
+
     def _get_subset_curie(self, curie: str) -> str:
         if '#' in curie:
             return curie.split('#')[-1]
@@ -172,6 +187,17 @@ class SqlImplementation(RelationGraphInterface, OboGraphInterface, ValidatorInte
             m[row.predicate].append(row.value)
         return m
 
+    def get_simple_mappings_for_curies(self, curies: Iterable[CURIE]) -> Iterable[Tuple[CURIE, RELATIONSHIP_MAP]]:
+        curies = list(curies)
+        rows_by_curie = defaultdict(list)
+        for row in self.session.query(HasMappingStatement).filter(HasMappingStatement.subject.in_(tuple(curies))):
+            rows_by_curie[row.subject].append(row)
+        for curie in curies:
+            m = defaultdict(list)
+            for row in rows_by_curie[curie]:
+                m[row.predicate].append(row.value)
+            yield curie, m
+
     # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
     # Implements: OboGraphInterface
     # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
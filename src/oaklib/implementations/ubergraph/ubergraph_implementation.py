@@ -1,5 +1,7 @@
 import logging
-from collections import defaultdict
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from enum import Enum
 from typing import Iterable, Tuple, List, Union, Optional, Iterator
@@ -16,7 +18,9 @@ from oaklib.interfaces.relation_graph_interface import RelationGraphInterface
 from oaklib.interfaces.search_interface import SearchInterface
 from oaklib.interfaces.semsim_interface import SemanticSimilarityInterface
 from oaklib.types import CURIE, PRED_CURIE
+from oaklib.datamodels.vocabulary import LABEL_PREDICATE, HAS_DEFINITION_URI
 from oaklib.utilities.graph.networkx_bridge import transitive_reduction_by_predicate
+from oaklib.utilities.iterator_utils import chunk_to_lists
 from rdflib import RDFS, RDF, OWL, URIRef
 
 
@@ -49,7 +53,15 @@ class UbergraphImplementation(SparqlImplementation, RelationGraphInterface, Sear
 
         The default ubergraph endpoint will be assumed
 
+    Queries over many subjects (e.g. when building an ancestor graph) are split into chunks that are
+    sent concurrently, up to max_workers at a time. The chunk size starts at chunk_size and is adapted
+    to the response time and size of previous chunks, between 1 and max_chunk_size
     """
+    chunk_size: int = 10
+    max_chunk_size: int = 500
+    max_workers: int = 4
+    chunk_target_seconds: float = 2.0
+    chunk_max_rows: int = 10000
 
     def _default_url(self) -> str:
         return "https://ubergraph.apps.renci.org/sparql"
@@ -70,6 +82,11 @@ class UbergraphImplementation(SparqlImplementation, RelationGraphInterface, Sear
                 if f'/{ont}.' in g or f'/{ont}-base' in g:
                     return g
 
+    @property
+    def follows_subclass_axioms(self) -> bool:
+        # relationships are materialized, with direct relationships in the nonredundant graph
+        return False
+
     # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
     # Implements: RelationGraph
     # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
@@ -135,13 +152,43 @@ class UbergraphImplementation(SparqlImplementation, RelationGraphInterface, Sear
         else:
             return f'VALUES ?{var} {{ {" ".join(in_list)} }}'
 
-    def _from_subjects_chunked(self, subjects: List[CURIE], predicates: List[PRED_CURIE] = None, **kwargs):
-        SIZE = 10
-        while len(subjects) > 0:
-            next_subjects = subjects[0:SIZE]
-            subjects = subjects[SIZE:]
-            for r in self._from_subjects(next_subjects, predicates, **kwargs):
-                yield r
+    def _next_chunk_size(self, size: int, elapsed: float, num_rows: int) -> int:
+        if elapsed > self.chunk_target_seconds or num_rows > self.chunk_max_rows:
+            return max(size // 2, 1)
+        if elapsed < self.chunk_target_seconds / 2 and num_rows < self.chunk_max_rows / 2:
+            return min(size * 2, self.max_chunk_size)
+        return size
+
+    def _from_subjects_chunked(self, subjects: List[CURIE], predicates: List[PRED_CURIE] = None,
+                               **kwargs) -> Iterator[Tuple[CURIE, PRED_CURIE, CURIE]]:
+        """
+        As :meth:`_from_subjects`, splitting subjects into chunks that are queried concurrently
+
+        Results are yielded in the same order as if each chunk had been queried in turn.
+        Each query still passes through the rate limiter.
+
+        :param subjects:
+        :param predicates:
+        :param kwargs: passed to :meth:`_from_subjects`
+        :return: iterator over subject-predicate-object triples
+        """
+        def _run(next_subjects: List[CURIE]) -> Tuple[List[Tuple], float]:
+            start = time.monotonic()
+            rows = list(self._from_subjects(next_subjects, predicates, **kwargs))
+            return rows, time.monotonic() - start
+
+        size = self.chunk_size
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while subjects or pending:
+                while subjects and len(pending) < self.max_workers:
+                    next_subjects, subjects = subjects[0:size], subjects[size:]
+                    pending.append(executor.submit(_run, next_subjects))
+                rows, elapsed = pending.popleft().result()
+                size = self._next_chunk_size(size, elapsed, len(rows))
+                logging.debug(f'Chunk returned {len(rows)} rows in {elapsed:.2f}s; next chunk size: {size}')
+                for r in rows:
+                    yield r
 
 
     def _from_subjects(self, subjects: List[CURIE], predicates: List[PRED_CURIE] = None,
@@ -171,10 +218,35 @@ class UbergraphImplementation(SparqlImplementation, RelationGraphInterface, Sear
     def _object_properties(self) -> List[PRED_CURIE]:
         return list(set([t[0] for t in self._triples(None, RDF.type, OWL.ObjectProperty)]))
 
-    def node(self, curie: CURIE) -> obograph.Node:
-        params = dict(id=curie,
-                      lbl=self.get_label_by_curie(curie))
-        return obograph.Node(**params)
+    def _nodes(self, curies: Iterable[CURIE], include_metadata=False) -> Iterator[obograph.Node]:
+        """
+        Retrieves nodes for many entities at once, using chunked queries
+
+        :param curies:
+        :param include_metadata: if true, also populate definitions and synonyms
+        :return: iterator over nodes, yielded as each chunk completes
+        """
+        preds = [LABEL_PREDICATE]
+        if include_metadata:
+            preds += [HAS_DEFINITION_URI] + self._alias_predicates()
+        for curie_chunk in chunk_to_lists(curies, self.values_chunk_size):
+            nodes = {curie: obograph.Node(id=curie) for curie in curie_chunk}
+            for curie, pred, v in self.get_annotations_for_curies(curie_chunk, preds):
+                n = nodes[curie]
+                if pred == LABEL_PREDICATE:
+                    n.lbl = v
+                    continue
+                if n.meta is None:
+                    n.meta = obograph.Meta()
+                if pred == self.uri_to_curie(HAS_DEFINITION_URI):
+                    n.meta.definition = obograph.DefinitionPropertyValue(val=v)
+                else:
+                    n.meta.synonyms.append(obograph.SynonymPropertyValue(pred=pred.split(':')[-1], val=v))
+            for n in nodes.values():
+                yield n
+
+    def node(self, curie: CURIE, strict=False) -> obograph.Node:
+        return next(self._nodes([curie], include_metadata=True))
 
     def ancestor_graph(self, start_curies: Union[CURIE, List[CURIE]], predicates: List[PRED_CURIE] = None) -> obograph.Graph:
         ancs = list(self.ancestors(start_curies, predicates))
@@ -191,20 +263,22 @@ class UbergraphImplementation(SparqlImplementation, RelationGraphInterface, Sear
         return obograph.Graph(id='query',
                               nodes=list(nodes.values()), edges=edges)
 
+    def _direct_relationships(self, subjects: List[CURIE],
+                              predicates: List[PRED_CURIE] = None) -> Iterable[RELATIONSHIP]:
+        return self._from_subjects_chunked(subjects, predicates, graph=RelationGraphEnum.nonredundant.value)
+
     def relationships_to_graph(self, relationships: Iterable[RELATIONSHIP]) -> obograph.Graph:
         relationships = list(relationships)
         edges = [obograph.Edge(sub=s, pred=p, obj=o) for s, p, o in relationships]
         node_ids = set()
         for rel in relationships:
             node_ids.update(list(rel))
-        nodes = {}
-        for s, p, o in self._from_subjects_chunked(list(node_ids), [RDFS.label], object_is_literal=True):
-            nodes[s] = obograph.Node(id=s, lbl=o)
+        nodes = [obograph.Node(id=curie, lbl=label) for curie, label in self.get_labels_for_curies(sorted(node_ids))]
         logging.info(f'NUM EDGES: {len(edges)}')
         return obograph.Graph(id='query',
-                              nodes=list(nodes.values()), edges=edges)
+                              nodes=nodes, edges=edges)
 
-    def ancestors(self, start_curies: Union[CURIE, List[CURIE]], predicates: List[PRED_CURIE] = None) -> Iterable[CURIE]:
+    def _ancestors_query(self, start_curies: Union[CURIE, List[CURIE]], predicates: List[PRED_CURIE] = None) -> SparqlQuery:
         # TODO: DRY
         if not isinstance(start_curies, list):
             start_curies = [start_curies]
@@ -216,15 +290,24 @@ class UbergraphImplementation(SparqlImplementation, RelationGraphInterface, Sear
         if predicates:
             pred_uris = [self.curie_to_sparql(pred) for pred in predicates]
             where.append(_sparql_values('p', pred_uris))
-        query = SparqlQuery(select=['?o'],
-                            distinct=True,
-                            where=where)
-        bindings = self._query(query.query_str())
+        return SparqlQuery(select=['?o'],
+                           distinct=True,
+                           where=where)
+
+    def ancestors(self, start_curies: Union[CURIE, List[CURIE]], predicates: List[PRED_CURIE] = None) -> Iterable[CURIE]:
+        bindings = self._query(self._ancestors_query(start_curies, predicates).query_str())
         for row in bindings:
             yield self.uri_to_curie(row['o']['value'])
 
+    async def aancestors(self, start_curies: Union[CURIE, List[CURIE]],
+                         predicates: List[PRED_CURIE] = None) -> List[CURIE]:
+        bindings = await self._aquery(self._ancestors_query(start_curies, predicates).query_str())
+        return [self.uri_to_curie(row['o']['value']) for row in bindings]
+
     def descendants(self, start_curies: Union[CURIE, List[CURIE]], predicates: List[PRED_CURIE] = None) -> Iterable[CURIE]:
         # TODO: DRY
+        if not isinstance(start_curies, list):
+            start_curies = [start_curies]
         query_uris = [self.curie_to_sparql(curie) for curie in start_curies]
         where = [f'?s ?p ?o',
                  f'?s a owl:Class',
@@ -1,7 +1,7 @@
 import logging
 from collections import defaultdict
 from dataclasses import dataclass, field
-from typing import Iterable, Tuple, List, Union, Iterator, Dict
+from typing import Iterable, Tuple, List, Union, Iterator, Dict, Optional
 
 from oaklib.datamodels import obograph
 from oaklib.datamodels.similarity import TermPairwiseSimilarity
@@ -57,6 +57,11 @@ class WikidataImplementation(SparqlImplementation, RelationGraphInterface, Searc
     def _default_url(self) -> str:
         return "http://query.wikidata.org/sparql"
 
+    @property
+    def follows_subclass_axioms(self) -> bool:
+        # classes are related by wikidata properties, such as subclass of (P279)
+        return False
+
     def _alias_predicates(self) -> List[PRED_CURIE]:
         return [SKOS_ALT_LABEL]
 
@@ -74,10 +79,10 @@ class WikidataImplementation(SparqlImplementation, RelationGraphInterface, Searc
     # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
     # Implements: SearchInterface
     # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
-    def basic_search(self, search_term: str, config: SearchConfiguration = SearchConfiguration()) -> Iterable[CURIE]:
+    def _basic_search_query(self, search_term: str, config: SearchConfiguration) -> Optional[SparqlQuery]:
         if ':' in search_term and ' ' not in search_term:
             logging.debug(f'Not performing search on what looks like a CURIE: {search_term}')
-            return
+            return None
         query = SparqlQuery(select=['?s'],
                             where=[f"""
                             SERVICE wikibase:mwapi {{
@@ -91,9 +96,7 @@ class WikidataImplementation(SparqlImplementation, RelationGraphInterface, Searc
                             """])
         if config.limit is not None:
             query.limit = config.limit
-        bindings = self._query(query)
-        for row in bindings:
-            yield self.uri_to_curie(row['s']['value'])
+        return query
 
     # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
     # Implements: RelationGraph
@@ -216,7 +219,7 @@ class WikidataImplementation(SparqlImplementation, RelationGraphInterface, Searc
         return obograph.Graph(id='query',
                               nodes=list(nodes.values()), edges=edges)
 
-    def ancestors(self, start_curies: Union[CURIE, List[CURIE]], predicates: List[PRED_CURIE] = None) -> Iterable[CURIE]:
+    def _ancestors_query(self, start_curies: Union[CURIE, List[CURIE]], predicates: List[PRED_CURIE] = None) -> SparqlQuery:
         if predicates is None:
             raise NotImplementedError(f'Unbound predicates not supported for Wikidata')
         if not isinstance(start_curies, list):
@@ -226,14 +229,22 @@ class WikidataImplementation(SparqlImplementation, RelationGraphInterface, Searc
         pred_uris = [self.curie_to_sparql(pred) for pred in predicates]
         pred_uris_j = "|".join(pred_uris)
         where.append(f'?s ({pred_uris_j})* ?o')
-        query = SparqlQuery(select=['?o'],
-                            distinct=True,
-                            where=where)
+        return SparqlQuery(select=['?o'],
+                           distinct=True,
+                           where=where)
+
+    def ancestors(self, start_curies: Union[CURIE, List[CURIE]], predicates: List[PRED_CURIE] = None) -> Iterable[CURIE]:
+        query = self._ancestors_query(start_curies, predicates)
         print(query.query_str())
         bindings = self._query(query.query_str())
         for row in bindings:
             yield self.uri_to_curie(row['o']['value'])
 
+    async def aancestors(self, start_curies: Union[CURIE, List[CURIE]],
+                         predicates: List[PRED_CURIE] = None) -> List[CURIE]:
+        bindings = await self._aquery(self._ancestors_query(start_curies, predicates).query_str())
+        return [self.uri_to_curie(row['o']['value']) for row in bindings]
+
     def descendants(self, start_curies: Union[CURIE, List[CURIE]], predicates: List[PRED_CURIE] = None) -> Iterable[CURIE]:
         if predicates is None:
             raise NotImplementedError(f'Unbound predicates not supported for Wikidata')
@@ -1,3 +1,4 @@
+import asyncio
 from abc import ABC
 from dataclasses import dataclass
 from typing import Dict, List, Iterable, Tuple, Optional, Any, Iterator
@@ -178,6 +179,18 @@ class BasicOntologyInterface(OntologyInterface, ABC):
         """
         raise NotImplementedError
 
+    async def aget_label_by_curie(self, curie: CURIE) -> Optional[str]:
+        """
+        Async version of :meth:`get_label_by_curie`
+
+        By default the blocking lookup is run in a worker thread; remote implementations
+        override this with a non-blocking request
+
+        :param curie:
+        :return:
+        """
+        return await asyncio.to_thread(self.get_label_by_curie, curie)
+
     def get_labels_for_curies(self, curies: Iterable[CURIE]) -> Iterable[Tuple[CURIE, str]]:
         """
         fetches the unique label for a CURIE
@@ -271,6 +284,17 @@ class BasicOntologyInterface(OntologyInterface, ABC):
         """
         raise NotImplementedError()
 
+    def get_simple_mappings_for_curies(self, curies: Iterable[CURIE]) -> Iterable[Tuple[CURIE, Any]]:
+        """
+        Bulk version of :meth:`get_simple_mappings_by_curie`
+
+        :param curies:
+        :return: iterator over (curie, mappings) pairs, one for each curie, in the order given
+        """
+        # default implementation: may be overridden for efficiency
+        for curie in curies:
+            yield curie, self.get_simple_mappings_by_curie(curie)
+
     def aliases_by_curie(self, curie: CURIE) -> List[str]:
         """
         All aliases/synonyms for a given CURIE
@@ -294,6 +318,17 @@ class BasicOntologyInterface(OntologyInterface, ABC):
         """
         raise NotImplementedError
 
+    def alias_map_for_curies(self, curies: Iterable[CURIE]) -> Iterable[Tuple[CURIE, ALIAS_MAP]]:
+        """
+        Bulk version of :meth:`alias_map_by_curie`
+
+        :param curies:
+        :return: iterator over (curie, alias map) pairs, one for each curie, in the order given
+        """
+        # default implementation: may be overridden for efficiency
+        for curie in curies:
+            yield curie, self.alias_map_by_curie(curie)
+
     def metadata_map_by_curie(self, curie: CURIE) -> METADATA_MAP:
         """
         Returns a dictionary keyed by property predicate, with a list of zero or more values,
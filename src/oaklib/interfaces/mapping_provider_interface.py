@@ -1,3 +1,4 @@
+import asyncio
 from abc import ABC
 from typing import Dict, List, Tuple, Iterable
 
@@ -32,6 +33,17 @@ class MappingProviderInterface(BasicOntologyInterface, ABC):
         """
         raise NotImplementedError
 
+    async def aget_sssom_mappings_by_curie(self, curie: CURIE) -> List[sssom.Mapping]:
+        """
+        Async version of :meth:`get_sssom_mappings_by_curie`
+
+        By default the blocking lookup is run in a worker thread
+
+        :param curie:
+        :return:
+        """
+        return await asyncio.to_thread(lambda: list(self.get_sssom_mappings_by_curie(curie)))
+
     def get_transitive_mappings_by_curie(self, curie: CURIE) -> Iterable[sssom.Mapping]:
         raise NotImplementedError
 
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from abc import ABC
 from dataclasses import dataclass, field
@@ -150,6 +151,19 @@ class OboGraphInterface(BasicOntologyInterface, ABC):
         for node in self.ancestor_graph(start_curies, predicates).nodes:
             yield node.id
 
+    async def aancestors(self, start_curies: Union[CURIE, List[CURIE]],
+                         predicates: List[PRED_CURIE] = None) -> List[CURIE]:
+        """
+        Async version of :meth:`ancestors`
+
+        By default the blocking walk is run in a worker thread
+
+        :param start_curies: curie or curies to start the walk from
+        :param predicates: only traverse over these (traverses over all if this is not set)
+        :return: all ancestor CURIEs
+        """
+        return await asyncio.to_thread(lambda: list(self.ancestors(start_curies, predicates)))
+
     def descendants(self, start_curies: Union[CURIE, List[CURIE]], predicates: List[PRED_CURIE] = None) -> Iterable[CURIE]:
         """
         Descendants obtained from a walk downwards starting from start_curies ending in roots, following only the specified
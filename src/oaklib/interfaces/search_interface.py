@@ -1,3 +1,4 @@
+import asyncio
 from abc import ABC
 from typing import List, Iterable
 
@@ -23,6 +24,18 @@ class SearchInterface(BasicOntologyInterface, ABC):
         """
         raise NotImplementedError
 
+    async def abasic_search(self, search_term: str, config: SearchConfiguration = None) -> List[CURIE]:
+        """
+        Async version of :meth:`basic_search`
+
+        By default the blocking search is run in a worker thread
+
+        :param search_term:
+        :param config:
+        :return: all matching CURIEs
+        """
+        return await asyncio.to_thread(lambda: list(self.basic_search(search_term, config=config)))
+
     def multiterm_search(self, search_terms: List[str], config: SearchConfiguration = None) -> Iterable[CURIE]:
         """
         As basic_search, using multiple terms
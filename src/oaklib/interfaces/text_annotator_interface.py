@@ -10,7 +10,8 @@ class TextAnnotatorInterface(BasicOntologyInterface, ABC):
     """
     Performs Named Entity Recognition on texts
 
-    Currently this is only partially implemented by :class:`.BioportalInterface`
+    Currently this is only partially implemented by :class:`.BioportalInterface`. Any other implementation
+    can be wrapped in a :class:`.LexicalAnnotatorImplementation`, which annotates texts locally
 
     potential implementations:
 
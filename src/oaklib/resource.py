@@ -19,6 +19,7 @@ class OntologyResource:
     provider: str = None
     local: bool = False
     in_memory: bool = False
+    lazy: bool = False
     data: str = None
     implementation_class: Union[Type] = None
 
@@ -74,6 +74,12 @@ def get_resource_from_shorthand(descriptor: str, format: str = None) -> Ontology
                     resource.format = 'obo'
                 resource.local = True
                 resource.slug = rest
+            elif scheme == 'prontolazy':
+                impl_class = ProntoImplementation
+                resource.format = 'obo'
+                resource.local = True
+                resource.lazy = True
+                resource.slug = rest
             elif scheme == 'obolibrary' or scheme == 'prontolib':
                 impl_class = ProntoImplementation
                 if resource.slug.endswith('.obo'):
@@ -0,0 +1,164 @@
+"""
+Non-blocking HTTP
+-----------------
+
+Helpers for the async (``a``-prefixed) methods of remote implementations.
+
+Requests are made with aiohttp (install the ``async`` extra). If aiohttp is not installed, requests are made
+with the blocking requests library in a worker thread, so the event loop is still not blocked.
+
+Requests in flight at the same time on an event loop share one connection pool, which is closed when the last
+of them finishes, so concurrent requests reuse connections and no session outlives its requests:
+
+.. code:: python
+
+    >>> labels = await asyncio.gather(*[oi.aget_label_by_curie(curie) for curie in curies])
+
+To also reuse connections between requests made one after another, make them inside :func:`client_session`,
+which keeps one pool open until the end of the block:
+
+.. code:: python
+
+    >>> async with client_session():
+    ...     for curie in curies:
+    ...         labels.append(await oi.aget_label_by_curie(curie))
+
+Without aiohttp, requests use the blocking session passed in (e.g. that of a :class:`.SparqlHttpTransport`),
+or else one session shared by the whole process.
+
+Requests are subject to the same per-host rate limits as blocking requests; see :mod:`oaklib.utilities.rate_limiter`
+"""
+import asyncio
+import logging
+import threading
+import weakref
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Optional
+
+import requests
+
+from oaklib.utilities.rate_limiter import bucket_for, MAX_RETRIES, RETRY_STATUS_CODES, retry_delay
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# maximum simultaneous connections per session
+MAX_CONNECTIONS = 100
+
+# the session shared by requests made inside client_session
+_SESSION: ContextVar[Optional["aiohttp.ClientSession"]] = ContextVar('oaklib_client_session', default=None)
+
+# for each event loop, the session shared by the requests in flight outside client_session, and their number
+_IN_FLIGHT: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, list]" = weakref.WeakKeyDictionary()
+
+# blocking session used when aiohttp is not installed and no session is passed in
+_blocking_session: Optional[requests.Session] = None
+_blocking_session_lock = threading.Lock()
+
+
+def _new_client_session() -> "aiohttp.ClientSession":
+    return aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=MAX_CONNECTIONS))
+
+
+def _shared_blocking_session() -> requests.Session:
+    global _blocking_session
+    with _blocking_session_lock:
+        if _blocking_session is None:
+            _blocking_session = requests.Session()
+        return _blocking_session
+
+
+@asynccontextmanager
+async def _request_session() -> AsyncIterator[Optional["aiohttp.ClientSession"]]:
+    # the client_session if inside one, otherwise the session for requests in flight on this loop
+    session = _SESSION.get()
+    if aiohttp is None or session is not None:
+        yield session
+        return
+    loop = asyncio.get_running_loop()
+    entry = _IN_FLIGHT.get(loop)
+    if entry is None:
+        entry = _IN_FLIGHT[loop] = [_new_client_session(), 0]
+    entry[1] += 1
+    try:
+        yield entry[0]
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _IN_FLIGHT[loop]
+            await entry[0].close()
+
+
+@asynccontextmanager
+async def client_session() -> AsyncIterator[Optional["aiohttp.ClientSession"]]:
+    """
+    Shares one connection pool between all requests made inside the block, closing it at the end
+
+    Tasks created inside the block (e.g. by asyncio.gather) also use the pool. If a session is already open,
+    it is reused and left open.
+
+    :return: the session, or None if aiohttp is not installed
+    """
+    session = _SESSION.get()
+    if aiohttp is None or session is not None:
+        yield session
+        return
+    session = _new_client_session()
+    token = _SESSION.set(session)
+    try:
+        yield session
+    finally:
+        _SESSION.reset(token)
+        await session.close()
+
+
+async def arequest_json(method: str, url: str, params: Dict[str, Any] = None, data: Dict[str, Any] = None,
+                        headers: Dict[str, str] = None, timeout: Optional[float] = None,
+                        session: requests.Session = None, raise_for_status: bool = True) -> Any:
+    """
+    Makes an HTTP request without blocking the event loop, returning the decoded JSON body
+
+    The request waits for the rate limit of the host, and is retried if the service asks to back off
+
+    :param method: GET or POST
+    :param url:
+    :param params: query parameters
+    :param data: form data (for POST)
+    :param headers:
+    :param timeout: in seconds
+    :param session: blocking session to use if aiohttp is not installed (defaults to a shared session)
+    :param raise_for_status: if true, raise an exception for an error response, otherwise return its body
+    :return: parsed JSON
+    """
+    if aiohttp is None:
+        if session is None:
+            session = _shared_blocking_session()
+        logging.debug(f'aiohttp not installed; making request to {url} in a thread')
+    bucket = bucket_for(url)
+    async with _request_session() as client:
+        for attempt in range(MAX_RETRIES + 1):
+            await bucket.aacquire()
+            if client is None:
+                response = await asyncio.to_thread(session.request, method, url, params=params, data=data,
+                                                   headers=headers, timeout=timeout)
+                status = response.status_code
+            else:
+                response = await client.request(method, url, params=params, data=data, headers=headers,
+                                                timeout=aiohttp.ClientTimeout(total=timeout))
+                status = response.status
+            try:
+                if status in RETRY_STATUS_CODES and attempt < MAX_RETRIES:
+                    delay = retry_delay(response.headers, attempt)
+                    logging.warning(f'{url} returned {status}; retrying in {delay:.1f}s')
+                    bucket.pause(delay)
+                    continue
+                if raise_for_status:
+                    response.raise_for_status()
+                if client is None:
+                    return response.json()
+                return await response.json(content_type=None)
+            finally:
+                response.close()
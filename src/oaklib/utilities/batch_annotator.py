@@ -0,0 +1,180 @@
+"""
+Batch Text Annotation
+---------------------
+
+Annotates streams of documents, writing annotations as soon as each batch of documents is done.
+
+Documents are read one per line, either as plain text or as JSON objects (JSONL):
+
+.. code:: python
+
+    >>> with open('abstracts.jsonl') as stream:
+    ...     documents = read_documents(stream, format='jsonl', id_field='pmid', text_field='abstract')
+    ...     writer = AnnotationWriter(sys.stdout, format='tsv')
+    ...     for document_id, anns in annotate_documents(oi, documents):
+    ...         writer.emit(document_id, anns)
+
+Remote annotators (e.g. BioPortal) are sent one document per request, with up to a fixed number of
+concurrent requests. Local annotators (:class:`.LexicalAnnotatorImplementation`) can use a pool of
+worker processes, each holding a copy of the compiled terms. In both cases, annotations are returned in the
+same order as the documents, and only a bounded number of documents is held in memory at a time.
+"""
+import csv
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from linkml_runtime.dumpers import json_dumper, yaml_dumper
+
+from oaklib.datamodels.text_annotator import TextAnnotation
+from oaklib.implementations.lexical.lexical_annotator_implementation import LexicalAnnotatorImplementation
+from oaklib.interfaces.text_annotator_interface import TextAnnotatorInterface, TEXT
+from oaklib.utilities.iterator_utils import chunk_to_lists, ordered_map
+from oaklib.utilities.lexical.lexical_annotator import LexicalAnnotator
+
+DOCUMENT = Tuple[str, TEXT]
+ANNOTATED_DOCUMENT = Tuple[str, List[TextAnnotation]]
+
+DOCUMENT_FORMATS = ['lines', 'jsonl']
+ANNOTATION_FORMATS = ['tsv', 'jsonl', 'yaml']
+
+DEFAULT_BATCH_SIZE = 100
+
+# maximum number of requests sent to a remote annotator at the same time
+DEFAULT_CONCURRENCY = 4
+
+ANNOTATION_COLUMNS = ['document_id', 'subject_start', 'subject_end', 'match_string', 'object_id', 'object_label',
+                      'match_type', 'is_longest_match']
+
+
+def read_documents(stream: TextIO, format: str = 'lines', text_field: str = 'text',
+                   id_field: str = 'id') -> Iterator[DOCUMENT]:
+    """
+    Reads documents, one per line
+
+    Documents without an identifier are identified by their line number, starting from 1
+
+    :param stream:
+    :param format: lines (each line is a document) or jsonl (each line is a JSON object)
+    :param text_field: for jsonl, the field holding the text
+    :param id_field: for jsonl, the field holding the identifier of the document
+    :return: iterator over documents, as (identifier, text) pairs
+    """
+    if format not in DOCUMENT_FORMATS:
+        raise ValueError(f'Unknown document format: {format}; allowed: {DOCUMENT_FORMATS}')
+    for line_number, line in enumerate(stream, start=1):
+        line = line.rstrip('\r\n')
+        if not line.strip():
+            continue
+        if format == 'jsonl':
+            obj = json.loads(line)
+            if text_field not in obj:
+                raise ValueError(f'No {text_field} field in line {line_number}')
+            document_id = obj.get(id_field, None)
+            if document_id is None:
+                document_id = line_number
+            yield str(document_id), obj[text_field]
+        else:
+            yield str(line_number), line
+
+
+# the annotator used by each worker process
+_worker_annotator: Optional[LexicalAnnotator] = None
+
+
+def _init_worker(annotator: LexicalAnnotator) -> None:
+    global _worker_annotator
+    _worker_annotator = annotator
+
+
+def _annotate_batch_in_worker(documents: List[DOCUMENT]) -> List[ANNOTATED_DOCUMENT]:
+    return _annotate_batch_locally(_worker_annotator, documents)
+
+
+def _annotate_batch_locally(annotator: LexicalAnnotator, documents: List[DOCUMENT]) -> List[ANNOTATED_DOCUMENT]:
+    return [(document_id, annotator.annotate(text, text_id=document_id)) for document_id, text in documents]
+
+
+def annotate_documents(oi: TextAnnotatorInterface, documents: Iterable[DOCUMENT],
+                       batch_size: int = DEFAULT_BATCH_SIZE, processes: int = None,
+                       concurrency: int = DEFAULT_CONCURRENCY) -> Iterator[ANNOTATED_DOCUMENT]:
+    """
+    Annotates a stream of documents
+
+    :param oi: annotator
+    :param documents: (identifier, text) pairs, e.g. from :func:`read_documents`
+    :param batch_size: for local annotators, number of documents annotated together
+    :param processes: for local annotators, number of worker processes (annotate in this process if not set)
+    :param concurrency: for remote annotators, maximum number of concurrent requests
+    :return: iterator over (identifier, annotations) pairs, in the same order as documents
+    """
+    if isinstance(oi, LexicalAnnotatorImplementation):
+        batches = chunk_to_lists(documents, batch_size)
+        annotator = oi.compiled_annotator()
+        if processes is not None and processes > 1:
+            logging.info(f'Annotating with {processes} worker processes')
+            with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                     initargs=(annotator,)) as executor:
+                for results in ordered_map(executor, _annotate_batch_in_worker, batches, processes * 2):
+                    yield from results
+        else:
+            for batch in batches:
+                yield from _annotate_batch_locally(annotator, batch)
+    else:
+        def _annotate(document: DOCUMENT) -> ANNOTATED_DOCUMENT:
+            document_id, text = document
+            anns = list(oi.annotate_text(text))
+            for ann in anns:
+                ann.subject_text_id = document_id
+            return document_id, anns
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            yield from ordered_map(executor, _annotate, documents, concurrency * 2)
+
+
+@dataclass
+class AnnotationWriter:
+    """
+    Writes the annotations of each document as they are produced
+
+    - tsv: one row per annotation, with the columns in ANNOTATION_COLUMNS
+    - jsonl: one JSON object per annotation, with the document identifier as subject_text_id
+    - yaml: one YAML document per annotation
+    """
+    file: TextIO = None
+    format: str = 'tsv'
+    header_emitted: bool = False
+    _writer: Any = None
+
+    def __post_init__(self):
+        if self.format not in ANNOTATION_FORMATS:
+            raise ValueError(f'Unknown annotation format: {self.format}; allowed: {ANNOTATION_FORMATS}')
+
+    def emit(self, document_id: str, annotations: List[TextAnnotation]) -> None:
+        """
+        Writes the annotations for a document
+
+        :param document_id:
+        :param annotations:
+        :return:
+        """
+        if self.format == 'tsv':
+            if self._writer is None:
+                self._writer = csv.writer(self.file, delimiter='\t', lineterminator='\n')
+            if not self.header_emitted:
+                self._writer.writerow(ANNOTATION_COLUMNS)
+                self.header_emitted = True
+            for ann in annotations:
+                values = [getattr(ann, c) for c in ANNOTATION_COLUMNS[1:]]
+                self._writer.writerow([document_id] + ['' if v is None else v for v in values])
+        elif self.format == 'jsonl':
+            for ann in annotations:
+                obj = json_dumper.to_dict(ann)
+                obj['subject_text_id'] = document_id
+                self.file.write(json.dumps(obj))
+                self.file.write('\n')
+        else:
+            for ann in annotations:
+                self.file.write(yaml_dumper.dumps(ann))
+                self.file.write('---\n')
@@ -1,5 +1,7 @@
 import itertools
-from typing import Iterable, List
+from collections import deque
+from concurrent.futures import Executor
+from typing import Callable, Iterable, Iterator, List
 
 DEFAULT_CHUNK = 100
 
@@ -34,3 +36,19 @@ def chunk_to_lists(iterable: Iterable, size=DEFAULT_CHUNK) -> Iterable[List]:
         except StopIteration:
             return
         yield list(itertools.chain((first_el,), chunk_it))
+
+
+def ordered_map(executor: Executor, func: Callable, items: Iterable, max_pending: int) -> Iterator:
+    """
+    As executor.map, but only submits items as results are consumed
+
+    At most max_pending items are submitted but not yet returned, so items can be an unbounded stream,
+    and results are returned in the same order as items
+    """
+    pending = deque()
+    for item in items:
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+        pending.append(executor.submit(func, item))
+    while pending:
+        yield pending.popleft().result()
@@ -0,0 +1,290 @@
+"""
+Binary Lexical Index Format
+---------------------------
+
+A compact on-disk format for :class:`LexicalIndex` objects, which loads much faster than YAML.
+
+Every distinct string (terms, CURIEs, predicates) is stored once, in a string table, and referred to by number.
+Relationships are stored column by column, as arrays of string numbers, with groupings sorted by term.
+The file layout is:
+
+- the magic number ``OAKLIX01``
+- the length of the header, followed by a JSON header holding the pipelines and the position of each section
+- the string table, as an array of offsets into a UTF-8 blob
+- grouping columns: the term of each grouping, and the position of its first relationship
+- relationship columns: predicate, element, element term, source, and pipelines
+
+Files can optionally be memory-mapped, in which case nothing is read until it is used:
+
+.. code:: python
+
+    >>> ix = load_binary_lexical_index('go.lexindex', mmap=True)
+    >>> ix.groupings['nucleus'].relationships
+"""
+import json
+import mmap as mmap_module
+import sys
+from array import array
+from collections.abc import Mapping
+from dataclasses import fields
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple, Union
+
+from linkml_runtime.dumpers import json_dumper
+
+from oaklib.datamodels.lexical_index import LexicalIndex, LexicalGrouping, RelationshipToTerm, \
+    LexicalTransformationPipeline
+
+MAGIC = b'OAKLIX01'
+
+# files with this suffix are saved in the binary format by default
+BINARY_LEXICAL_INDEX_SUFFIX = '.lexindex'
+FORMAT_VERSION = 1
+
+# string number used for a missing value
+NONE = 0xFFFFFFFF
+
+# (name, typecode) of each array, in the order they are written
+SECTIONS = [('string_offsets', 'Q'),
+            ('strings', 'B'),
+            ('grouping_term', 'I'),
+            ('grouping_start', 'Q'),
+            ('predicate', 'I'),
+            ('element', 'I'),
+            ('element_term', 'I'),
+            ('source', 'I'),
+            ('pipeline', 'I')]
+
+_ALIGNMENT = 8
+
+
+def is_binary_lexical_index(path: Union[str, Path]) -> bool:
+    """
+    True if path is a file in the binary lexical index format
+
+    :param path:
+    :return:
+    """
+    with open(path, 'rb') as stream:
+        return stream.read(len(MAGIC)) == MAGIC
+
+
+def _new(cls, **kwargs):
+    # instantiates a datamodel class without re-validating values that were already validated when saved
+    obj = cls.__new__(cls)
+    obj.__dict__.update({f.name: None for f in fields(cls)})
+    obj.__dict__.update(kwargs)
+    return obj
+
+
+def _pad(n: int) -> int:
+    return -n % _ALIGNMENT
+
+
+def save_binary_lexical_index(lexical_index: LexicalIndex, path: Union[str, Path]) -> None:
+    """
+    Saves a lexical index in the binary format
+
+    :param lexical_index:
+    :param path:
+    :return:
+    """
+    string_ids: Dict[str, int] = {}
+    pipeline_set_ids: Dict[Tuple[str, ...], int] = {}
+
+    def intern(s: str) -> int:
+        if s is None:
+            return NONE
+        s = str(s)
+        if s not in string_ids:
+            string_ids[s] = len(string_ids)
+        return string_ids[s]
+
+    columns = {name: array(typecode) for name, typecode in SECTIONS}
+    for term in sorted(lexical_index.groupings.keys(), key=lambda t: str(t).encode('utf-8')):
+        grouping = lexical_index.groupings[term]
+        columns['grouping_term'].append(intern(term))
+        columns['grouping_start'].append(len(columns['predicate']))
+        for r in grouping.relationships:
+            columns['predicate'].append(intern(r.predicate))
+            columns['element'].append(intern(r.element))
+            columns['element_term'].append(intern(r.element_term))
+            columns['source'].append(intern(r.source))
+            pipeline_set = tuple(str(p) for p in r.pipeline)
+            if pipeline_set not in pipeline_set_ids:
+                pipeline_set_ids[pipeline_set] = len(pipeline_set_ids)
+            columns['pipeline'].append(pipeline_set_ids[pipeline_set])
+    columns['grouping_start'].append(len(columns['predicate']))
+    offset = 0
+    for s in string_ids:
+        columns['string_offsets'].append(offset)
+        encoded = s.encode('utf-8')
+        columns['strings'].frombytes(encoded)
+        offset += len(encoded)
+    columns['string_offsets'].append(offset)
+
+    sections = {}
+    offset = 0
+    for name, _ in SECTIONS:
+        length = len(columns[name]) * columns[name].itemsize
+        sections[name] = [offset, length]
+        offset += length + _pad(length)
+    header = {'version': FORMAT_VERSION,
+              'byteorder': sys.byteorder,
+              'pipelines': [json_dumper.to_dict(p) for p in lexical_index.pipelines.values()],
+              'pipeline_sets': [list(ps) for ps in pipeline_set_ids],
+              'sections': sections}
+    header_bytes = json.dumps(header).encode('utf-8')
+    with open(path, 'wb') as stream:
+        stream.write(MAGIC)
+        stream.write(len(header_bytes).to_bytes(8, 'little'))
+        stream.write(header_bytes)
+        stream.write(b'\0' * _pad(len(header_bytes)))
+        for name, _ in SECTIONS:
+            data = columns[name].tobytes()
+            stream.write(data)
+            stream.write(b'\0' * _pad(len(data)))
+
+
+class BinaryLexicalIndexReader:
+    """
+    Reads groupings from the contents of a binary lexical index file
+    """
+
+    def __init__(self, buffer: Union[bytes, mmap_module.mmap]):
+        self.buffer = buffer
+        if bytes(buffer[0:len(MAGIC)]) != MAGIC:
+            raise ValueError('Not a binary lexical index')
+        pos = len(MAGIC)
+        header_length = int.from_bytes(buffer[pos:pos + 8], 'little')
+        pos += 8
+        header = json.loads(bytes(buffer[pos:pos + header_length]).decode('utf-8'))
+        if header['version'] != FORMAT_VERSION:
+            raise ValueError(f'Unsupported binary lexical index version: {header["version"]}')
+        data_start = pos + header_length + _pad(header_length)
+        self.header = header
+        self.pipeline_sets: List[List[str]] = header['pipeline_sets']
+        view = memoryview(buffer)
+        swap = header['byteorder'] != sys.byteorder
+        for name, typecode in SECTIONS:
+            offset, length = header['sections'][name]
+            section = view[data_start + offset:data_start + offset + length]
+            if swap:
+                # arrays are only used in place if they were written with this machine's byte order
+                swapped = array(typecode)
+                swapped.frombytes(section)
+                swapped.byteswap()
+                section = swapped
+            else:
+                section = section.cast(typecode)
+            setattr(self, name, section)
+        self._strings: Dict[int, str] = {}
+
+    def pipelines(self) -> Dict[str, LexicalTransformationPipeline]:
+        pipelines = [LexicalTransformationPipeline(**p) for p in self.header['pipelines']]
+        return {p.name: p for p in pipelines}
+
+    def string(self, i: int) -> str:
+        if i == NONE:
+            return None
+        s = self._strings.get(i, None)
+        if s is None:
+            s = str(self.strings[self.string_offsets[i]:self.string_offsets[i + 1]], 'utf-8')
+            self._strings[i] = s
+        return s
+
+    def _term_bytes(self, i: int) -> bytes:
+        s = self.grouping_term[i]
+        return bytes(self.strings[self.string_offsets[s]:self.string_offsets[s + 1]])
+
+    def __len__(self) -> int:
+        return len(self.grouping_term)
+
+    def term(self, i: int) -> str:
+        return self.string(self.grouping_term[i])
+
+    def index_of(self, term: str) -> int:
+        """
+        Finds a grouping by binary search over the sorted terms
+
+        :param term:
+        :return: position of the grouping, or -1 if there is no grouping for the term
+        """
+        key = term.encode('utf-8')
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term_bytes(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self) and self._term_bytes(lo) == key:
+            return lo
+        return -1
+
+    def grouping(self, i: int) -> LexicalGrouping:
+        string = self.string
+        rels = []
+        for j in range(self.grouping_start[i], self.grouping_start[i + 1]):
+            rels.append(_new(RelationshipToTerm,
+                             predicate=string(self.predicate[j]),
+                             element=string(self.element[j]),
+                             element_term=string(self.element_term[j]),
+                             source=string(self.source[j]),
+                             pipeline=list(self.pipeline_sets[self.pipeline[j]])))
+        return _new(LexicalGrouping, term=self.term(i), relationships=rels)
+
+
+class LazyGroupings(Mapping):
+    """
+    A read-only mapping between terms and groupings, where each grouping is only read from the file when accessed
+    """
+
+    def __init__(self, reader: BinaryLexicalIndexReader):
+        self.reader = reader
+
+    def __getitem__(self, term: str) -> LexicalGrouping:
+        i = self.reader.index_of(term)
+        if i < 0:
+            raise KeyError(term)
+        return self.reader.grouping(i)
+
+    def __contains__(self, term) -> bool:
+        return isinstance(term, str) and self.reader.index_of(term) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self.reader)):
+            yield self.reader.term(i)
+
+    def __len__(self) -> int:
+        return len(self.reader)
+
+    def items(self) -> Iterator[Tuple[str, LexicalGrouping]]:
+        for i in range(len(self.reader)):
+            yield self.reader.term(i), self.reader.grouping(i)
+
+    def values(self) -> Iterator[LexicalGrouping]:
+        for i in range(len(self.reader)):
+            yield self.reader.grouping(i)
+
+
+def load_binary_lexical_index(path: Union[str, Path], mmap: bool = False) -> LexicalIndex:
+    """
+    Loads a lexical index in the binary format
+
+    :param path:
+    :param mmap: if True, memory-map the file, and read groupings only when they are accessed.
+                 The groupings of the resulting index cannot be modified
+    :return:
+    """
+    with open(path, 'rb') as stream:
+        if mmap:
+            buffer = mmap_module.mmap(stream.fileno(), 0, access=mmap_module.ACCESS_READ)
+        else:
+            buffer = stream.read()
+    reader = BinaryLexicalIndexReader(buffer)
+    if mmap:
+        groupings = LazyGroupings(reader)
+    else:
+        groupings = {reader.term(i): reader.grouping(i) for i in range(len(reader))}
+    return _new(LexicalIndex, groupings=groupings, pipelines=reader.pipelines())
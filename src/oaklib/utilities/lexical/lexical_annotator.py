@@ -0,0 +1,309 @@
+"""
+Lexical Text Annotation
+-----------------------
+
+Annotates texts locally, by finding the labels and synonyms of a :class:`LexicalIndex` in them.
+
+All terms in the index are compiled into an `Aho-Corasick <https://en.wikipedia.org/wiki/Aho-Corasick_algorithm>`_
+automaton over words, so each text is annotated in a single pass, regardless of the number of terms:
+
+.. code:: python
+
+    >>> annotator = LexicalAnnotator.from_lexical_index(create_lexical_index(oi))
+    >>> for ann in annotator.annotate('enlarged nucleus in T-cells'):
+    ...     print(ann.object_id, ann.match_string)
+
+Texts and terms are split into words in the same way, and each word is normalized using the
+pipelines of the index, so matches always start and end at word boundaries. Hyphens are treated as spaces,
+so "T-cell" matches "T cell". Transformations of whole terms (word order normalization and term expansion)
+cannot be applied to each word separately, so indexes with these pipelines cannot be used for annotation.
+"""
+import logging
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from oaklib.datamodels.lexical_index import LexicalIndex, LexicalTransformationPipeline, TransformationType
+from oaklib.datamodels.text_annotator import TextAnnotation
+from oaklib.datamodels.vocabulary import LABEL_PREDICATE, HAS_EXACT_SYNONYM, HAS_NARROW_SYNONYM, \
+    HAS_BROAD_SYNONYM, HAS_RELATED_SYNONYM
+from oaklib.interfaces.basic_ontology_interface import PRED_CURIE
+from oaklib.types import CURIE
+from oaklib.utilities.lexical.transformations import TRANSFORMER, WORD_CACHE_SIZE, compile_pipeline
+
+# words and single punctuation characters; hyphens separate words, but are not themselves words
+_TOKEN_RE = re.compile(r'\w+|[^\w\s-]')
+
+# predicates used for annotation, from most to least preferred
+ANNOTATION_PREDICATES = [LABEL_PREDICATE, HAS_EXACT_SYNONYM, HAS_NARROW_SYNONYM, HAS_BROAD_SYNONYM,
+                         HAS_RELATED_SYNONYM]
+
+# terms shorter than this are not used for annotation
+DEFAULT_MIN_LENGTH = 3
+
+# transformations that rearrange or rewrite whole terms, and so give different results when applied word by word
+TERM_TRANSFORMATIONS = [TransformationType.WordOrderNormalization.text, TransformationType.TermExpanson.text]
+
+SPAN = Tuple[int, int]
+
+
+def tokenize(text: str) -> List[SPAN]:
+    """
+    Splits a text into words
+
+    :param text:
+    :return: start and end offset of each word
+    """
+    return [m.span() for m in _TOKEN_RE.finditer(text)]
+
+
+class AhoCorasickAutomaton:
+    """
+    Finds all occurrences of a set of word sequences in a sequence of words, in a single pass
+
+    .. code:: python
+
+        >>> automaton = AhoCorasickAutomaton()
+        >>> automaton.add(['nuclear', 'membrane'], 'GO:0031965')
+        >>> automaton.build()
+        >>> list(automaton.iter_matches(['the', 'nuclear', 'membrane']))
+        [(1, 3, ['GO:0031965'])]
+    """
+
+    def __init__(self):
+        self.transitions: List[Dict[str, int]] = [{}]
+        self.depth: List[int] = [0]
+        self.fail: List[int] = [0]
+        self.outputs: List[Tuple[int, ...]] = [()]
+        self.values: Dict[int, list] = {}
+        self.built = False
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def add(self, words: Sequence[str], value) -> None:
+        """
+        Adds a word sequence, with a value to be returned when it is found
+
+        :param words:
+        :param value: added to the values for the sequence
+        :return:
+        """
+        if not words:
+            raise ValueError('Cannot add an empty sequence')
+        state = 0
+        for word in words:
+            next_state = self.transitions[state].get(word, None)
+            if next_state is None:
+                next_state = len(self.transitions)
+                self.transitions[state][word] = next_state
+                self.transitions.append({})
+                self.depth.append(self.depth[state] + 1)
+                self.fail.append(0)
+                self.outputs.append(())
+            state = next_state
+        self.values.setdefault(state, []).append(value)
+        self.built = False
+
+    def build(self) -> None:
+        """
+        Computes failure links; must be called after the last sequence is added
+
+        :return:
+        """
+        for state in self.values:
+            self.outputs[state] = (state,)
+        queue = deque(self.transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, next_state in self.transitions[state].items():
+                queue.append(next_state)
+                f = self.fail[state]
+                while f and word not in self.transitions[f]:
+                    f = self.fail[f]
+                fail_state = self.transitions[f].get(word, 0)
+                self.fail[next_state] = fail_state
+                if self.outputs[fail_state]:
+                    self.outputs[next_state] = self.outputs[next_state] + self.outputs[fail_state]
+        self.built = True
+
+    def iter_matches(self, words: Sequence[str]) -> Iterator[Tuple[int, int, list]]:
+        """
+        Finds all occurrences of the sequences in words, including overlapping ones
+
+        :param words:
+        :return: iterator over start and end positions (in words) of each occurrence, with the values of the sequence
+        """
+        if not self.built:
+            raise ValueError('Automaton must be built before it is used')
+        transitions = self.transitions
+        fail = self.fail
+        outputs = self.outputs
+        state = 0
+        for i, word in enumerate(words):
+            while state and word not in transitions[state]:
+                state = fail[state]
+            state = transitions[state].get(word, 0)
+            for matched in outputs[state]:
+                yield i + 1 - self.depth[matched], i + 1, self.values[matched]
+
+
+def _preferred(pred: PRED_CURIE, current: Optional[PRED_CURIE]) -> bool:
+    if current is None:
+        return True
+    return ANNOTATION_PREDICATES.index(pred) < ANNOTATION_PREDICATES.index(current)
+
+
+def _longest_spans(spans: Iterable[SPAN]) -> set:
+    # a span is longest if it is not contained in any other span
+    longest = set()
+    max_end = -1
+    for start, end in sorted(set(spans), key=lambda s: (s[0], -s[1])):
+        if end > max_end:
+            longest.add((start, end))
+            max_end = end
+    return longest
+
+
+@dataclass
+class LexicalAnnotator:
+    """
+    Annotates texts using terms compiled from a lexical index
+
+    Annotators do not refer to the ontology they were made from, so they can be pickled and sent to other processes
+    """
+    pipelines: List[LexicalTransformationPipeline] = field(default_factory=list)
+    automata: Dict[str, AhoCorasickAutomaton] = field(default_factory=dict)
+    labels: Dict[CURIE, str] = field(default_factory=dict)
+    longest_match_only: bool = False
+    _normalizers: Dict[str, Tuple[TRANSFORMER, Dict[str, str]]] = field(default=None, init=False, repr=False)
+
+    @classmethod
+    def from_lexical_index(cls, lexical_index: LexicalIndex, predicates: List[PRED_CURIE] = None,
+                           min_length: int = DEFAULT_MIN_LENGTH, longest_match_only: bool = False) -> "LexicalAnnotator":
+        """
+        Compiles the terms in a lexical index
+
+        :param lexical_index:
+        :param predicates: only use terms for these predicates (defaults to labels and synonyms)
+        :param min_length: only use terms with at least this many characters
+        :param longest_match_only: if True, only return annotations that are not contained in another annotation
+        :return:
+        """
+        for pipeline in lexical_index.pipelines.values():
+            unsupported = [str(tr.type) for tr in pipeline.transformations if str(tr.type) in TERM_TRANSFORMATIONS]
+            if unsupported:
+                raise ValueError(f'Cannot annotate using pipeline {pipeline.name}: {unsupported} '
+                                 f'transform whole terms, not single words')
+        if predicates is None:
+            predicates = ANNOTATION_PREDICATES
+        else:
+            unknown = [p for p in predicates if p not in ANNOTATION_PREDICATES]
+            if unknown:
+                raise ValueError(f'Cannot annotate using {unknown}; allowed: {ANNOTATION_PREDICATES}')
+        predicates = set(predicates)
+        annotator = cls(pipelines=list(lexical_index.pipelines.values()), longest_match_only=longest_match_only)
+        # pipeline -> words -> element -> predicate
+        patterns: Dict[str, Dict[Tuple[str, ...], Dict[CURIE, PRED_CURIE]]] = {}
+        for grouping in lexical_index.groupings.values():
+            for r in grouping.relationships:
+                if r.predicate == LABEL_PREDICATE:
+                    annotator.labels[r.element] = r.element_term
+                if r.predicate not in predicates or len(r.element_term) < min_length:
+                    continue
+                for pipeline_name in r.pipeline:
+                    pipeline_name = str(pipeline_name)
+                    normalize = annotator._normalizer(pipeline_name)
+                    text = r.element_term
+                    words = tuple(normalize(text[start:end]) for start, end in tokenize(text))
+                    if not words:
+                        continue
+                    elements = patterns.setdefault(pipeline_name, {}).setdefault(words, {})
+                    if _preferred(r.predicate, elements.get(r.element, None)):
+                        elements[r.element] = r.predicate
+        for pipeline_name, pipeline_patterns in patterns.items():
+            automaton = AhoCorasickAutomaton()
+            for words, elements in pipeline_patterns.items():
+                for element, pred in sorted(elements.items()):
+                    automaton.add(words, (element, pred))
+            automaton.build()
+            logging.info(f'Compiled {len(automaton)} terms for pipeline {pipeline_name}')
+            annotator.automata[pipeline_name] = automaton
+        return annotator
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_normalizers'] = None
+        return state
+
+    def _normalizer(self, pipeline_name: str) -> TRANSFORMER:
+        if self._normalizers is None:
+            self._normalizers = {}
+        if pipeline_name not in self._normalizers:
+            pipelines = {p.name: p for p in self.pipelines}
+            if pipeline_name not in pipelines:
+                raise ValueError(f'No such pipeline: {pipeline_name}')
+            self._normalizers[pipeline_name] = compile_pipeline(pipelines[pipeline_name]), {}
+        transform, cache = self._normalizers[pipeline_name]
+
+        def normalize(word: str) -> str:
+            normalized = cache.get(word, None)
+            if normalized is None:
+                if len(cache) >= WORD_CACHE_SIZE:
+                    cache.clear()
+                normalized = transform(word)
+                cache[word] = normalized
+            return normalized
+        return normalize
+
+    def annotate(self, text: str, text_id: str = None) -> List[TextAnnotation]:
+        """
+        Annotates a piece of text
+
+        Positions follow the same convention as BioPortal: subject_start is the 1-based position of the
+        first character of the match, and subject_end the position of the last character
+
+        :param text:
+        :param text_id: if set, used as the subject_text_id of each annotation
+        :return: annotations, ordered by position
+        """
+        spans = tokenize(text)
+        words = [text[start:end] for start, end in spans]
+        # (start, end, element) -> predicate
+        found: Dict[Tuple[int, int, CURIE], PRED_CURIE] = {}
+        for pipeline_name, automaton in self.automata.items():
+            normalize = self._normalizer(pipeline_name)
+            for i, j, values in automaton.iter_matches([normalize(w) for w in words]):
+                start, end = spans[i][0], spans[j - 1][1]
+                for element, pred in values:
+                    key = start, end, element
+                    if _preferred(pred, found.get(key, None)):
+                        found[key] = pred
+        longest = _longest_spans((start, end) for start, end, _ in found)
+        annotations = []
+        for (start, end, element), pred in sorted(found.items()):
+            is_longest = (start, end) in longest
+            if self.longest_match_only and not is_longest:
+                continue
+            annotations.append(TextAnnotation(subject_start=start + 1,
+                                              subject_end=end,
+                                              subject_text_id=text_id,
+                                              match_string=text[start:end],
+                                              object_id=element,
+                                              object_label=self.labels.get(element, None),
+                                              match_type=pred,
+                                              is_longest_match=is_longest))
+        return annotations
+
+    def annotate_batch(self, texts: Iterable[str]) -> Iterator[List[TextAnnotation]]:
+        """
+        Annotates each text in turn
+
+        Normalized words are cached between texts, so this is faster than annotating texts separately
+
+        :param texts:
+        :return: iterator over the annotations of each text, in the same order as texts
+        """
+        for text in texts:
+            yield self.annotate(text)
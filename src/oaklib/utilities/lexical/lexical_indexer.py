@@ -5,26 +5,45 @@ Lexical Utilities
 Various utilities for working with lexical aspects of ontologies plus mappings
 
 """
+import hashlib
 import logging
-import re
 from collections import defaultdict
-from typing import List, Dict, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple, Iterator, Iterable, Collection, FrozenSet, Set
 
 from linkml_runtime.dumpers import yaml_dumper
 from linkml_runtime.loaders import yaml_loader
 from oaklib.interfaces import BasicOntologyInterface
-from oaklib.types import PRED_CURIE
+from oaklib.types import CURIE, PRED_CURIE
 from oaklib.datamodels.lexical_index import LexicalIndex, LexicalTransformation, TransformationType, RelationshipToTerm, \
     LexicalGrouping, LexicalTransformationPipeline
 from oaklib.datamodels.mapping_rules_datamodel import Precondition, MappingRuleCollection
 from oaklib.datamodels.vocabulary import SKOS_EXACT_MATCH, SKOS_BROAD_MATCH, SKOS_NARROW_MATCH, \
     SKOS_CLOSE_MATCH
 from oaklib.utilities.basic_utils import pairs_as_dict
+from oaklib.utilities.iterator_utils import chunk_to_lists, ordered_map
+from oaklib.utilities.lexical.binary_lexical_index import save_binary_lexical_index, load_binary_lexical_index, \
+    is_binary_lexical_index, BINARY_LEXICAL_INDEX_SUFFIX
+from oaklib.utilities.lexical.ngram_index import similar_term_pairs, DEFAULT_SIMILARITY_THRESHOLD, DEFAULT_NGRAM_SIZE
+from oaklib.utilities.lexical.transformations import compile_pipeline, compile_transformation
+from oaklib.utilities.mapping.sssom_utils import LEXICAL_MAPPING_COLUMNS
 from sssom import Mapping
 from sssom.sssom_document import MappingSetDocument
 from sssom.util import MappingSetDataFrame, to_mapping_set_dataframe
 from sssom.sssom_datamodel import MatchTypeEnum, MappingSet
 
+# entities fetched and normalized at a time; small enough to stay within SQL variable limits
+DEFAULT_CHUNK_SIZE = 500
+
+# mappings generated before their labels are fetched
+LABEL_BATCH_SIZE = 1000
+
+# confidence of a fuzzy mapping between terms with identical n-grams; lower than for exact matches
+DEFAULT_FUZZY_MAX_CONFIDENCE = 0.5
+
 def add_labels_from_uris(oi: BasicOntologyInterface):
     """
     Adds a label based on the CURIE or URI for entities that lack labels
@@ -45,15 +64,24 @@ def add_labels_from_uris(oi: BasicOntologyInterface):
 
 
 def create_lexical_index(oi: BasicOntologyInterface,
-                         pipelines: List[LexicalTransformationPipeline] = None) -> LexicalIndex:
+                         pipelines: List[LexicalTransformationPipeline] = None,
+                         processes: int = None,
+                         chunk_size: int = DEFAULT_CHUNK_SIZE) -> LexicalIndex:
     """
     Generates a LexicalIndex keyed by normalized terms
 
     If the pipelines parameter is not specified, then default pipelines will be applied
     (currently CaseNormalization and WhitespaceNormalization)
 
+    Lexical data is fetched from the ontology in chunks of entities, using bulk methods such as
+    :meth:`BasicOntologyInterface.alias_map_for_curies` where the implementation provides them.
+    If processes is greater than 1, the terms of each chunk are normalized in a pool of worker processes,
+    and the partial indexes are merged in order, so the result is the same as for a serial build.
+
     :param oi:
     :param pipelines: list of transformation pipelines to apply
+    :param processes: number of worker processes (default: build in this process)
+    :param chunk_size: number of entities fetched and normalized at a time
     :return:
     """
     if pipelines is None:
@@ -62,74 +90,483 @@ def create_lexical_index(oi: BasicOntologyInterface,
         pipelines = [LexicalTransformationPipeline(name='default',
                                                    transformations=[step1, step2])]
     ix = LexicalIndex(pipelines={p.name: p for p in pipelines})
-    for curie in oi.all_entity_curies():
-        alias_map = oi.alias_map_by_curie(curie)
-        mapping_map = pairs_as_dict(oi.get_simple_mappings_by_curie(curie))
-        for pred, terms in {**alias_map, **mapping_map}.items():
-            for term in terms:
-                if not term:
-                    logging.warning(f'No term for {curie}.{pred}')
-                    continue
-                for pipeline in pipelines:
-                    term2 = term
-                    for tr in pipeline.transformations:
-                        term2 = apply_transformation(term, tr)
-                    rel = RelationshipToTerm(predicate=pred, element=curie, element_term=term, pipeline=pipeline.name)
-                    if term2 not in ix.groupings:
-                        ix.groupings[term2] = LexicalGrouping(term=term2)
-                    ix.groupings[term2].relationships.append(rel)
+    chunks = _lexical_entry_chunks(oi, chunk_size)
+    if processes is not None and processes > 1:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            # chunks are fetched only as workers become free, so the entries held in memory are bounded
+            index_entries = partial(_index_entries, pipelines=pipelines)
+            for partial_index in ordered_map(executor, index_entries, chunks, processes * 2):
+                _merge_partial_index(ix, partial_index)
+    else:
+        for entries in chunks:
+            _merge_partial_index(ix, _index_entries(entries, pipelines))
     return ix
 
-def save_lexical_index(lexical_index: LexicalIndex, path: str):
+
+# (element, predicate, term)
+LEXICAL_ENTRY = Tuple[CURIE, PRED_CURIE, str]
+# normalized term -> (predicate, element, term, pipeline name)
+PARTIAL_INDEX = Dict[str, List[Tuple[PRED_CURIE, CURIE, str, str]]]
+
+
+def _lexical_entry_chunks(oi: BasicOntologyInterface, chunk_size: int) -> Iterator[List[LEXICAL_ENTRY]]:
+    for curies in chunk_to_lists(oi.all_entity_curies(), chunk_size):
+        alias_maps = dict(oi.alias_map_for_curies(curies))
+        mapping_maps = dict(oi.get_simple_mappings_for_curies(curies))
+        entries = []
+        for curie in curies:
+            mapping_map = pairs_as_dict(mapping_maps[curie])
+            for pred, terms in {**alias_maps[curie], **mapping_map}.items():
+                for term in terms:
+                    if not term:
+                        logging.warning(f'No term for {curie}.{pred}')
+                        continue
+                    entries.append((curie, pred, term))
+        yield entries
+
+
+def _index_entries(entries: List[LEXICAL_ENTRY], pipelines: List[LexicalTransformationPipeline]) -> PARTIAL_INDEX:
+    compiled = [(pipeline.name, compile_pipeline(pipeline)) for pipeline in pipelines]
+    partial_index = defaultdict(list)
+    for curie, pred, term in entries:
+        for pipeline_name, transform in compiled:
+            partial_index[transform(term)].append((pred, curie, term, pipeline_name))
+    return partial_index
+
+
+def _merge_partial_index(ix: LexicalIndex, partial_index: PARTIAL_INDEX) -> None:
+    for term2, rels in partial_index.items():
+        if term2 not in ix.groupings:
+            ix.groupings[term2] = LexicalGrouping(term=term2)
+        relationships = ix.groupings[term2].relationships
+        for pred, curie, term, pipeline_name in rels:
+            relationships.append(RelationshipToTerm(predicate=pred, element=curie, element_term=term,
+                                                    pipeline=pipeline_name))
+
+@dataclass
+class LexicalIndexChanges:
     """
-    Saves a YAML using standard mapping of datanodel to YAML
+    Differences between the entities in a lexical index and in an ontology
+    """
+    added: Set[CURIE] = field(default_factory=set)
+    removed: Set[CURIE] = field(default_factory=set)
+    changed: Set[CURIE] = field(default_factory=set)
+    terms: Set[str] = field(default_factory=set)
+    """index terms whose groupings are affected"""
+    partial_index: PARTIAL_INDEX = field(default_factory=dict)
+    """relationships for the added and changed entities"""
+
+    def entities(self) -> Set[CURIE]:
+        return self.added | self.removed | self.changed
+
+
+def _content_hash(entries: Iterable[Tuple[PRED_CURIE, str]]) -> bytes:
+    h = hashlib.blake2b(digest_size=16)
+    for pred, term in sorted(set(entries)):
+        h.update(f'{pred}\t{term}\n'.encode('utf-8'))
+    return h.digest()
+
+
+def compute_lexical_index_changes(oi: BasicOntologyInterface, lexical_index: LexicalIndex,
+                                  chunk_size: int = DEFAULT_CHUNK_SIZE) -> LexicalIndexChanges:
+    """
+    Finds the entities that were added, removed or changed since a lexical index was built
+
+    The index records the predicate and term of every relationship, so the content of each entity
+    when the index was built is known from the index itself. Entities are compared by a hash of their
+    (predicate, term) pairs; only added and changed entities are normalized again
+
+    :param oi: current version of the ontology
+    :param lexical_index:
+    :param chunk_size: number of entities fetched at a time
+    :return:
+    """
+    old_entries = defaultdict(list)
+    old_terms = defaultdict(set)
+    for term, grouping in lexical_index.groupings.items():
+        for r in grouping.relationships:
+            old_entries[r.element].append((r.predicate, r.element_term))
+            old_terms[r.element].add(term)
+    old_hashes = {element: _content_hash(entries) for element, entries in old_entries.items()}
+    del old_entries
+    changes = LexicalIndexChanges()
+    seen = set()
+    new_entries = []
+    for entries in _lexical_entry_chunks(oi, chunk_size):
+        by_curie = defaultdict(list)
+        for curie, pred, term in entries:
+            by_curie[curie].append((pred, term))
+        for curie, pairs in by_curie.items():
+            seen.add(curie)
+            if curie not in old_hashes:
+                changes.added.add(curie)
+            elif old_hashes[curie] != _content_hash(pairs):
+                changes.changed.add(curie)
+            else:
+                continue
+            new_entries.extend((curie, pred, term) for pred, term in pairs)
+    changes.removed = set(old_hashes.keys()) - seen
+    pipelines = list(lexical_index.pipelines.values())
+    changes.partial_index = _index_entries(new_entries, pipelines)
+    for curie in changes.changed | changes.removed:
+        changes.terms.update(old_terms[curie])
+    changes.terms.update(changes.partial_index.keys())
+    logging.info(f'Lexical index changes: {len(changes.added)} added, {len(changes.removed)} removed, '
+                 f'{len(changes.changed)} changed; {len(changes.terms)} groupings affected')
+    return changes
+
+
+def apply_lexical_index_changes(lexical_index: LexicalIndex, changes: LexicalIndexChanges) -> None:
+    """
+    Updates the affected groupings of a lexical index
+
+    :param lexical_index: index to update in place
+    :param changes: from :func:`compute_lexical_index_changes`
+    :return:
+    """
+    entities = changes.entities()
+    for term in changes.terms:
+        grouping = lexical_index.groupings.get(term, None)
+        if grouping is None:
+            continue
+        grouping.relationships = [r for r in grouping.relationships if r.element not in entities]
+        if not grouping.relationships:
+            del lexical_index.groupings[term]
+    _merge_partial_index(lexical_index, changes.partial_index)
+
+
+def update_lexical_index(oi: BasicOntologyInterface, lexical_index: LexicalIndex,
+                         chunk_size: int = DEFAULT_CHUNK_SIZE) -> LexicalIndexChanges:
+    """
+    Brings a lexical index up to date with an ontology, re-indexing only added, removed or changed entities
+
+    :param oi: current version of the ontology
+    :param lexical_index: index to update in place
+    :param chunk_size: number of entities fetched at a time
+    :return: changes made
+    """
+    changes = compute_lexical_index_changes(oi, lexical_index, chunk_size=chunk_size)
+    apply_lexical_index_changes(lexical_index, changes)
+    return changes
+
+
+def _mapping_key(m: Mapping) -> tuple:
+    return tuple(str(getattr(m, c, None)) for c in LEXICAL_MAPPING_COLUMNS)
+
+
+def incremental_lexmatch(oi: BasicOntologyInterface, lexical_index: LexicalIndex,
+                         ruleset: MappingRuleCollection = None,
+                         max_bucket_size: int = None,
+                         source_sets: List[Collection[str]] = None) -> Tuple[LexicalIndexChanges, List[Mapping], List[Mapping]]:
+    """
+    Updates a lexical index, and finds the mappings that changed as a result
+
+    Only the affected groupings are compared, before and after the update
+
+    :param oi: current version of the ontology
+    :param lexical_index: index to update in place
+    :param ruleset:
+    :param max_bucket_size: see :func:`lexical_index_to_mappings`
+    :param source_sets: see :func:`lexical_index_to_mappings`
+    :return: tuple of (changes, new mappings, mappings that no longer hold)
+    """
+    changes = compute_lexical_index_changes(oi, lexical_index)
+
+    def mappings() -> List[Mapping]:
+        return list(lexical_index_to_mappings(oi, lexical_index, ruleset=ruleset, max_bucket_size=max_bucket_size,
+                                              source_sets=source_sets, terms=changes.terms))
+    old_mappings = mappings()
+    apply_lexical_index_changes(lexical_index, changes)
+    new_mappings = mappings()
+    old_keys = {_mapping_key(m) for m in old_mappings}
+    new_keys = {_mapping_key(m) for m in new_mappings}
+    added = [m for m in new_mappings if _mapping_key(m) not in old_keys]
+    removed = [m for m in old_mappings if _mapping_key(m) not in new_keys]
+    logging.info(f'{len(added)} mappings added, {len(removed)} removed')
+    return changes, added, removed
+
+
+def save_lexical_index(lexical_index: LexicalIndex, path: str, format: str = None):
+    """
+    Saves a lexical index
+
+    By default, the format is the compact binary format if the path ends in .lexindex, otherwise YAML;
+    see :mod:`.binary_lexical_index`
 
     :param lexical_index:
     :param path:
+    :param format: yaml or binary (guessed from the path if not set)
     :return:
     """
-    yaml_dumper.dump(lexical_index, to_file=path)
+    if format is None:
+        format = 'binary' if Path(path).suffix.lower() == BINARY_LEXICAL_INDEX_SUFFIX else 'yaml'
+    if format == 'yaml':
+        if not isinstance(lexical_index.groupings, dict):
+            # e.g. memory-mapped groupings
+            lexical_index = LexicalIndex(groupings=dict(lexical_index.groupings.items()),
+                                         pipelines=lexical_index.pipelines)
+        yaml_dumper.dump(lexical_index, to_file=path)
+    elif format == 'binary':
+        save_binary_lexical_index(lexical_index, path)
+    else:
+        raise ValueError(f'Unknown lexical index format: {format}')
 
-def load_lexical_index(path: str) -> LexicalIndex:
+def load_lexical_index(path: str, mmap: bool = False) -> LexicalIndex:
     """
-    Loads from a YAML file
+    Loads from a binary or YAML file
 
     :param path:
+    :param mmap: memory-map binary files, reading groupings only when accessed
     :return:
     """
+    if is_binary_lexical_index(path):
+        return load_binary_lexical_index(path, mmap=mmap)
     return yaml_loader.load(path, target_class=LexicalIndex)
 
-def lexical_index_to_sssom(oi: BasicOntologyInterface, lexical_index: LexicalIndex, id='default',
-                           ruleset: MappingRuleCollection = None) -> MappingSetDataFrame:
+def lexical_index_to_mappings(oi: BasicOntologyInterface, lexical_index: LexicalIndex,
+                              ruleset: MappingRuleCollection = None,
+                              max_bucket_size: int = None,
+                              source_sets: List[Collection[str]] = None,
+                              terms: Collection[str] = None) -> Iterator[Mapping]:
     """
-    Transform a lexical index to an SSSOM MappingSetDataFrame by finding all pairs for any given index term
+    Generates mappings from a lexical index by finding all pairs for any given index term
+
+    Mappings are yielded as they are generated. A grouping with k elements yields O(k^2) pairs;
+    groupings with more than max_bucket_size elements are skipped, as these are typically uninformative
+    terms (e.g. "protein") shared by many entities
+
+    If source sets are given, only mappings between sources are generated, e.g. ``[{'MONDO'}, {'DOID'}]``
+    to map MONDO to DOID. Each element is assigned to the first set containing its prefix (or a namespace
+    it starts with, for URIs); elements in no set are ignored, and pairs within a set are never compared.
+    The subject of each mapping is from the earlier of the two sets.
 
     :param oi:
     :param lexical_index:
-    :param id:
-    :return:
+    :param ruleset:
+    :param max_bucket_size: maximum number of distinct elements in a grouping (default: no maximum)
+    :param source_sets: two or more sets of prefixes or URI namespaces
+    :param terms: only generate mappings for the groupings of these terms (default: all groupings)
+    :return: iterator over mappings
     """
-    mappings = []
+    engine = MappingRuleEngine(ruleset)
+    labels: Dict[CURIE, Optional[str]] = {}
+    if terms is None:
+        groupings = lexical_index.groupings.items()
+    else:
+        groupings = ((t, lexical_index.groupings[t]) for t in sorted(terms) if t in lexical_index.groupings)
+    for batch in chunk_to_lists(_unlabeled_mappings(groupings, engine, max_bucket_size, source_sets),
+                                LABEL_BATCH_SIZE):
+        _add_labels(oi, batch, labels)
+        yield from batch
+
+
+def _unlabeled_mappings(groupings: Iterable[Tuple[str, LexicalGrouping]], engine: "MappingRuleEngine",
+                        max_bucket_size: Optional[int],
+                        source_sets: Optional[List[Collection[str]]]) -> Iterator[Mapping]:
     logging.info('Converting lexical index to SSSOM')
-    for term, grouping in lexical_index.groupings.items():
-        elements = set([r.element for r in grouping.relationships])
+    if source_sets is not None:
+        if len(source_sets) < 2:
+            raise ValueError(f'At least two source sets are needed for cross-source matching; got {source_sets}')
+        source_of = SourcePartitioner(source_sets)
+    else:
+        source_of = None
+    n_skipped = 0
+    for term, grouping in groupings:
         elementmap = defaultdict(list)
         for r in grouping.relationships:
             elementmap[r.element].append(r)
-        if len(elementmap.keys()) < 2:
+        if source_of is None:
+            if len(elementmap.keys()) < 2:
+                continue
+            partitions = None
+        else:
+            partitions = source_of.partition(elementmap.keys())
+            if sum(1 for p in partitions if p) < 2:
+                continue
+        n_elements = len(elementmap.keys()) if partitions is None else sum(len(p) for p in partitions)
+        if max_bucket_size is not None and n_elements > max_bucket_size:
+            logging.info(f'Skipping "{term}", which has {n_elements} elements')
+            n_skipped += 1
             continue
-        for e1 in elementmap:
-            for e2 in elementmap:
-                if e1 < e2:
-                    for r1 in elementmap[e1]:
-                        for r2 in elementmap[e2]:
-                            mappings.append(inferred_mapping(oi, term, r1, r2, ruleset=ruleset))
-
-        #for r1 in grouping.relationships:
-        #    for r2 in grouping.relationships:
-        #        if r1.element < r2.element:
-        #            mappings.append(create_mapping(oi, term, r1, r2))
+        for e1, e2 in _element_pairs(elementmap.keys(), partitions):
+            for r1 in elementmap[e1]:
+                for r2 in elementmap[e2]:
+                    yield engine.infer(term, r1, r2)
+    if n_skipped:
+        logging.warning(f'Skipped {n_skipped} groupings with more than {max_bucket_size} elements')
     logging.info('Done creating SSSOM mappings')
+
+
+def _add_labels(oi: BasicOntologyInterface, mappings: List[Mapping], labels: Dict[CURIE, Optional[str]]) -> None:
+    # fetches labels for a batch of mappings in one call, reusing those fetched for earlier batches
+    curies = {str(c) for m in mappings for c in (m.subject_id, m.object_id)}.difference(labels)
+    if curies:
+        for curie, label in oi.get_labels_for_curies(list(curies)):
+            labels.setdefault(curie, label)
+        for curie in curies:
+            labels.setdefault(curie, None)
+    for m in mappings:
+        m.subject_label = labels[str(m.subject_id)]
+        m.object_label = labels[str(m.object_id)]
+
+
+def _element_pairs(elements: Iterable[CURIE], partitions: Optional[List[List[CURIE]]]) -> Iterator[Tuple[CURIE, CURIE]]:
+    if partitions is None:
+        for e1 in elements:
+            for e2 in elements:
+                if e1 < e2:
+                    yield e1, e2
+    else:
+        for i, p1 in enumerate(partitions):
+            for p2 in partitions[i + 1:]:
+                for e1 in p1:
+                    for e2 in p2:
+                        yield e1, e2
+
+
+class SourcePartitioner:
+    """
+    Assigns elements to sources, given as sets of prefixes or URI namespaces
+    """
+
+    def __init__(self, source_sets: List[Collection[str]]):
+        self.source_sets = source_sets
+        self.prefix_index: Dict[str, int] = {}
+        self.namespaces: List[Tuple[str, int]] = []
+        for i, source_set in enumerate(source_sets):
+            for source in source_set:
+                if '://' in source:
+                    self.namespaces.append((source, i))
+                else:
+                    self.prefix_index.setdefault(source, i)
+        self._cache: Dict[CURIE, Optional[int]] = {}
+
+    def source_index(self, element: CURIE) -> Optional[int]:
+        """
+        :param element: CURIE or URI
+        :return: position of the first source set the element belongs to, or None
+        """
+        if element not in self._cache:
+            i = None
+            if '://' in element:
+                for namespace, ns_index in self.namespaces:
+                    if element.startswith(namespace):
+                        i = ns_index
+                        break
+            else:
+                i = self.prefix_index.get(element.split(':')[0], None)
+            self._cache[element] = i
+        return self._cache[element]
+
+    def partition(self, elements: Iterable[CURIE]) -> List[List[CURIE]]:
+        """
+        :param elements:
+        :return: list of elements in each source set, in the order of the source sets
+        """
+        partitions = [[] for _ in self.source_sets]
+        for e in elements:
+            i = self.source_index(e)
+            if i is not None:
+                partitions[i].append(e)
+        return partitions
+
+
+def lexical_index_to_fuzzy_mappings(oi: BasicOntologyInterface, lexical_index: LexicalIndex,
+                                    threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+                                    ngram_size: int = DEFAULT_NGRAM_SIZE,
+                                    max_confidence: float = DEFAULT_FUZZY_MAX_CONFIDENCE,
+                                    max_bucket_size: int = None,
+                                    source_sets: List[Collection[str]] = None) -> Iterator[Mapping]:
+    """
+    Generates mappings between entities whose terms are similar, but not identical, e.g. because of typos
+
+    Similar index terms are found using :func:`similar_term_pairs`, and each pair of entities is mapped at most once,
+    using its most similar pair of terms. Entities that share a term are not mapped, as these are already mapped
+    by :func:`lexical_index_to_mappings`.
+
+    Mappings are skos:closeMatch, with a confidence of the similarity scaled by max_confidence, so that they
+    rank below exact lexical matches. The match strings are the two terms
+
+    :param oi:
+    :param lexical_index:
+    :param threshold: minimum n-gram similarity of two terms
+    :param ngram_size:
+    :param max_confidence: confidence of a mapping between terms with identical n-grams
+    :param max_bucket_size: see :func:`lexical_index_to_mappings`
+    :param source_sets: see :func:`lexical_index_to_mappings`
+    :return: iterator over mappings
+    """
+    if source_sets is not None:
+        if len(source_sets) < 2:
+            raise ValueError(f'At least two source sets are needed for cross-source matching; got {source_sets}')
+        source_of = SourcePartitioner(source_sets)
+    else:
+        source_of = None
+    groupings = lexical_index.groupings
+    terms = []
+    element_terms: Dict[CURIE, Set[str]] = defaultdict(set)
+    for term, grouping in groupings.items():
+        elements = {r.element for r in grouping.relationships}
+        if max_bucket_size is not None and len(elements) > max_bucket_size:
+            continue
+        terms.append(term)
+        for e in elements:
+            element_terms[e].add(term)
+    # (subject, object) -> (similarity, subject relationship, object relationship)
+    best: Dict[Tuple[CURIE, CURIE], Tuple[float, RelationshipToTerm, RelationshipToTerm]] = {}
+    for t1, t2, similarity in similar_term_pairs(terms, threshold=threshold, ngram_size=ngram_size):
+        for r1 in groupings[t1].relationships:
+            for r2 in groupings[t2].relationships:
+                e1, e2 = r1.element, r2.element
+                if e1 == e2 or element_terms[e1] & element_terms[e2]:
+                    continue
+                if source_of is None:
+                    swap = e1 > e2
+                else:
+                    s1, s2 = source_of.source_index(e1), source_of.source_index(e2)
+                    if s1 is None or s2 is None or s1 == s2:
+                        continue
+                    swap = s1 > s2
+                key, match = ((e2, e1), (similarity, r2, r1)) if swap else ((e1, e2), (similarity, r1, r2))
+                if key not in best or similarity > best[key][0]:
+                    best[key] = match
+    logging.info(f'Found {len(best)} fuzzy mappings')
+    mappings = []
+    for _, (similarity, r1, r2) in sorted(best.items(), key=lambda item: item[0]):
+        mappings.append(Mapping(subject_id=r1.element,
+                                object_id=r2.element,
+                                predicate_id=SKOS_CLOSE_MATCH,
+                                confidence=round(similarity * max_confidence, 3),
+                                match_string=[r1.element_term, r2.element_term],
+                                subject_match_field=[r1.predicate],
+                                object_match_field=[r2.predicate],
+                                match_type=MatchTypeEnum.Lexical,
+                                mapping_tool='oaklib'))
+    labels: Dict[CURIE, Optional[str]] = {}
+    for batch in chunk_to_lists(mappings, LABEL_BATCH_SIZE):
+        _add_labels(oi, batch, labels)
+        yield from batch
+
+
+def lexical_index_to_sssom(oi: BasicOntologyInterface, lexical_index: LexicalIndex, id='default',
+                           ruleset: MappingRuleCollection = None, max_bucket_size: int = None,
+                           source_sets: List[Collection[str]] = None) -> MappingSetDataFrame:
+    """
+    Transform a lexical index to an SSSOM MappingSetDataFrame by finding all pairs for any given index term
+
+    All mappings are held in memory; to write mappings as they are generated,
+    pass :func:`lexical_index_to_mappings` to a :class:`StreamingSssomWriter`
+
+    :param oi:
+    :param lexical_index:
+    :param id:
+    :param ruleset:
+    :param max_bucket_size: see :func:`lexical_index_to_mappings`
+    :param source_sets: see :func:`lexical_index_to_mappings`
+    :return:
+    """
+    mappings = list(lexical_index_to_mappings(oi, lexical_index, ruleset=ruleset, max_bucket_size=max_bucket_size,
+                                              source_sets=source_sets))
     mset = MappingSet(mapping_set_id=id, mappings=mappings, license='CC-0')
     #doc = MappingSetDocument(prefix_map=oi.get_prefix_map(), mapping_set=mset)
     doc = MappingSetDocument(prefix_map={}, mapping_set=mset)
@@ -150,52 +587,138 @@ def create_mapping(term: str, r1: RelationshipToTerm, r2: RelationshipToTerm,
                    )
 
 def inferred_mapping(oi: BasicOntologyInterface, term: str, r1: RelationshipToTerm, r2: RelationshipToTerm,
-                     ruleset: MappingRuleCollection = None) -> Mapping:
-    m1 = create_mapping(term, r1, r2)
-    m2 = create_mapping(term, r2, r1)
-    weightmap: Dict[PRED_CURIE, float] = {}
-    best: Tuple[float, Mapping, PRED_CURIE] = None, m1, m1.predicate_id
-    if ruleset is not None:
-        rules = ruleset.rules
-    else:
-        rules = []
-    for rule in rules:
-        inverted = False
-        if precondition_holds(rule.preconditions, m1):
-            m = m1
-        elif not rule.oneway and precondition_holds(rule.preconditions, m2):
-            m = m2
-            inverted = True
-        else:
-            m = None
-        if m:
-            weight = 0.0
-            if rule.postconditions.predicate_id:
-                m.predicate_id = rule.postconditions.predicate_id
-            if rule.postconditions.weight:
-                weight = rule.postconditions.weight
-            if inverted:
-                inv_pred = invert_mapping_predicate(m.predicate_id)
-                if inv_pred:
-                    m.predicate_id = inv_pred
-                else:
-                    m = None
-            if m:
-                if m.predicate_id not in weightmap:
-                    weightmap[m.predicate_id] = weight
-                else:
-                    weightmap[m.predicate_id] += weight
-                weight = weightmap[m.predicate_id]
-                if best[0] is None or weight > best[0]:
-                    best = weight, m, m.predicate_id
-                    #print(f' ** BEST {best} ==> {m}')
-    best_weight, best_mapping, _ = best
-    if best_weight is not None:
-        best_mapping.confidence = inverse_logit(best_weight)
+                     ruleset: MappingRuleCollection = None, engine: "MappingRuleEngine" = None) -> Mapping:
+    """
+    Creates a mapping between the elements of two relationships to the same term, using mapping rules
+
+    :param oi:
+    :param term:
+    :param r1:
+    :param r2:
+    :param ruleset:
+    :param engine: compiled rules; pass this when inferring many mappings with the same ruleset
+    :return:
+    """
+    if engine is None:
+        engine = MappingRuleEngine(ruleset)
+    best_mapping = engine.infer(term, r1, r2)
     best_mapping.subject_label = oi.get_label_by_curie(best_mapping.subject_id)
     best_mapping.object_label = oi.get_label_by_curie(best_mapping.object_id)
     return best_mapping
 
+
+@dataclass
+class CompiledMappingRule:
+    """
+    A mapping rule, with match field preconditions as sets (None if any field is allowed)
+    """
+    subject_match_fields: Optional[FrozenSet[PRED_CURIE]]
+    object_match_fields: Optional[FrozenSet[PRED_CURIE]]
+    oneway: bool
+    predicate_id: Optional[PRED_CURIE]
+    weight: Optional[float]
+
+    def holds(self, subject_match_field: PRED_CURIE, object_match_field: PRED_CURIE) -> bool:
+        return (self.subject_match_fields is None or
+                bool(subject_match_field) and subject_match_field in self.subject_match_fields) and \
+            (self.object_match_fields is None or
+             bool(object_match_field) and object_match_field in self.object_match_fields)
+
+
+def _match_fields(precondition: Precondition, k: str) -> Optional[FrozenSet[PRED_CURIE]]:
+    values = getattr(precondition, f'{k}_one_of', [])
+    return frozenset(values) if values else None
+
+
+@dataclass
+class MappingRuleEngine:
+    """
+    Evaluates mapping rules for pairs of relationships
+
+    The outcome of the rules only depends on the match fields (predicates) of the two relationships, so
+    rules are evaluated once for each combination of match fields, and the outcome is looked up thereafter
+    """
+    ruleset: MappingRuleCollection = None
+    rules: List[CompiledMappingRule] = field(default_factory=list)
+    outcomes: Dict[Tuple[PRED_CURIE, PRED_CURIE], Tuple[bool, PRED_CURIE, Optional[float]]] = \
+        field(default_factory=dict)
+
+    def __post_init__(self):
+        if self.ruleset is not None:
+            for rule in self.ruleset.rules:
+                post = rule.postconditions
+                self.rules.append(CompiledMappingRule(
+                    subject_match_fields=_match_fields(rule.preconditions, 'subject_match_field'),
+                    object_match_fields=_match_fields(rule.preconditions, 'object_match_field'),
+                    oneway=bool(rule.oneway),
+                    predicate_id=post.predicate_id if post else None,
+                    weight=post.weight if post else None))
+
+    def outcome(self, subject_match_field: PRED_CURIE,
+                object_match_field: PRED_CURIE) -> Tuple[bool, PRED_CURIE, Optional[float]]:
+        """
+        Evaluates the rules for a mapping between two relationships
+
+        :param subject_match_field: predicate of the first relationship
+        :param object_match_field: predicate of the second relationship
+        :return: tuple of (whether the mapping is inverted, mapping predicate, confidence)
+        """
+        key = subject_match_field, object_match_field
+        if key not in self.outcomes:
+            self.outcomes[key] = self._evaluate(subject_match_field, object_match_field)
+        return self.outcomes[key]
+
+    def _evaluate(self, subject_match_field: PRED_CURIE,
+                  object_match_field: PRED_CURIE) -> Tuple[bool, PRED_CURIE, Optional[float]]:
+        # predicates of the mapping in each orientation, each updated by the rules that apply to it
+        predicates = [SKOS_CLOSE_MATCH, SKOS_CLOSE_MATCH]
+        fields = [(subject_match_field, object_match_field), (object_match_field, subject_match_field)]
+        weightmap: Dict[PRED_CURIE, float] = {}
+        best_weight, best = None, 0
+        for rule in self.rules:
+            if rule.holds(*fields[0]):
+                i = 0
+            elif not rule.oneway and rule.holds(*fields[1]):
+                i = 1
+            else:
+                continue
+            weight = 0.0
+            if rule.predicate_id:
+                predicates[i] = rule.predicate_id
+            if rule.weight:
+                weight = rule.weight
+            if i == 1:
+                inv_pred = invert_mapping_predicate(predicates[i])
+                if inv_pred:
+                    predicates[i] = inv_pred
+                else:
+                    continue
+            pred = predicates[i]
+            if pred not in weightmap:
+                weightmap[pred] = weight
+            else:
+                weightmap[pred] += weight
+            weight = weightmap[pred]
+            if best_weight is None or weight > best_weight:
+                best_weight, best = weight, i
+        confidence = inverse_logit(best_weight) if best_weight is not None else None
+        return best == 1, predicates[best], confidence
+
+    def infer(self, term: str, r1: RelationshipToTerm, r2: RelationshipToTerm) -> Mapping:
+        """
+        Creates the best mapping between the elements of two relationships to the same term, without labels
+
+        :param term:
+        :param r1:
+        :param r2:
+        :return:
+        """
+        inverted, pred, confidence = self.outcome(r1.predicate, r2.predicate)
+        if inverted:
+            r1, r2 = r2, r1
+        return create_mapping(term, r1, r2, pred=pred, confidence=confidence)
+
+
 def inverse_logit(weight: float) -> float:
     """
     Inverse logit
@@ -230,17 +753,13 @@ def apply_transformation(term: str, transformation: LexicalTransformation) -> st
     """
     Apply an individual transformation on a term
 
+    To apply a whole pipeline to many terms, use :func:`compile_pipeline`
+
     :param term:
     :param transformation:
     :return:
     """
-    typ = str(transformation.type)
-    if typ == TransformationType.CaseNormalization.text:
-        return term.lower()
-    elif typ == TransformationType.WhitespaceNormalization.text:
-        return re.sub(" {2,}", " ", term.strip())
-    else:
-        raise NotImplementedError(f'Transformation Type {typ} {type(typ)} not implemented {TransformationType.CaseNormalization.text}')
+    return compile_transformation(transformation)(term)
 
     
 def save_mapping_rules(mapping_rules: MappingRuleCollection, path: str):
@@ -0,0 +1,101 @@
+"""
+Character N-gram Similarity
+---------------------------
+
+Finds pairs of similar terms, without comparing every term with every other term.
+
+Each term is represented by the set of its character n-grams (trigrams by default), and the similarity
+of two terms is the Jaccard similarity of their n-gram sets. Near-misses such as typos or
+hyphenation differences share most of their n-grams:
+
+.. code:: python
+
+    >>> list(similar_term_pairs(['nuclear envelope', 'nucelar envelope', 'cytoplasm'], threshold=0.6))
+    [('nucelar envelope', 'nuclear envelope', 0.6)]
+
+Candidate pairs are generated using prefix filtering: n-grams are ordered from rarest to most common,
+and two terms with a similarity of at least the threshold must share one of the first few (rare) n-grams
+of each term. Only terms that share such an n-gram are compared, and common n-grams are never used to
+find candidates, so the number of comparisons grows far slower than the square of the number of terms.
+"""
+import logging
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Tuple
+
+DEFAULT_NGRAM_SIZE = 3
+DEFAULT_SIMILARITY_THRESHOLD = 0.8
+
+# spaces, hyphens and similar characters are all treated as a single word separator
+_SEPARATOR_RE = re.compile(r'[\s\-_/]+')
+
+# tolerance for rounding errors when comparing sizes with the threshold
+_EPSILON = 1e-9
+
+
+def ngrams(term: str, n: int = DEFAULT_NGRAM_SIZE) -> FrozenSet[str]:
+    """
+    Character n-grams of a term
+
+    The term is padded with a space at each end, so that the start and end of a term contribute n-grams
+
+    :param term:
+    :param n:
+    :return: set of n-grams
+    """
+    padded = f' {_SEPARATOR_RE.sub(" ", term).strip()} '
+    if len(padded) <= n:
+        return frozenset([padded])
+    return frozenset(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+
+def jaccard_similarity(x: FrozenSet[str], y: FrozenSet[str]) -> float:
+    """
+    :param x:
+    :param y:
+    :return: size of the intersection of x and y, divided by the size of their union
+    """
+    overlap = len(x & y)
+    return overlap / (len(x) + len(y) - overlap) if overlap else 0.0
+
+
+def similar_term_pairs(terms: Iterable[str], threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+                       ngram_size: int = DEFAULT_NGRAM_SIZE) -> Iterator[Tuple[str, str, float]]:
+    """
+    Finds all pairs of distinct terms whose n-gram similarity is at least threshold
+
+    :param terms:
+    :param threshold: minimum Jaccard similarity, between 0 (exclusive) and 1
+    :param ngram_size:
+    :return: iterator over (term1, term2, similarity), with term1 < term2
+    """
+    if not 0 < threshold <= 1:
+        raise ValueError(f'Similarity threshold must be greater than 0 and at most 1; got {threshold}')
+    terms = sorted(set(terms))
+    gram_sets = [ngrams(t, ngram_size) for t in terms]
+    frequency = Counter(g for gram_set in gram_sets for g in gram_set)
+    rank: Dict[str, int] = {g: i for i, g in enumerate(sorted(frequency, key=lambda g: (frequency[g], g)))}
+    # the n-grams of each term, as ranks, rarest first
+    ranked: List[List[int]] = [sorted(rank[g] for g in gram_set) for gram_set in gram_sets]
+    # terms are indexed in order of size, so candidates for a term are never larger than it
+    index: Dict[int, List[int]] = defaultdict(list)
+    n_compared = 0
+    for i in sorted(range(len(terms)), key=lambda i: len(ranked[i])):
+        size = len(ranked[i])
+        min_size = threshold * size - _EPSILON
+        prefix = ranked[i][:size - math.ceil(threshold * size - _EPSILON) + 1]
+        candidates = set()
+        for g in prefix:
+            for j in index[g]:
+                if len(ranked[j]) >= min_size:
+                    candidates.add(j)
+        for j in sorted(candidates):
+            similarity = jaccard_similarity(gram_sets[i], gram_sets[j])
+            if similarity >= threshold:
+                t1, t2 = sorted((terms[i], terms[j]))
+                yield t1, t2, similarity
+        n_compared += len(candidates)
+        for g in prefix:
+            index[g].append(i)
+    logging.info(f'Compared {n_compared} candidate pairs of {len(terms)} terms')
@@ -0,0 +1,318 @@
+"""
+Lexical Transformations
+-----------------------
+
+Compiles lexical transformation pipelines into plain Python callables.
+
+Each :class:`LexicalTransformation` is compiled once, with any regular expressions or dictionaries it needs,
+and the steps of a pipeline are fused into a single function that applies them in order:
+
+.. code:: python
+
+    >>> normalize = compile_pipeline(pipeline)
+    >>> normalize('Nuclear  Membranes')
+    'membrane nuclear'
+
+Word-level transformations (stemming and depluralization) cache the result for each word,
+as the same words recur throughout an ontology.
+"""
+import csv
+import json
+import logging
+import re
+import time
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from oaklib.datamodels.lexical_index import LexicalTransformation, LexicalTransformationPipeline, TransformationType
+
+TRANSFORMER = Callable[[str], str]
+
+_SPACES_RE = re.compile(' {2,}')
+_WORD_RE = re.compile(r'\S+')
+
+# maximum number of distinct words whose stems are cached
+WORD_CACHE_SIZE = 2 ** 16
+
+
+# ----------------------------------------
+# Porter stemmer
+# ----------------------------------------
+
+def _is_consonant(word: str, i: int) -> bool:
+    c = word[i]
+    if c in 'aeiou':
+        return False
+    if c == 'y':
+        return i == 0 or not _is_consonant(word, i - 1)
+    return True
+
+
+def _measure(stem: str) -> int:
+    # number of VC sequences in [C](VC)^m[V]
+    m = 0
+    previous_is_vowel = False
+    for i in range(len(stem)):
+        is_vowel = not _is_consonant(stem, i)
+        if previous_is_vowel and not is_vowel:
+            m += 1
+        previous_is_vowel = is_vowel
+    return m
+
+
+def _has_vowel(stem: str) -> bool:
+    return any(not _is_consonant(stem, i) for i in range(len(stem)))
+
+
+def _ends_double_consonant(word: str) -> bool:
+    return len(word) > 1 and word[-1] == word[-2] and _is_consonant(word, len(word) - 1)
+
+
+def _ends_cvc(word: str) -> bool:
+    n = len(word)
+    return n > 2 and _is_consonant(word, n - 3) and not _is_consonant(word, n - 2) and \
+        _is_consonant(word, n - 1) and word[-1] not in 'wxy'
+
+
+_STEP2 = [('ational', 'ate'), ('tional', 'tion'), ('enci', 'ence'), ('anci', 'ance'), ('izer', 'ize'),
+          ('bli', 'ble'), ('alli', 'al'), ('entli', 'ent'), ('eli', 'e'), ('ousli', 'ous'), ('ization', 'ize'),
+          ('ation', 'ate'), ('ator', 'ate'), ('alism', 'al'), ('iveness', 'ive'), ('fulness', 'ful'),
+          ('ousness', 'ous'), ('aliti', 'al'), ('iviti', 'ive'), ('biliti', 'ble'), ('logi', 'log')]
+_STEP3 = [('icate', 'ic'), ('ative', ''), ('alize', 'al'), ('iciti', 'ic'), ('ical', 'ic'), ('ful', ''),
+          ('ness', '')]
+_STEP4 = ['al', 'ance', 'ence', 'er', 'ic', 'able', 'ible', 'ant', 'ement', 'ment', 'ent', 'ion', 'ou',
+          'ism', 'ate', 'iti', 'ous', 'ive', 'ize']
+
+
+def _replace_suffix(word: str, rules: List[Tuple[str, str]], min_measure: int) -> str:
+    for suffix, replacement in rules:
+        if word.endswith(suffix):
+            stem = word[:-len(suffix)]
+            if _measure(stem) > min_measure:
+                return stem + replacement
+            return word
+    return word
+
+
+@lru_cache(maxsize=WORD_CACHE_SIZE)
+def stem_word(word: str) -> str:
+    """
+    Stems a single lowercase word, using the Porter algorithm
+
+    :param word:
+    :return: stem, e.g. relat for relational
+    """
+    if len(word) <= 2:
+        return word
+    # step 1a
+    if word.endswith('sses') or word.endswith('ies'):
+        word = word[:-2]
+    elif word.endswith('s') and not word.endswith('ss'):
+        word = word[:-1]
+    # step 1b
+    if word.endswith('eed'):
+        if _measure(word[:-3]) > 0:
+            word = word[:-1]
+    else:
+        for suffix in ('ed', 'ing'):
+            if word.endswith(suffix) and _has_vowel(word[:-len(suffix)]):
+                word = word[:-len(suffix)]
+                if word.endswith(('at', 'bl', 'iz')):
+                    word += 'e'
+                elif _ends_double_consonant(word) and word[-1] not in 'lsz':
+                    word = word[:-1]
+                elif _measure(word) == 1 and _ends_cvc(word):
+                    word += 'e'
+                break
+    # step 1c
+    if word.endswith('y') and _has_vowel(word[:-1]):
+        word = word[:-1] + 'i'
+    word = _replace_suffix(word, _STEP2, 0)
+    word = _replace_suffix(word, _STEP3, 0)
+    # step 4
+    for suffix in _STEP4:
+        if word.endswith(suffix):
+            stem = word[:-len(suffix)]
+            if _measure(stem) > 1 and (suffix != 'ion' or stem.endswith(('s', 't'))):
+                word = stem
+            break
+    # step 5
+    if word.endswith('e'):
+        stem = word[:-1]
+        m = _measure(stem)
+        if m > 1 or (m == 1 and not _ends_cvc(stem)):
+            word = stem
+    if _measure(word) > 1 and _ends_double_consonant(word) and word.endswith('l'):
+        word = word[:-1]
+    return word
+
+
+# ----------------------------------------
+# Depluralization
+# ----------------------------------------
+
+# words ending in s that are not plurals, or whose singular and plural forms are the same
+_NOT_PLURAL = {'series', 'species', 'genus', 'corpus', 'mucus', 'lens', 'bias', 'gas', 'yes', 'news'}
+
+
+@lru_cache(maxsize=WORD_CACHE_SIZE)
+def depluralize_word(word: str) -> str:
+    """
+    Transforms a single word from plural to singular form, using suffix rules
+
+    :param word:
+    :return: singular form, e.g. body for bodies; unchanged if the word does not look like a plural
+    """
+    lower = word.lower()
+    if len(word) <= 3 or lower in _NOT_PLURAL or not lower.endswith('s'):
+        return word
+    if lower.endswith('ies') and len(word) > 4:
+        return word[:-3] + ('Y' if word[-1].isupper() else 'y')
+    if lower.endswith(('sses', 'shes', 'ches', 'xes', 'zes')):
+        return word[:-2]
+    if lower.endswith(('ss', 'us', 'is')):
+        return word
+    return word[:-1]
+
+
+# ----------------------------------------
+# Compilation
+# ----------------------------------------
+
+def _word_transformer(f: Callable[[str], str]) -> TRANSFORMER:
+    def transform(term: str) -> str:
+        return _WORD_RE.sub(lambda m: f(m.group()), term)
+    return transform
+
+
+def _lowercase(term: str) -> str:
+    return term.lower()
+
+
+def _normalize_whitespace(term: str) -> str:
+    return _SPACES_RE.sub(' ', term.strip())
+
+
+def _normalize_word_order(term: str) -> str:
+    return ' '.join(sorted(term.split()))
+
+
+def load_expansions(params: str) -> Dict[str, str]:
+    """
+    Loads the dictionary used for term expansion
+
+    :param params: either a JSON object, e.g. ``{"nuc": "nucleus"}``, or the path to a two-column TSV file
+    :return: mapping between abbreviations and expansions
+    """
+    if params is None:
+        raise ValueError(f'{TransformationType.TermExpanson.text} requires a dictionary as its params')
+    if params.lstrip().startswith('{'):
+        return json.loads(params)
+    with open(params) as stream:
+        return {row[0]: row[1] for row in csv.reader(stream, delimiter='\t') if len(row) > 1}
+
+
+def _term_expander(expansions: Dict[str, str]) -> TRANSFORMER:
+    if not expansions:
+        return _identity
+    # longest first, so that multi-word abbreviations take precedence
+    keys = sorted(expansions.keys(), key=len, reverse=True)
+    pattern = re.compile(r'\b(?:' + '|'.join(re.escape(k) for k in keys) + r')\b')
+
+    def expand(term: str) -> str:
+        return pattern.sub(lambda m: expansions[m.group()], term)
+    return expand
+
+
+def _identity(term: str) -> str:
+    return term
+
+
+_COMPILED: Dict[Tuple[str, str], TRANSFORMER] = {}
+
+
+def compile_transformation(transformation: LexicalTransformation) -> TRANSFORMER:
+    """
+    Compiles a transformation into a function from a term to the transformed term
+
+    Compiled transformations are cached, so compiling the same transformation again is cheap
+
+    :param transformation:
+    :return:
+    """
+    typ = str(transformation.type)
+    key = typ, transformation.params
+    if key in _COMPILED:
+        return _COMPILED[key]
+    if typ == TransformationType.CaseNormalization.text:
+        f = _lowercase
+    elif typ == TransformationType.WhitespaceNormalization.text:
+        f = _normalize_whitespace
+    elif typ == TransformationType.WordOrderNormalization.text:
+        f = _normalize_word_order
+    elif typ == TransformationType.Stemming.text:
+        f = _word_transformer(stem_word)
+    elif typ == TransformationType.Depluralization.text:
+        f = _word_transformer(depluralize_word)
+    elif typ == TransformationType.TermExpanson.text:
+        f = _term_expander(load_expansions(transformation.params))
+    else:
+        raise NotImplementedError(f'Transformation Type {typ} not implemented')
+    _COMPILED[key] = f
+    return f
+
+
+def compile_pipeline(pipeline: LexicalTransformationPipeline) -> TRANSFORMER:
+    """
+    Compiles all steps of a pipeline into a single function, which applies each step to the output of the previous
+
+    :param pipeline:
+    :return:
+    """
+    steps = tuple(compile_transformation(tr) for tr in pipeline.transformations)
+    if not steps:
+        return _identity
+    if len(steps) == 1:
+        return steps[0]
+    if steps == (_lowercase, _normalize_whitespace):
+        # the default pipeline
+        return lambda term: _SPACES_RE.sub(' ', term.strip().lower())
+
+    def fused(term: str) -> str:
+        for step in steps:
+            term = step(term)
+        return term
+    return fused
+
+
+def benchmark_pipelines(terms: Iterable[str], pipelines: List[LexicalTransformationPipeline],
+                        min_seconds: float = 0.2) -> Dict[str, float]:
+    """
+    Measures the throughput of compiled pipelines
+
+    Word caches are cleared before each pipeline is measured, so the first pass includes the cost of
+    transforming each distinct word
+
+    :param terms: sample terms, e.g. all labels and synonyms in an ontology
+    :param pipelines:
+    :param min_seconds: each pipeline is run over the terms repeatedly until at least this much time has passed
+    :return: terms per second, keyed by pipeline name
+    """
+    terms = list(terms)
+    results = {}
+    for pipeline in pipelines:
+        f = compile_pipeline(pipeline)
+        stem_word.cache_clear()
+        depluralize_word.cache_clear()
+        n = 0
+        start = time.perf_counter()
+        while True:
+            for term in terms:
+                f(term)
+            n += len(terms)
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_seconds or not terms:
+                break
+        results[pipeline.name] = n / elapsed if elapsed > 0 else float('inf')
+        logging.info(f'Pipeline {pipeline.name}: {results[pipeline.name]:.0f} terms/s')
+    return results
@@ -1,6 +1,8 @@
+import csv
 from dataclasses import dataclass, field
-from typing import List
+from typing import Any, Dict, List
 
+import yaml
 from linkml_runtime.dumpers import yaml_dumper
 from oaklib.io.streaming_writer import StreamingWriter
 import sssom.sssom_datamodel as sssom_dm
@@ -8,21 +10,62 @@ from sssom.sssom_document import MappingSetDocument
 from sssom.util import to_mapping_set_dataframe
 from sssom.writers import write_table
 
+# columns populated by lexical matching
+LEXICAL_MAPPING_COLUMNS = ['subject_id', 'predicate_id', 'object_id', 'match_type', 'subject_label', 'object_label',
+                           'mapping_tool', 'confidence', 'subject_match_field', 'object_match_field', 'match_string']
+
+
+def _cell(v: Any) -> str:
+    if v is None:
+        return ''
+    if isinstance(v, list):
+        return '|'.join(_cell(x) for x in v)
+    return str(v)
+
 
 @dataclass
 class StreamingSssomWriter(StreamingWriter):
     """
-    pseudo-streaming writer for SSSOM
+    Writer for SSSOM TSV
+
+    If columns are given, each mapping is written as soon as it is emitted, so that
+    arbitrarily many mappings can be written in constant memory. Values containing tabs, newlines or quotes
+    are quoted, in the same way as when the whole table is written.
+    Otherwise this is a pseudo-streaming writer: mappings are collected, and written on close,
+    with columns for all slots that are used
     """
     mappings : List[sssom_dm.Mapping] = field(default_factory=lambda: [])
+    columns: List[str] = None
+    mapping_set_id: str = 'temp'
+    license: str = 'UNSPECIFIED'
+    prefix_map: Dict[str, str] = field(default_factory=lambda: {})
+    header_emitted: bool = False
+    _writer: Any = None
 
     def emit(self, obj: sssom_dm.Mapping):
-        self.mappings.append(obj)
+        if self.columns is None:
+            self.mappings.append(obj)
+        else:
+            self._emit_header()
+            self._writer.writerow([_cell(getattr(obj, c, None)) for c in self.columns])
+
+    def _emit_header(self):
+        if not self.header_emitted:
+            meta = {'mapping_set_id': self.mapping_set_id, 'license': self.license, 'curie_map': self.prefix_map}
+            for line in yaml.safe_dump(meta).split('\n'):
+                if line:
+                    self.file.write(f'# {line}\n')
+            self._writer = csv.writer(self.file, delimiter='\t', lineterminator='\n')
+            self._writer.writerow(self.columns)
+            self.header_emitted = True
 
     def close(self):
-        mset = sssom_dm.MappingSet(mapping_set_id='temp',
+        if self.columns is not None:
+            self._emit_header()
+            return
+        mset = sssom_dm.MappingSet(mapping_set_id=self.mapping_set_id,
                                    mappings=self.mappings,
-                                   license='UNSPECIFIED')
-        doc = MappingSetDocument(prefix_map={}, mapping_set=mset)
+                                   license=self.license)
+        doc = MappingSetDocument(prefix_map=self.prefix_map, mapping_set=mset)
         msdf = to_mapping_set_dataframe(doc)
         write_table(msdf, self.file)
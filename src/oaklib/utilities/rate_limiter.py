@@ -1,16 +1,222 @@
 """
-https://stackoverflow.com/questions/40748687/python-api-rate-limiting-how-to-limit-api-calls-globally
+Rate limiting for remote services
+---------------------------------
+
+Each host has its own token bucket, so heavy use of one service does not throttle calls to another.
+Buckets are safe to share between threads and between coroutines: a caller reserves a token while
+holding a lock, then waits (with ``time.sleep`` or ``asyncio.sleep``) outside of it.
+
+By default each host allows bursts of up to 300 calls, refilled at 300 calls per minute. Limits can be set per host:
+
+.. code:: python
+
+    >>> configure_rate_limit('https://ubergraph.apps.renci.org/sparql', calls=600, period=60)
+
+If a service responds with 429 (Too Many Requests) or 503, its bucket is paused for the time given in
+the Retry-After header, or with exponential backoff if there is no such header, and the request is retried.
 """
-from ratelimit import limits, sleep_and_retry
+import asyncio
+import email.utils
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Any, Mapping
+from urllib.parse import urlparse
+
+import requests
 
 # calls per minute
 CALLS = 300
 RATE_LIMIT = 60
-#CALLS = 1
-#RATE_LIMIT = 10
-
-@sleep_and_retry
-@limits(calls=CALLS, period=RATE_LIMIT)
-def check_limit():
-    """ Empty function just to check for calls to API """
-    return
\ No newline at end of file
+
+# responses that indicate a client should back off and retry
+RETRY_STATUS_CODES = {429, 503}
+MAX_RETRIES = 5
+BACKOFF_SECONDS = 1.0
+
+DEFAULT_HOST = 'default'
+
+
+@dataclass
+class TokenBucket:
+    """
+    A token bucket allowing bursts of up to capacity calls, refilled at rate calls per second
+    """
+    rate: float = CALLS / RATE_LIMIT
+    capacity: float = CALLS
+    tokens: float = None
+    throttled_seconds: float = 0.0
+    throttled_calls: int = 0
+    retries: int = 0
+    _last: float = field(default_factory=time.monotonic)
+    _paused_until: float = 0.0
+    _lock: Any = field(default_factory=lambda: threading.Lock())
+
+    def __post_init__(self):
+        if self.tokens is None:
+            self.tokens = self.capacity
+
+    def reserve(self) -> float:
+        """
+        Takes a token, going into debt if none are available
+
+        :return: number of seconds the caller must wait before proceeding
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+            self._last = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            wait = max(wait, self._paused_until - now)
+            if wait > 0:
+                self.throttled_seconds += wait
+                self.throttled_calls += 1
+            return wait
+
+    def acquire(self) -> None:
+        """
+        Blocks until a call is allowed
+        """
+        wait = self.reserve()
+        if wait > 0:
+            logging.debug(f'Rate limited; waiting {wait:.2f}s')
+            time.sleep(wait)
+
+    async def aacquire(self) -> None:
+        """
+        Waits until a call is allowed, without blocking the event loop
+        """
+        wait = self.reserve()
+        if wait > 0:
+            logging.debug(f'Rate limited; waiting {wait:.2f}s')
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Allows no calls for the given time, e.g. after a 429 response
+
+        :param seconds:
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self.retries += 1
+
+    def stats(self) -> Dict[str, float]:
+        return {'throttled_seconds': self.throttled_seconds,
+                'throttled_calls': self.throttled_calls,
+                'retries': self.retries}
+
+
+_BUCKETS: Dict[str, TokenBucket] = {}
+_BUCKETS_LOCK = threading.Lock()
+
+
+def _host(url: Optional[str]) -> str:
+    if url is None:
+        return DEFAULT_HOST
+    return urlparse(url).netloc or url
+
+
+def configure_rate_limit(url: Optional[str], calls: int, period: float, burst: int = None) -> TokenBucket:
+    """
+    Sets the rate limit for a host
+
+    :param url: URL of the service, or its host name (None for calls not associated with a host)
+    :param calls: number of calls allowed
+    :param period: per this number of seconds
+    :param burst: maximum number of calls that can be made at once (defaults to calls)
+    :return: the bucket for the host
+    """
+    bucket = TokenBucket(rate=calls / period, capacity=burst if burst is not None else calls)
+    with _BUCKETS_LOCK:
+        _BUCKETS[_host(url)] = bucket
+    return bucket
+
+
+def bucket_for(url: Optional[str]) -> TokenBucket:
+    """
+    The token bucket for the host of a URL, created on first use
+
+    :param url:
+    :return:
+    """
+    host = _host(url)
+    with _BUCKETS_LOCK:
+        if host not in _BUCKETS:
+            _BUCKETS[host] = TokenBucket()
+        return _BUCKETS[host]
+
+
+def rate_limit_stats() -> Dict[str, Dict[str, float]]:
+    """
+    Time spent throttled, number of throttled calls, and number of retries, for each host
+
+    :return: mapping between host and counters
+    """
+    with _BUCKETS_LOCK:
+        return {host: bucket.stats() for host, bucket in _BUCKETS.items()}
+
+
+def check_limit(url: str = None) -> None:
+    """
+    Blocks until a call to the host of url is allowed
+
+    :param url: URL being called
+    """
+    bucket_for(url).acquire()
+
+
+async def acheck_limit(url: str = None) -> None:
+    """
+    As check_limit, without blocking the event loop
+
+    :param url: URL being called
+    """
+    await bucket_for(url).aacquire()
+
+
+def retry_delay(headers: Mapping[str, str], attempt: int) -> float:
+    """
+    Time to wait before retrying a request that was refused
+
+    :param headers: response headers
+    :param attempt: number of attempts so far, starting at 0
+    :return: seconds, from the Retry-After header if present, otherwise exponential backoff
+    """
+    retry_after = headers.get('Retry-After', None)
+    if retry_after is not None:
+        try:
+            return max(float(retry_after), 0.0)
+        except ValueError:
+            try:
+                retry_at = email.utils.parsedate_to_datetime(retry_after)
+                return max(retry_at.timestamp() - time.time(), 0.0)
+            except (TypeError, ValueError):
+                logging.warning(f'Cannot parse Retry-After: {retry_after}')
+    return BACKOFF_SECONDS * 2 ** attempt
+
+
+def limited_request(method: str, url: str, session: requests.Session = None, **kwargs) -> requests.Response:
+    """
+    Makes an HTTP request subject to the rate limit for its host, retrying if the service asks to back off
+
+    :param method: GET or POST
+    :param url:
+    :param session: session to use (defaults to a one-off request)
+    :param kwargs: passed to requests
+    :return: the final response
+    """
+    bucket = bucket_for(url)
+    requester = session if session is not None else requests
+    for attempt in range(MAX_RETRIES + 1):
+        bucket.acquire()
+        response = requester.request(method, url, **kwargs)
+        if response.status_code not in RETRY_STATUS_CODES or attempt == MAX_RETRIES:
+            return response
+        delay = retry_delay(response.headers, attempt)
+        logging.warning(f'{url} returned {response.status_code}; retrying in {delay:.1f}s')
+        # the response is discarded, so release its connection (it may be streamed)
+        response.close()
+        bucket.pause(delay)
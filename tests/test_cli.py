@@ -1,3 +1,5 @@
+import csv
+import json
 import logging
 import unittest
 
@@ -5,7 +7,7 @@ from oaklib.cli import search, main
 from oaklib.datamodels.vocabulary import IN_TAXON
 
 from tests import OUTPUT_DIR, INPUT_DIR, NUCLEUS, NUCLEAR_ENVELOPE, ATOM, INTERNEURON, BACTERIA, EUKARYOTA, VACUOLE, \
-    CELLULAR_COMPONENT, HUMAN, MAMMALIA, SHAPE
+    CELLULAR_COMPONENT, HUMAN, MAMMALIA, SHAPE, CYTOPLASM
 from click.testing import CliRunner
 
 TEST_ONT = INPUT_DIR / 'go-nucleus.obo'
@@ -135,6 +137,35 @@ class TestCommandLineInterface(unittest.TestCase):
         self.assertNotIn('PATO:0002021', out)   # conical - matches a synonym
         self.assertEqual("", err)
 
+    ## ANNOTATE
+
+    def test_annotate_local(self):
+        for input_arg in [str(TEST_ONT), f'sqlite:{TEST_DB}']:
+            result = self.runner.invoke(main, ['-i', input_arg, 'annotate', 'enlarged', 'nucleus', '-o', str(TEST_OUT)])
+            self.assertEqual(0, result.exit_code)
+            with open(TEST_OUT) as stream:
+                self.assertIn(NUCLEUS, stream.read())
+
+    def test_annotate_text_file(self):
+        texts_file = OUTPUT_DIR / 'annotate-test.jsonl'
+        with open(texts_file, 'w') as stream:
+            stream.write(json.dumps({'id': 'doc1', 'text': 'enlarged nucleus'}) + '\n')
+            stream.write(json.dumps({'id': 'doc2', 'text': 'nuclear envelope'}) + '\n')
+        result = self.runner.invoke(main, ['-i', f'sqlite:{TEST_DB}', 'annotate', '-T', str(texts_file),
+                                           '--processes', '2', '-o', str(TEST_OUT)])
+        self.assertEqual(0, result.exit_code)
+        with open(TEST_OUT) as stream:
+            rows = list(csv.DictReader(stream, delimiter='\t'))
+        self.assertIn(('doc1', NUCLEUS), [(row['document_id'], row['object_id']) for row in rows])
+        self.assertIn(('doc2', NUCLEAR_ENVELOPE), [(row['document_id'], row['object_id']) for row in rows])
+        result = self.runner.invoke(main, ['-i', str(TEST_ONT), 'annotate', '-T', '-', '-O', 'jsonl',
+                                           '-o', str(TEST_OUT)],
+                                    input='nucleus\n\ncytoplasm\n')
+        self.assertEqual(0, result.exit_code)
+        with open(TEST_OUT) as stream:
+            anns = [json.loads(line) for line in stream]
+        self.assertEqual([('1', NUCLEUS), ('3', CYTOPLASM)], [(a['subject_text_id'], a['object_id']) for a in anns])
+
     ## VALIDATE
 
     def test_validate_help(self):
@@ -182,6 +213,29 @@ class TestCommandLineInterface(unittest.TestCase):
         # TODO: currently pronto produces various warnings when parsing OWL
         #self.assertEqual("", err)
 
+    def test_lexmatch_cross_source(self):
+        outfile = f'{OUTPUT_DIR}/matcher-test-cli.cross.sssom.tsv'
+        result = self.runner.invoke(main, ['-i', f'sqlite:{INPUT_DIR}/matcher-test.db', 'lexmatch',
+                                           '-R', f'{INPUT_DIR}/matcher_rules.yaml',
+                                           '-S', 'x', '-S', 'z', '-o', outfile])
+        self.assertEqual(0, result.exit_code)
+        with open(outfile) as stream:
+            rows = [line.split('\t') for line in stream if not line.startswith('#')][1:]
+        self.assertIn(['x:hindlimb', 'skos:exactMatch', 'z:hindlimb'], [row[0:3] for row in rows])
+        for row in rows:
+            self.assertTrue(row[0].startswith('x:'))
+            self.assertTrue(row[2].startswith('z:'))
+
+    def test_lexmatch_fuzzy(self):
+        outfile = f'{OUTPUT_DIR}/matcher-test-cli.fuzzy.sssom.tsv'
+        result = self.runner.invoke(main, ['-i', f'sqlite:{INPUT_DIR}/matcher-test.db', 'lexmatch',
+                                           '--fuzzy-threshold', '0.6', '-o', outfile])
+        self.assertEqual(0, result.exit_code)
+        with open(outfile) as stream:
+            rows = [line.rstrip('\n').split('\t') for line in stream if not line.startswith('#')][1:]
+        self.assertIn(['x:tissue', 'skos:closeMatch', 'y:tissue'], [row[0:3] for row in rows])
+        self.assertIn('tissue|tissues', [row[-1] for row in rows])
+
     def test_lexmatch_sqlite(self):
         outfile = f'{OUTPUT_DIR}/matcher-test-cli.db.sssom.tsv'
         result = self.runner.invoke(main, ['-i', f'sqlite:{INPUT_DIR}/matcher-test.db', 'lexmatch', '-R', f'{INPUT_DIR}/matcher_rules.yaml',
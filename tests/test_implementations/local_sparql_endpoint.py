@@ -0,0 +1,122 @@
+"""
+A minimal SPARQL endpoint over a local file, for testing SPARQL implementations without network access
+"""
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import rdflib
+
+JSON = 'application/sparql-results+json'
+TSV = 'text/tab-separated-values'
+
+
+def _tsv_term(t) -> str:
+    if t is None:
+        return ''
+    if isinstance(t, rdflib.Literal):
+        v = str(t)
+        for c, escaped in [('\\', '\\\\'), ('"', '\\"'), ('\n', '\\n'), ('\r', '\\r'), ('\t', '\\t')]:
+            v = v.replace(c, escaped)
+        if t.language:
+            return f'"{v}"@{t.language}'
+        if t.datatype:
+            return f'"{v}"^^<{t.datatype}>'
+        return f'"{v}"'
+    return t.n3()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _answer(self, params: dict):
+        endpoint: LocalSparqlEndpoint = self.server.endpoint
+        endpoint.requests.append(self.command)
+        endpoint.client_ports.append(self.client_address[1])
+        endpoint.headers.append(dict(self.headers))
+        if endpoint.refusals > 0:
+            endpoint.refusals -= 1
+            self.send_response(429)
+            self.send_header('Retry-After', str(endpoint.retry_after))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        query = params['query'][0]
+        endpoint.queries.append(query)
+        if endpoint.delay:
+            time.sleep(endpoint.delay)
+        content_type = TSV if TSV in self.headers.get('Accept', '') else JSON
+        with endpoint.lock:
+            # rdflib query evaluation is slow; answers are memoized, so timings reflect only the delay
+            key = query, content_type
+            if key not in endpoint.answers:
+                result = endpoint.graph.query(query)
+                if content_type == TSV:
+                    lines = ['\t'.join(f'?{v}' for v in result.vars)]
+                    lines += ['\t'.join(_tsv_term(t) for t in row) for row in result]
+                    endpoint.answers[key] = '\n'.join(lines).encode('utf-8') + b'\n'
+                else:
+                    endpoint.answers[key] = result.serialize(format='json')
+            body = endpoint.answers[key]
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._answer(parse_qs(urlparse(self.path).query))
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self._answer(parse_qs(self.rfile.read(length).decode('utf-8')))
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalSparqlEndpoint:
+    """
+    Serves SPARQL queries over an rdflib graph, recording each request
+
+    Results are in JSON, or in TSV if requested in the Accept header
+
+    Set delay to simulate network latency, and refusals to answer that many requests with
+    429 (Too Many Requests)
+
+    .. code:: python
+
+        >>> with LocalSparqlEndpoint(INPUT_DIR / 'go-nucleus.owl') as endpoint:
+        ...     oi = SparqlImplementation(OntologyResource(url=endpoint.url))
+    """
+
+    def __init__(self, path, delay: float = None):
+        self.delay = delay
+        self.refusals = 0
+        self.retry_after = 0.1
+        # a plain Graph cannot answer queries over named graphs
+        self.graph = rdflib.ConjunctiveGraph()
+        self.graph.parse(str(path))
+        self.lock = threading.Lock()
+        self.requests = []
+        self.queries = []
+        self.client_ports = []
+        self.headers = []
+        self.answers = {}
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self.server.endpoint = self
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/sparql'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self) -> "LocalSparqlEndpoint":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @property
+    def request_count(self) -> int:
+        return len(self.requests)
@@ -1,11 +1,14 @@
 import logging
+import time
 import unittest
 
 import yaml
 from linkml_runtime.dumpers import yaml_dumper
-from oaklib.implementations.aggregator.aggregator_implementation import AggregatorImplementation
+from oaklib.implementations.aggregator.aggregator_implementation import AggregatorImplementation, load_implementations, \
+    MERGE_QUEUE_SIZE
 from oaklib.implementations.pronto.pronto_implementation import ProntoImplementation
 from oaklib.resource import OntologyResource
+from oaklib.selector import get_resource_from_shorthand
 from oaklib.utilities.obograph_utils import graph_as_dict
 from oaklib.datamodels.vocabulary import IS_A, PART_OF, HAS_PART
 
@@ -27,6 +30,14 @@ class TestAggregator(unittest.TestCase):
         oi2 = ProntoImplementation(resource2)
         self.oi = AggregatorImplementation(implementations=[oi1, oi2])
 
+    def test_load_implementations(self):
+        resources = [get_resource_from_shorthand(str(TEST_ONT)), get_resource_from_shorthand(str(TEST_ONT2))]
+        impls = load_implementations(resources)
+        self.assertEqual(2, len(impls))
+        oi = AggregatorImplementation(implementations=impls)
+        self.assertEqual('vacuole', oi.get_label_by_curie(VACUOLE))
+        self.assertEqual('interneuron', oi.get_label_by_curie(INTERNEURON))
+
     def test_relationships(self):
         oi = self.oi
         rels = oi.get_outgoing_relationships_by_curie('GO:0005773')
@@ -145,3 +156,154 @@ class TestAggregator(unittest.TestCase):
 
 
 
+
+
+class SlowProntoImplementation(ProntoImplementation):
+    """
+    Simulates a slow remote member
+    """
+
+    def get_label_by_curie(self, curie):
+        time.sleep(2)
+        return super().get_label_by_curie(curie)
+
+
+class TestConcurrentAggregator(TestAggregator):
+    """
+    Runs all aggregator tests with members queried concurrently
+    """
+
+    def setUp(self) -> None:
+        resource1 = OntologyResource(slug='go-nucleus.obo', directory=INPUT_DIR, local=True)
+        resource2 = OntologyResource(slug='interneuron.obo', directory=INPUT_DIR, local=True)
+        self.oi1 = ProntoImplementation(resource1)
+        self.oi2 = ProntoImplementation(resource2)
+        self.oi = AggregatorImplementation(implementations=[self.oi1, self.oi2], concurrent=True)
+
+    def test_deduplicate(self):
+        oi = AggregatorImplementation(implementations=[self.oi1, self.oi1], concurrent=True)
+        curies = list(oi.all_entity_curies())
+        self.assertEqual(2 * len(list(self.oi1.all_entity_curies())), len(curies))
+        oi.deduplicate_curies = True
+        curies = list(oi.all_entity_curies())
+        self.assertCountEqual(list(self.oi1.all_entity_curies()), curies)
+
+    def test_timeout(self):
+        slow = SlowProntoImplementation(OntologyResource(slug='interneuron.obo', directory=INPUT_DIR, local=True))
+        oi = AggregatorImplementation(implementations=[slow, self.oi1], concurrent=True, timeout=1.0)
+        # first wins
+        self.assertEqual('vacuole', oi.get_label_by_curie(VACUOLE))
+        # slow member is skipped
+        self.assertIsNone(oi.get_label_by_curie(INTERNEURON))
+        oi.timeout = None
+        self.assertEqual('interneuron', oi.get_label_by_curie(INTERNEURON))
+
+
+class StreamingProntoImplementation(ProntoImplementation):
+    """
+    Yields a long stream of CURIEs slowly, recording how many were produced
+    """
+
+    def __post_init__(self):
+        super().__post_init__()
+        self.produced = 0
+
+    def all_entity_curies(self):
+        for i in range(100000):
+            if i < 20:
+                time.sleep(0.05)
+            self.produced += 1
+            yield f'X:{i}'
+
+
+class TestConcurrentStreams(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.streaming = StreamingProntoImplementation(OntologyResource(slug='go-nucleus.obo', directory=INPUT_DIR,
+                                                                        local=True))
+
+    def test_timeout_per_result(self):
+        # the whole stream takes longer than the timeout, but each result arrives within it
+        with AggregatorImplementation(implementations=[self.streaming], concurrent=True, timeout=0.5) as oi:
+            self.assertEqual(100000, len(list(oi.all_entity_curies())))
+
+    def test_lookups_while_streaming(self):
+        # all members are still producing when the merge buffer is full
+        streaming2 = StreamingProntoImplementation(OntologyResource(slug='go-nucleus.obo', directory=INPUT_DIR,
+                                                                    local=True))
+        with AggregatorImplementation(implementations=[self.streaming, streaming2], concurrent=True,
+                                      timeout=5) as oi:
+            n = 0
+            for curie in oi.all_entity_curies():
+                if n == 100:
+                    time.sleep(0.5)
+                self.assertEqual('vacuole', oi.get_label_by_curie(VACUOLE))
+                n += 1
+                if n > MERGE_QUEUE_SIZE + 100:
+                    break
+        self.assertGreater(self.streaming.produced + streaming2.produced, MERGE_QUEUE_SIZE)
+
+    def test_abandoned_stream(self):
+        with AggregatorImplementation(implementations=[self.streaming], concurrent=True) as oi:
+            it = oi.all_entity_curies()
+            self.assertEqual('X:0', next(it))
+            it.close()
+            time.sleep(0.5)
+            produced = self.streaming.produced
+            time.sleep(0.5)
+            # the member stops producing once the consumer has gone
+            self.assertEqual(produced, self.streaming.produced)
+            self.assertLess(produced, 100000)
+        self.assertIsNone(oi._executor)
+
+
+class CountingProntoImplementation(ProntoImplementation):
+    """
+    Records which CURIEs a member was asked to label
+    """
+
+    def __post_init__(self):
+        super().__post_init__()
+        self.label_requests = []
+
+    def get_label_by_curie(self, curie):
+        self.label_requests.append(curie)
+        return super().get_label_by_curie(curie)
+
+
+class TestRoutedAggregator(TestAggregator):
+    """
+    Runs all aggregator tests with per-CURIE lookups routed by prefix
+    """
+
+    def setUp(self) -> None:
+        resource1 = OntologyResource(slug='go-nucleus.obo', directory=INPUT_DIR, local=True)
+        resource2 = OntologyResource(slug='interneuron.obo', directory=INPUT_DIR, local=True)
+        self.oi1 = CountingProntoImplementation(resource1)
+        self.oi2 = CountingProntoImplementation(resource2)
+        self.oi = AggregatorImplementation(implementations=[self.oi1, self.oi2], route_by_prefix=True)
+
+    def test_routing_table(self):
+        routes = self.oi.prefix_routes()
+        self.assertEqual([self.oi1], routes['GO'])
+        self.assertEqual([self.oi1], routes['CHEBI'])
+        self.assertEqual([self.oi2], routes['UBERON'])
+        self.assertEqual([self.oi1, self.oi2], routes['BFO'])
+        self.assertEqual('tissue', self.oi.get_label_by_curie(TISSUE))
+        self.assertEqual([], self.oi1.label_requests)
+        self.assertEqual([TISSUE], self.oi2.label_requests)
+        # prefixes no member claims go to all members
+        self.assertIsNone(self.oi.get_label_by_curie('FOOBAR:123'))
+        self.assertEqual(['FOOBAR:123'], self.oi1.label_requests)
+
+    def test_declared_prefixes(self):
+        oi = AggregatorImplementation(implementations=[self.oi1, self.oi2], route_by_prefix=True,
+                                      member_prefixes=[['GO'], None])
+        routes = oi.prefix_routes()
+        self.assertEqual([self.oi1], routes['GO'])
+        self.assertNotIn('BFO', [p for p, members in routes.items() if self.oi1 in members])
+        self.assertEqual('vacuole', oi.get_label_by_curie(VACUOLE))
+        self.assertEqual([], self.oi2.label_requests)
+        with self.assertRaises(ValueError):
+            AggregatorImplementation(implementations=[self.oi1, self.oi2], route_by_prefix=True,
+                                     member_prefixes=[['GO']]).prefix_routes()
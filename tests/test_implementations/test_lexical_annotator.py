@@ -0,0 +1,74 @@
+import pickle
+import unittest
+
+from oaklib.datamodels.lexical_index import LexicalIndex, LexicalTransformation, LexicalTransformationPipeline, \
+    TransformationType
+from oaklib.datamodels.vocabulary import LABEL_PREDICATE
+from oaklib.implementations.lexical.lexical_annotator_implementation import LexicalAnnotatorImplementation
+from oaklib.implementations.pronto.pronto_implementation import ProntoImplementation
+from oaklib.resource import OntologyResource
+from oaklib.utilities.lexical.lexical_annotator import AhoCorasickAutomaton, LexicalAnnotator
+
+from tests import INPUT_DIR, NUCLEUS, NUCLEAR_ENVELOPE, CYTOPLASM
+
+NUCLEAR_MEMBRANE = 'GO:0031965'
+MEMBRANE = 'GO:0016020'
+
+
+class TestLexicalAnnotator(unittest.TestCase):
+    """
+    Tests local annotation of texts, using the labels and synonyms of a wrapped implementation
+    """
+
+    def setUp(self) -> None:
+        resource = OntologyResource(slug='go-nucleus.obo', directory=INPUT_DIR, local=True)
+        self.oi = LexicalAnnotatorImplementation(wrapped=ProntoImplementation(resource))
+
+    def test_automaton(self):
+        automaton = AhoCorasickAutomaton()
+        automaton.add(['a', 'b', 'c'], 'abc')
+        automaton.add(['b', 'c'], 'bc')
+        automaton.add(['b', 'd'], 'bd')
+        automaton.build()
+        self.assertCountEqual([(0, 3, ['abc']), (1, 3, ['bc']), (3, 5, ['bd'])],
+                              list(automaton.iter_matches(['a', 'b', 'c', 'b', 'd'])))
+        self.assertEqual([], list(automaton.iter_matches(['a', 'b', 'x'])))
+
+    def test_annotate(self):
+        text = 'Enlarged Nucleus and nuclear membrane in T-cells; the nuclear-envelope, and nucleuses'
+        anns = list(self.oi.annotate_text(text))
+        spans = {(ann.object_id, ann.match_string): ann for ann in anns}
+        ann = spans[(NUCLEUS, 'Nucleus')]
+        self.assertEqual('nucleus', ann.object_label)
+        self.assertEqual(LABEL_PREDICATE, ann.match_type)
+        self.assertEqual('Nucleus', text[ann.subject_start - 1:ann.subject_end])
+        self.assertTrue(ann.is_longest_match)
+        self.assertTrue(spans[(NUCLEAR_MEMBRANE, 'nuclear membrane')].is_longest_match)
+        self.assertFalse(spans[(MEMBRANE, 'membrane')].is_longest_match)
+        # hyphens are treated as spaces
+        self.assertIn((NUCLEAR_ENVELOPE, 'nuclear-envelope'), spans)
+        # matches do not start or end within a word
+        self.assertEqual(1, len([ann for ann in anns if ann.object_id == NUCLEUS]))
+
+    def test_term_transformations(self):
+        def index(*types: TransformationType) -> LexicalIndex:
+            pipeline = LexicalTransformationPipeline(name='p', transformations=[LexicalTransformation(t) for t in types])
+            return LexicalIndex(pipelines={'p': pipeline})
+        LexicalAnnotator.from_lexical_index(index(TransformationType.CaseNormalization, TransformationType.Stemming))
+        for typ in [TransformationType.WordOrderNormalization, TransformationType.TermExpanson]:
+            with self.assertRaises(ValueError):
+                LexicalAnnotator.from_lexical_index(index(TransformationType.CaseNormalization, typ))
+
+    def test_longest_match_only(self):
+        self.oi.longest_match_only = True
+        anns = list(self.oi.annotate_text('nuclear membrane'))
+        self.assertEqual([NUCLEAR_MEMBRANE], [ann.object_id for ann in anns])
+
+    def test_annotate_texts(self):
+        texts = ['nucleus', 'no matches here', 'cytoplasm and nucleus']
+        results = list(self.oi.annotate_texts(texts))
+        self.assertEqual([[NUCLEUS], [], [CYTOPLASM, NUCLEUS]],
+                         [[ann.object_id for ann in anns] for anns in results])
+        # compiled annotators can be sent to other processes
+        annotator = pickle.loads(pickle.dumps(self.oi.compiled_annotator()))
+        self.assertEqual([NUCLEUS], [ann.object_id for ann in annotator.annotate('nucleus')])
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import unittest
 
@@ -5,6 +6,8 @@ from oaklib.datamodels import obograph
 from oaklib.datamodels.search import SearchConfiguration
 from oaklib.datamodels.search_datamodel import SearchTermSyntax, SearchProperty
 from oaklib.implementations import ProntoImplementation
+from oaklib.implementations.pronto.obo_stanza_index import OboStanzaIndex
+from oaklib.interfaces import BasicOntologyInterface
 from oaklib.resource import OntologyResource
 from oaklib.utilities.obograph_utils import graph_as_dict, index_graph_nodes, index_graph_edges_by_subject, \
     index_graph_edges_by_object, index_graph_edges_by_predicate
@@ -62,6 +65,15 @@ class TestProntoImplementation(unittest.TestCase):
     def test_all_terms(self):
         assert any(curie for curie in self.oi.all_entity_curies() if curie == 'GO:0008152')
 
+    def test_all_relationships(self):
+        oi = self.oi
+        rels = list(oi.all_relationships())
+        self.assertIn((VACUOLE, IS_A, 'GO:0043231'), rels)
+        self.assertIn((VACUOLE, PART_OF, CYTOPLASM), rels)
+        # must be equivalent to generic implementation
+        expected = list(BasicOntologyInterface.all_relationships(oi))
+        self.assertCountEqual(expected, rels)
+
     def test_relations(self):
         oi = self.oi
         label = oi.get_label_by_curie(PART_OF)
@@ -93,6 +105,22 @@ class TestProntoImplementation(unittest.TestCase):
         label = oi.get_label_by_curie(IS_A)
         self.assertIsNotNone(label)
 
+    def test_async(self):
+        """
+        Tests the default async methods, which run the blocking methods in a thread
+        """
+        oi = self.oi
+
+        async def lookup():
+            return await asyncio.gather(oi.aget_label_by_curie(VACUOLE),
+                                        oi.aancestors(VACUOLE, predicates=[IS_A]),
+                                        oi.abasic_search('nucleus'))
+
+        label, ancs, search_results = asyncio.run(lookup())
+        self.assertEqual('vacuole', label)
+        self.assertCountEqual(list(oi.ancestors(VACUOLE, predicates=[IS_A])), ancs)
+        self.assertEqual(list(oi.basic_search('nucleus')), search_results)
+
     def test_synonyms(self):
         syns = self.oi.aliases_by_curie('GO:0005575')
         #print(syns)
@@ -114,6 +142,37 @@ class TestProntoImplementation(unittest.TestCase):
         oi.create_entity('FOO:1', label='foo', relationships={IS_A: ['FOO:2'], 'part_of': ['FOO:3']})
         oi.store(OntologyResource(slug='go-nucleus.saved.obo', directory=OUTPUT_DIR, local=True, format='obo'))
 
+    def test_lazy(self):
+        resource = OntologyResource(slug='go-nucleus.obo', directory=INPUT_DIR, local=True, lazy=True)
+        lazy_oi = ProntoImplementation(resource)
+        oi = self.oi
+        self.assertIsNone(lazy_oi.wrapped_ontology)
+        self.assertCountEqual(list(oi.all_entity_curies()), list(lazy_oi.all_entity_curies()))
+        for curie in [VACUOLE, CYTOPLASM, NUCLEUS, 'GO:0005575', PART_OF]:
+            self.assertEqual(oi.get_label_by_curie(curie), lazy_oi.get_label_by_curie(curie))
+            self.assertEqual(oi.get_definition_by_curie(curie), lazy_oi.get_definition_by_curie(curie))
+            self.assertCountEqual(oi.aliases_by_curie(curie), lazy_oi.aliases_by_curie(curie))
+            self.assertEqual(oi.get_outgoing_relationships_by_curie(curie),
+                             lazy_oi.get_outgoing_relationships_by_curie(curie))
+        self.assertIsNone(lazy_oi.get_label_by_curie('FOOBAR:123'))
+        self.assertIn('GO:0043231', lazy_oi.ancestors(VACUOLE, predicates=[IS_A]))
+        # stanzas are not parsed until needed
+        self.assertIsNone(lazy_oi.wrapped_ontology)
+        # operations that scan all terms parse the whole file
+        self.assertIn(CYTOPLASM, lazy_oi.basic_search('cytoplasm'))
+        self.assertIsNotNone(lazy_oi.wrapped_ontology)
+        rels = lazy_oi.get_incoming_relationships_by_curie(CYTOPLASM)
+        self.assertCountEqual(rels[PART_OF], ['GO:0005773', 'GO:0099568'])
+
+    def test_stanza_index_empty_file(self):
+        path = OUTPUT_DIR / 'empty.obo'
+        OUTPUT_DIR.mkdir(exist_ok=True)
+        path.write_bytes(b'')
+        index = OboStanzaIndex.from_path(path)
+        self.assertEqual([], list(index.term_curies()))
+        self.assertIsNone(index.entity(NUCLEUS))
+        index.close()
+
     def test_from_obo_library(self):
         oi = ProntoImplementation.create(OntologyResource(local=False, slug='pato.obo'))
         curies = oi.get_curies_by_label('shape')
@@ -0,0 +1,408 @@
+import asyncio
+import gc
+import json
+import os
+import shutil
+import time
+import unittest
+import warnings
+
+from oaklib.implementations.pronto.pronto_implementation import ProntoImplementation
+from oaklib.implementations.sparql.result_parser import iter_json_bindings, iter_tsv_bindings, parse_tsv_term, \
+    SPARQL_RESULTS_TSV
+from oaklib.implementations.sparql.query_cache import SparqlQueryCache, cache_key, DEFAULT_QUERY_CACHE, \
+    DEFAULT_QUERY_CACHE_MAX_SIZE, DEFAULT_QUERY_CACHE_TTL
+from oaklib.implementations.sparql.sparql_implementation import SparqlImplementation
+from oaklib.implementations.sparql.sparql_transport import SparqlHttpTransport
+from oaklib.implementations.ubergraph.ubergraph_implementation import UbergraphImplementation
+from oaklib.implementations.wikidata.wikidata_implementation import WikidataImplementation
+from oaklib.datamodels.search import SearchConfiguration
+from oaklib.resource import OntologyResource
+from oaklib.utilities import async_http
+from oaklib.utilities.async_http import client_session
+
+from oaklib.datamodels.vocabulary import HAS_EXACT_SYNONYM, LABEL_PREDICATE, IS_A, PART_OF
+from tests import INPUT_DIR, OUTPUT_DIR, VACUOLE, NUCLEUS, CELLULAR_COMPONENT, CYTOPLASM, NUCLEAR_MEMBRANE, \
+    NUCLEAR_ENVELOPE, INTRACELLULAR
+from tests.test_implementations.local_sparql_endpoint import LocalSparqlEndpoint
+
+TEST_OWL = INPUT_DIR / 'go-nucleus.owl'
+CACHE_DIR = OUTPUT_DIR / 'sparql-cache'
+GRAPH_STORE_DIR = OUTPUT_DIR / 'sparql-graph-store'
+
+
+class TestSparqlImplementation(unittest.TestCase):
+    """
+    Tests the generic SPARQL implementation against a local endpoint
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.endpoint = LocalSparqlEndpoint(TEST_OWL).__enter__()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.endpoint.__exit__()
+
+    def _impl(self, **kwargs) -> SparqlImplementation:
+        # do not write named graphs for the local endpoint to the user cache
+        kwargs.setdefault('named_graph_cache', None)
+        return SparqlImplementation(OntologyResource(url=self.endpoint.url), **kwargs)
+
+    def test_labels(self):
+        oi = self._impl(query_cache=None)
+        self.assertEqual('vacuole', oi.get_label_by_curie(VACUOLE))
+        self.assertIsNone(oi.get_label_by_curie('GO:9999999'))
+
+    def test_bulk_retrieval(self):
+        oi = self._impl(query_cache=None, values_chunk_size=2)
+        curies = [VACUOLE, NUCLEUS, CELLULAR_COMPONENT, 'GO:9999999', CYTOPLASM]
+        n = self.endpoint.request_count
+        labels = list(oi.get_labels_for_curies(curies))
+        self.assertEqual(3, self.endpoint.request_count - n)
+        self.assertCountEqual([(VACUOLE, 'vacuole'), (NUCLEUS, 'nucleus'), (CELLULAR_COMPONENT, 'cellular_component'),
+                               ('GO:9999999', None), (CYTOPLASM, 'cytoplasm')], labels)
+        # results are yielded as each chunk completes
+        self.assertCountEqual([VACUOLE, NUCLEUS], [c for c, _ in labels[0:2]])
+        defs = dict(oi.get_definitions_for_curies(curies))
+        self.assertEqual(oi.get_definition_by_curie(NUCLEUS), defs[NUCLEUS])
+        self.assertIsNone(defs['GO:9999999'])
+        alias_maps = dict(oi.alias_maps_for_curies(curies))
+        for curie in curies:
+            alias_map = oi.alias_map_by_curie(curie)
+            self.assertCountEqual(alias_map.keys(), alias_maps[curie].keys())
+            for pred, aliases in alias_map.items():
+                self.assertCountEqual(aliases, alias_maps[curie][pred])
+        self.assertIn('cellular component', oi.aliases_by_curie(CELLULAR_COMPONENT))
+        anns = list(oi.get_annotations_for_curies(curies, [LABEL_PREDICATE, HAS_EXACT_SYNONYM]))
+        self.assertIn((CELLULAR_COMPONENT, LABEL_PREDICATE, 'cellular_component'), anns)
+        self.assertIn((CELLULAR_COMPONENT, HAS_EXACT_SYNONYM, 'cellular component'), anns)
+
+    def test_cache(self):
+        endpoint = self.endpoint
+        cache = SparqlQueryCache()
+        oi = self._impl(query_cache=cache)
+        n = endpoint.request_count
+        self.assertEqual('vacuole', oi.get_label_by_curie(VACUOLE))
+        self.assertEqual('vacuole', oi.get_label_by_curie(VACUOLE))
+        self.assertEqual(n + 1, endpoint.request_count)
+        self.assertEqual(1, cache.hits)
+        # cache is shared between instances for the same endpoint
+        oi2 = self._impl(query_cache=cache)
+        self.assertEqual('vacuole', oi2.get_label_by_curie(VACUOLE))
+        self.assertEqual(n + 1, endpoint.request_count)
+        self.assertEqual('nucleus', oi2.get_label_by_curie(NUCLEUS))
+        self.assertEqual(n + 2, endpoint.request_count)
+        # no caching
+        oi3 = self._impl(query_cache=None)
+        oi3.get_label_by_curie(VACUOLE)
+        oi3.get_label_by_curie(VACUOLE)
+        self.assertEqual(n + 4, endpoint.request_count)
+        # the default cache is bounded in size and age
+        self.assertIs(DEFAULT_QUERY_CACHE, self._impl().query_cache)
+        self.assertEqual(DEFAULT_QUERY_CACHE_MAX_SIZE, DEFAULT_QUERY_CACHE.max_size)
+        self.assertEqual(DEFAULT_QUERY_CACHE_TTL, DEFAULT_QUERY_CACHE.ttl)
+
+    def test_cache_key(self):
+        self.assertEqual(cache_key('http://x.org', None, 'SELECT ?s\n  WHERE { ?s ?p ?o }'),
+                         cache_key('http://x.org', None, ' SELECT ?s WHERE {  ?s ?p ?o } '))
+        self.assertNotEqual(cache_key('http://x.org', None, 'SELECT ?s WHERE { ?s ?p ?o }'),
+                            cache_key('http://y.org', None, 'SELECT ?s WHERE { ?s ?p ?o }'))
+        self.assertNotEqual(cache_key('http://x.org', 'http://x.org/g1', 'SELECT ?s WHERE { ?s ?p ?o }'),
+                            cache_key('http://x.org', 'http://x.org/g2', 'SELECT ?s WHERE { ?s ?p ?o }'))
+        cache = SparqlQueryCache(max_size=2)
+        for i in range(3):
+            cache.put(('e', None, str(i)), [])
+        self.assertIsNone(cache.get(('e', None, '0')))
+        self.assertEqual([], cache.get(('e', None, '2')))
+
+    def test_memory_cache_entries(self):
+        key = ('e', None, 'q')
+        bindings = [{'s': {'type': 'uri', 'value': 'x'}}]
+        cache = SparqlQueryCache()
+        cache.put(key, bindings)
+        bindings[0]['s']['value'] = 'changed'
+        cached = cache.get(key)
+        self.assertEqual('x', cached[0]['s']['value'])
+        cached[0]['s']['value'] = 'changed'
+        cached.append({})
+        self.assertEqual([{'s': {'type': 'uri', 'value': 'x'}}], cache.get(key))
+        cache = SparqlQueryCache(ttl=0.05)
+        cache.put(key, [])
+        self.assertEqual([], cache.get(key))
+        time.sleep(0.1)
+        self.assertIsNone(cache.get(key))
+
+    def test_disk_cache(self):
+        endpoint = self.endpoint
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+        oi = self._impl(query_cache=SparqlQueryCache(directory=CACHE_DIR))
+        n = endpoint.request_count
+        self.assertEqual('vacuole', oi.get_label_by_curie(VACUOLE))
+        self.assertEqual(n + 1, endpoint.request_count)
+        # a fresh in-memory tier, as if in a new process
+        oi = self._impl(query_cache=SparqlQueryCache(directory=CACHE_DIR, ttl=60))
+        self.assertEqual('vacuole', oi.get_label_by_curie(VACUOLE))
+        self.assertEqual(n + 1, endpoint.request_count)
+        time.sleep(0.1)
+        oi = self._impl(query_cache=SparqlQueryCache(directory=CACHE_DIR, ttl=0.05))
+        self.assertEqual('vacuole', oi.get_label_by_curie(VACUOLE))
+        self.assertEqual(n + 2, endpoint.request_count)
+
+    def test_named_graphs(self):
+        endpoint = self.endpoint
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+        oi = self._impl(named_graph_cache=SparqlQueryCache(directory=CACHE_DIR, ttl=60))
+        n = endpoint.request_count
+        self.assertEqual([], oi.list_of_named_graphs())
+        self.assertEqual([], oi.list_of_named_graphs())
+        self.assertEqual(n + 1, endpoint.request_count)
+        # as if in a new process
+        oi = self._impl(named_graph_cache=SparqlQueryCache(directory=CACHE_DIR, ttl=60))
+        self.assertEqual([], oi.list_of_named_graphs())
+        self.assertEqual(n + 1, endpoint.request_count)
+        time.sleep(0.1)
+        oi = self._impl(named_graph_cache=SparqlQueryCache(directory=CACHE_DIR, ttl=0.05))
+        self.assertEqual([], oi.list_of_named_graphs())
+        self.assertEqual(n + 2, endpoint.request_count)
+
+    def test_uri_to_curie(self):
+        oi = self._impl()
+        self.assertEqual('GO:0005634', oi.uri_to_curie('http://purl.obolibrary.org/obo/GO_0005634'))
+        self.assertEqual('rdfs:label', oi.uri_to_curie('http://www.w3.org/2000/01/rdf-schema#label'))
+        self.assertEqual('oio:hasExactSynonym', oi.uri_to_curie('http://www.geneontology.org/formats/oboInOwl#hasExactSynonym'))
+        self.assertEqual('http://example.org/x', oi.uri_to_curie('http://example.org/x'))
+        oi = self._impl()
+        oi.get_prefix_map = lambda: {'ex': 'http://example.org/', 'exx': 'http://example.org/x/'}
+        self.assertEqual('exx:y', oi.uri_to_curie('http://example.org/x/y'))
+        self.assertEqual('ex:z', oi.uri_to_curie('http://example.org/z'))
+
+    def test_streaming(self):
+        oi = self._impl(query_cache=None)
+        query = 'SELECT ?s ?p ?o WHERE { ?s ?p ?o }'
+        bindings = oi.transport.query(query)['results']['bindings']
+        self.assertGreater(len(bindings), 1000)
+        self.assertEqual(bindings, list(oi.transport.iter_query(query)))
+        tsv_bindings = list(oi.transport.iter_query(query, results_format=SPARQL_RESULTS_TSV))
+        self.assertEqual(len(bindings), len(tsv_bindings))
+
+        def normalize(b):
+            # blank node labels are not preserved between serializations
+            return json.dumps({var: {'type': 'bnode'} if v['type'] == 'bnode' else v for var, v in b.items()},
+                              sort_keys=True)
+
+        self.assertEqual(sorted(map(normalize, bindings)), sorted(map(normalize, tsv_bindings)))
+        triples = list(oi.extract_triples([NUCLEUS]))
+        self.assertIn((NUCLEUS, LABEL_PREDICATE, 'nucleus'), triples)
+
+    def test_transport(self):
+        endpoint = self.endpoint
+        oi = self._impl(query_cache=None)
+        self.assertIs(SparqlHttpTransport.for_endpoint(endpoint.url), oi.transport)
+        n = endpoint.request_count
+        for curie in [VACUOLE, NUCLEUS, VACUOLE]:
+            oi.get_label_by_curie(curie)
+        self.assertEqual(['GET'] * 3, endpoint.requests[n:])
+        # connection is kept alive between queries
+        self.assertEqual(1, len(set(endpoint.client_ports[n:])))
+        self.assertIn('gzip', endpoint.headers[-1]['Accept-Encoding'])
+        # long queries are sent as POST
+        oi.transport = SparqlHttpTransport(endpoint.url, max_get_length=100)
+        self.assertEqual('vacuole', oi.get_label_by_curie(VACUOLE))
+        self.assertEqual('POST', endpoint.requests[-1])
+        labels = dict(oi.get_labels_for_curies([VACUOLE, NUCLEUS]))
+        self.assertEqual('nucleus', labels[NUCLEUS])
+
+    def test_async(self):
+        endpoint = self.endpoint
+        cache = SparqlQueryCache()
+        oi = self._impl(query_cache=cache)
+        curies = [VACUOLE, NUCLEUS, CELLULAR_COMPONENT, CYTOPLASM, 'GO:9999999']
+
+        async def lookup():
+            async with client_session() as session:
+                labels = await asyncio.gather(*[oi.aget_label_by_curie(curie) for curie in curies])
+                search_results = await oi.abasic_search('nucleus')
+                mappings = await oi.aget_sssom_mappings_by_curie(NUCLEUS)
+            self.assertTrue(session.closed)
+            return labels, search_results, mappings
+
+        n = endpoint.request_count
+        labels, search_results, mappings = asyncio.run(lookup())
+        self.assertEqual(['vacuole', 'nucleus', 'cellular_component', 'cytoplasm', None], labels)
+        self.assertEqual(len(curies) + 2, endpoint.request_count - n)
+        self.assertEqual([NUCLEUS], search_results)
+        self.assertEqual(list(oi.basic_search('nucleus')), search_results)
+        self.assertCountEqual([m.object_id for m in oi.get_sssom_mappings_by_curie(NUCLEUS)],
+                              [m.object_id for m in mappings])
+        self.assertGreater(len(mappings), 0)
+        # the cache is shared with the blocking methods
+        self.assertEqual(len(curies) + 2, endpoint.request_count - n)
+        self.assertEqual('vacuole', oi.get_label_by_curie(VACUOLE))
+        self.assertEqual(len(curies) + 2, endpoint.request_count - n)
+        self.assertEqual([], asyncio.run(oi.abasic_search(NUCLEUS, SearchConfiguration())))
+
+    def test_async_shared_session(self):
+        oi = self._impl(query_cache=None)
+        curies = [VACUOLE, NUCLEUS, CYTOPLASM]
+        sessions = []
+        new_client_session = async_http._new_client_session
+
+        def counting_client_session():
+            sessions.append(new_client_session())
+            return sessions[-1]
+
+        async def lookup():
+            return await asyncio.gather(*[oi.aget_label_by_curie(curie) for curie in curies])
+
+        async_http._new_client_session = counting_client_session
+        try:
+            self.assertEqual(['vacuole', 'nucleus', 'cytoplasm'], asyncio.run(lookup()))
+        finally:
+            async_http._new_client_session = new_client_session
+        # requests in flight together share one session, which is closed when they finish
+        self.assertEqual(1, len(sessions))
+        self.assertTrue(sessions[0].closed)
+
+    def test_subclass_closures(self):
+        # the generic closure follows rdfs:subClassOf, so subclasses that use their own
+        # relationships must override all of the closure methods
+        for cls in [UbergraphImplementation, WikidataImplementation]:
+            for method in ['ancestors', 'aancestors', 'descendants', 'ancestor_graph']:
+                self.assertIsNot(getattr(SparqlImplementation, method), getattr(cls, method),
+                                 f'{cls.__name__}.{method}')
+            # descendant graphs are built from descendants and their direct relationships instead
+            self.assertIsNot(SparqlImplementation.follows_subclass_axioms, cls.follows_subclass_axioms)
+
+        class DirectRelationshipsImplementation(SparqlImplementation):
+            @property
+            def follows_subclass_axioms(self) -> bool:
+                return False
+
+        def graph_tuples(g):
+            return sorted((n.id, n.lbl) for n in g.nodes), sorted((e.sub, e.pred, e.obj) for e in g.edges)
+
+        oi = self._impl(query_cache=None)
+        direct_oi = DirectRelationshipsImplementation(OntologyResource(url=self.endpoint.url), query_cache=None,
+                                                      named_graph_cache=None)
+        self.assertEqual(graph_tuples(oi.descendant_graph(CELLULAR_COMPONENT, [IS_A])),
+                         graph_tuples(direct_oi.descendant_graph(CELLULAR_COMPONENT, [IS_A])))
+
+    def test_async_session_closed(self):
+        oi = self._impl(query_cache=None)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            self.assertEqual('vacuole', asyncio.run(oi.aget_label_by_curie(VACUOLE)))
+            gc.collect()
+        self.assertEqual([], [str(w.message) for w in caught if 'Unclosed' in str(w.message)])
+
+    def test_closure(self):
+        endpoint = self.endpoint
+        oi = self._impl(query_cache=None)
+        pronto = ProntoImplementation(OntologyResource(slug='go-nucleus.obo', directory=INPUT_DIR, local=True))
+        n = endpoint.request_count
+        ancs = list(oi.ancestors(NUCLEAR_MEMBRANE, [IS_A, PART_OF]))
+        # one query for the whole closure
+        self.assertEqual(n + 1, endpoint.request_count)
+        self.assertEqual(NUCLEAR_MEMBRANE, ancs[0])
+        for curie in [NUCLEAR_ENVELOPE, NUCLEUS, INTRACELLULAR, CELLULAR_COMPONENT]:
+            self.assertIn(curie, ancs)
+        self.assertCountEqual(set(pronto.ancestors(NUCLEAR_MEMBRANE, [IS_A, PART_OF])) - {IS_A, PART_OF}, ancs)
+        is_a_ancs = list(oi.ancestors([NUCLEAR_MEMBRANE], [IS_A]))
+        self.assertIn(CELLULAR_COMPONENT, is_a_ancs)
+        self.assertNotIn(NUCLEUS, is_a_ancs)
+        self.assertCountEqual(set(pronto.ancestors(NUCLEAR_MEMBRANE, [IS_A])) - {IS_A}, is_a_ancs)
+        # restrictions over other predicates are not followed
+        part_of_ancs = list(oi.ancestors(NUCLEAR_MEMBRANE, [PART_OF]))
+        self.assertCountEqual(set(pronto.ancestors(NUCLEAR_MEMBRANE, [PART_OF])) - {PART_OF}, part_of_ancs)
+        self.assertNotIn(CELLULAR_COMPONENT, part_of_ancs)
+        self.assertGreater(len(list(oi.ancestors(NUCLEAR_MEMBRANE))), len(ancs))
+        descs = list(oi.descendants([NUCLEUS], [IS_A, PART_OF]))
+        self.assertCountEqual([NUCLEUS, NUCLEAR_ENVELOPE, NUCLEAR_MEMBRANE], descs)
+        self.assertIn(VACUOLE, list(oi.descendants(CELLULAR_COMPONENT, [IS_A])))
+        g = oi.ancestor_graph(NUCLEAR_MEMBRANE, [IS_A, PART_OF])
+        self.assertCountEqual(ancs, [node.id for node in g.nodes])
+        self.assertIn('nucleus', [node.lbl for node in g.nodes])
+        edges = [(e.sub, e.pred, e.obj) for e in g.edges]
+        self.assertIn((NUCLEAR_MEMBRANE, PART_OF, NUCLEAR_ENVELOPE), edges)
+        self.assertIn((NUCLEUS, IS_A, 'GO:0043231'), edges)
+        self.assertCountEqual(ancs, asyncio.run(oi.aancestors(NUCLEAR_MEMBRANE, [IS_A, PART_OF])))
+
+
+class TestSparqlResultParsers(unittest.TestCase):
+
+    def test_json(self):
+        body = ('{"head": {"vars": ["bindings", "v"]}, "results": { "bindings" : [ '
+                '{"v": {"type": "literal", "value": "caf\u00e9 ]"}}, '
+                '{"v": {"type": "literal", "value": "núcleo", "xml:lang": "pt"}},\n'
+                '{"bindings": {"type": "uri", "value": "http://x.org/bindings"}} ] } }').encode('utf-8')
+        expected = [{'v': {'type': 'literal', 'value': 'café ]'}},
+                    {'v': {'type': 'literal', 'value': 'núcleo', 'xml:lang': 'pt'}},
+                    {'bindings': {'type': 'uri', 'value': 'http://x.org/bindings'}}]
+        # bindings and multi-byte characters may be split between chunks
+        for size in [1, 2, 7, 64, len(body)]:
+            chunks = [body[i:i + size] for i in range(0, len(body), size)]
+            self.assertEqual(expected, list(iter_json_bindings(chunks)))
+        self.assertEqual([], list(iter_json_bindings(['{"results": {"bindings": []}}'])))
+        with self.assertRaises(ValueError):
+            list(iter_json_bindings([body[0:100]]))
+
+    def test_tsv(self):
+        body = ('?s\t?v\r\n'
+                '<http://x.org/a>\t"a \\"b\\"\\tc"@en\n'
+                '_:b1\t42\n'
+                '<http://x.org/c>\t\n'
+                '<http://x.org/d>\t"1.5"^^<http://www.w3.org/2001/XMLSchema#decimal>\n').encode('utf-8')
+        expected = [{'s': {'type': 'uri', 'value': 'http://x.org/a'},
+                     'v': {'type': 'literal', 'value': 'a "b"\tc', 'xml:lang': 'en'}},
+                    {'s': {'type': 'bnode', 'value': 'b1'},
+                     'v': {'type': 'literal', 'value': '42', 'datatype': 'http://www.w3.org/2001/XMLSchema#integer'}},
+                    {'s': {'type': 'uri', 'value': 'http://x.org/c'}},
+                    {'s': {'type': 'uri', 'value': 'http://x.org/d'},
+                     'v': {'type': 'literal', 'value': '1.5', 'datatype': 'http://www.w3.org/2001/XMLSchema#decimal'}}]
+        for size in [1, 5, len(body)]:
+            chunks = [body[i:i + size] for i in range(0, len(body), size)]
+            self.assertEqual(expected, list(iter_tsv_bindings(chunks)))
+        self.assertEqual({'type': 'literal', 'value': 'é'}, parse_tsv_term('"\\u00e9"'))
+
+
+class TestLocalSparqlImplementation(unittest.TestCase):
+    """
+    Tests the generic SPARQL implementation over a local file, with no endpoint
+    """
+
+    def setUp(self) -> None:
+        self.oi = SparqlImplementation(OntologyResource(slug='go-nucleus.owl', directory=INPUT_DIR, local=True))
+
+    def test_local_queries(self):
+        oi = self.oi
+        self.assertIsNone(oi.transport)
+        self.assertEqual('vacuole', oi.get_label_by_curie(VACUOLE))
+        self.assertEqual(dict(oi.get_labels_for_curies([VACUOLE, NUCLEUS])), {VACUOLE: 'vacuole', NUCLEUS: 'nucleus'})
+        self.assertIn('cellular component', oi.aliases_by_curie(CELLULAR_COMPONENT))
+        self.assertEqual([NUCLEUS], list(oi.basic_search('nucleus')))
+        self.assertIn(NUCLEUS, oi.ancestors(NUCLEAR_MEMBRANE, [IS_A, PART_OF]))
+        self.assertEqual('nucleus', asyncio.run(oi.aget_label_by_curie(NUCLEUS)))
+        self.assertEqual([], oi.list_of_named_graphs())
+
+    def test_graph_store(self):
+        shutil.rmtree(GRAPH_STORE_DIR, ignore_errors=True)
+        resource = OntologyResource(slug='go-nucleus.owl', directory=INPUT_DIR, local=True)
+        oi = SparqlImplementation(resource, graph_store_directory=GRAPH_STORE_DIR)
+        snapshots = list(GRAPH_STORE_DIR.iterdir())
+        self.assertEqual(1, len(snapshots))
+        # a second instance loads the saved graph
+        mtime = snapshots[0].stat().st_mtime_ns
+        oi2 = SparqlImplementation(resource, graph_store_directory=GRAPH_STORE_DIR)
+        self.assertEqual(len(self.oi.graph), len(oi2.graph))
+        self.assertEqual(mtime, snapshots[0].stat().st_mtime_ns)
+        self.assertEqual(oi.get_label_by_curie(VACUOLE), oi2.get_label_by_curie(VACUOLE))
+        # a changed file is parsed again
+        path = INPUT_DIR / 'go-nucleus.owl'
+        stat = path.stat()
+        try:
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+            SparqlImplementation(resource, graph_store_directory=GRAPH_STORE_DIR)
+            self.assertEqual(2, len(list(GRAPH_STORE_DIR.iterdir())))
+        finally:
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
@@ -55,6 +55,14 @@ class TestSqlDatabaseImplementation(unittest.TestCase):
         print(syns)
         assert 'cellular component' in syns
 
+    def test_bulk_lexical_maps(self):
+        oi = self.oi
+        curies = list(oi.all_entity_curies())
+        for curie, alias_map in oi.alias_map_for_curies(curies):
+            self.assertEqual(oi.alias_map_by_curie(curie), alias_map)
+        for curie, mapping_map in oi.get_simple_mappings_for_curies(curies):
+            self.assertEqual(oi.get_simple_mappings_by_curie(curie), mapping_map)
+
     # OboGraphs tests
     def test_obograph_node(self):
         n = self.oi.node(CELLULAR_COMPONENT)
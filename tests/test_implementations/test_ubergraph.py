@@ -1,22 +1,31 @@
+import asyncio
 import logging
+import time
 import unittest
 
+from oaklib.implementations.sparql.query_cache import SparqlQueryCache, NAMED_GRAPHS_TTL
 from oaklib.implementations.ubergraph.ubergraph_implementation import UbergraphImplementation
 from oaklib.datamodels.search import SearchConfiguration
 from oaklib.datamodels.vocabulary import IS_A, PART_OF
+from oaklib.resource import OntologyResource
+from rdflib import RDFS
 
 from tests import OUTPUT_DIR, INPUT_DIR, VACUOLE, DIGIT, CYTOPLASM, CELLULAR_COMPONENT, CELL, SHAPE, NEURON, \
     PHOTORECEPTOR_OUTER_SEGMENT, NUCLEUS, THYLAKOID, NUCLEAR_ENVELOPE, CELLULAR_ANATOMICAL_ENTITY
+from tests.test_implementations.local_sparql_endpoint import LocalSparqlEndpoint
 
 TEST_ONT = INPUT_DIR / 'go-nucleus.obo'
+TEST_OWL = INPUT_DIR / 'go-nucleus.owl'
 TEST_OUT = OUTPUT_DIR / 'go-nucleus.saved.owl'
+NAMED_GRAPH_CACHE_DIR = OUTPUT_DIR / 'named-graph-cache'
 
 ICMBO = 'GO:0043231'
 
 class TestUbergraphImplementation(unittest.TestCase):
 
     def setUp(self) -> None:
-        oi = UbergraphImplementation()
+        oi = UbergraphImplementation(named_graph_cache=SparqlQueryCache(directory=NAMED_GRAPH_CACHE_DIR,
+                                                                         ttl=NAMED_GRAPHS_TTL))
         self.oi = oi
 
     def test_relationships(self):
@@ -184,3 +193,103 @@ class TestUbergraphImplementation(unittest.TestCase):
         oi = self.oi
         for t in oi.extract_triples([SHAPE]):
             logging.info(t)
+
+
+class TestUbergraphLocalEndpoint(unittest.TestCase):
+    """
+    Tests query mechanics against a local stand-in for the ubergraph endpoint
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.endpoint = LocalSparqlEndpoint(TEST_OWL).__enter__()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.endpoint.__exit__()
+
+    def setUp(self) -> None:
+        self.endpoint.delay = None
+        self.oi = UbergraphImplementation(OntologyResource(url=self.endpoint.url), query_cache=None,
+                                          named_graph_cache=None)
+        self.subjects = sorted(self.oi.uri_to_curie(str(s)) for s in self.endpoint.graph.subjects(RDFS.label, None)
+                               if str(s).startswith('http://purl.obolibrary.org/obo/GO_'))
+
+    def test_chunked(self):
+        oi = self.oi
+        subjects = self.subjects[0:60]
+        expected = []
+        for i in range(0, len(subjects), 10):
+            expected += list(oi._from_subjects(subjects[i:i + 10], [RDFS.label], object_is_literal=True))
+        self.assertEqual(len(subjects), len(expected))
+        n = self.endpoint.request_count
+        oi.max_chunk_size = 10
+        rels = list(oi._from_subjects_chunked(subjects, [RDFS.label], object_is_literal=True))
+        self.assertEqual(expected, rels)
+        self.assertEqual(6, self.endpoint.request_count - n)
+        # chunks grow when responses are fast
+        oi.max_chunk_size = 500
+        n = self.endpoint.request_count
+        rels = list(oi._from_subjects_chunked(subjects, [RDFS.label], object_is_literal=True))
+        self.assertCountEqual(expected, rels)
+        self.assertLess(self.endpoint.request_count - n, 6)
+
+    def test_node(self):
+        oi = self.oi
+        n = oi.node(CELLULAR_COMPONENT)
+        self.assertEqual('cellular_component', n.lbl)
+        self.assertTrue(n.meta.definition.val.startswith('A location'))
+        self.assertIn('cellular component', [s.val for s in n.meta.synonyms])
+        self.assertIsNone(oi.node('GO:9999999').lbl)
+
+    def test_relationships_to_graph(self):
+        oi = self.oi
+        oi.values_chunk_size = 2
+        rels = [(VACUOLE, IS_A, ICMBO), (VACUOLE, PART_OF, CYTOPLASM), (NUCLEUS, IS_A, ICMBO)]
+        n = self.endpoint.request_count
+        g = oi.relationships_to_graph(rels)
+        self.assertEqual(3, len(g.edges))
+        # 6 nodes, including predicates
+        self.assertEqual(3, self.endpoint.request_count - n)
+        labels = {n.id: n.lbl for n in g.nodes}
+        self.assertEqual('vacuole', labels[VACUOLE])
+        self.assertEqual('cytoplasm', labels[CYTOPLASM])
+        self.assertTrue(labels[PART_OF].startswith('part'))
+        self.assertEqual(dict(oi.get_labels_for_curies(labels.keys())), labels)
+
+    def test_async_ancestors(self):
+        oi = self.oi
+        ancs = asyncio.run(oi.aancestors(VACUOLE, predicates=[IS_A]))
+        self.assertCountEqual(list(oi.ancestors(VACUOLE, predicates=[IS_A])), ancs)
+        self.assertIn(ICMBO, ancs)
+
+    def test_descendant_graph(self):
+        oi = self.oi
+        g = oi.descendant_graph(ICMBO, predicates=[IS_A])
+        labels = {n.id: n.lbl for n in g.nodes}
+        self.assertCountEqual([ICMBO] + list(oi.descendants([ICMBO], predicates=[IS_A])), labels)
+        self.assertEqual('vacuole', labels[VACUOLE])
+        self.assertEqual('nucleus', labels[NUCLEUS])
+
+    def test_chunk_size(self):
+        oi = self.oi
+        self.assertEqual(20, oi._next_chunk_size(10, 0.1, 10))
+        self.assertEqual(oi.max_chunk_size, oi._next_chunk_size(oi.max_chunk_size, 0.1, 10))
+        self.assertEqual(5, oi._next_chunk_size(10, oi.chunk_target_seconds + 1, 10))
+        self.assertEqual(5, oi._next_chunk_size(10, 0.1, oi.chunk_max_rows + 1))
+        self.assertEqual(1, oi._next_chunk_size(1, oi.chunk_target_seconds + 1, 10))
+
+    def test_concurrent_chunks(self):
+        oi = self.oi
+        oi.max_chunk_size = 10
+        subjects = self.subjects[0:80]
+        list(oi._from_subjects_chunked(subjects, [RDFS.label], object_is_literal=True))
+        self.endpoint.delay = 0.2
+        start = time.monotonic()
+        rels = list(oi._from_subjects_chunked(subjects, [RDFS.label], object_is_literal=True))
+        elapsed = time.monotonic() - start
+        # results are in chunk order
+        for i in range(0, len(subjects), 10):
+            self.assertCountEqual(subjects[i:i + 10], [r[0] for r in rels[i:i + 10]])
+        # 8 chunks at 0.2s each would take 1.6s in sequence
+        self.assertLess(elapsed, 1.2)
@@ -0,0 +1,51 @@
+import io
+import random
+import threading
+import time
+import unittest
+from typing import Iterator
+
+from oaklib.datamodels.text_annotator import TextAnnotation
+from oaklib.interfaces.text_annotator_interface import TextAnnotatorInterface
+from oaklib.utilities.batch_annotator import read_documents, annotate_documents
+
+
+class SlowAnnotator(TextAnnotatorInterface):
+    """
+    Annotates each text with itself, taking a random time, and records the maximum number of concurrent calls
+    """
+
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def annotate_text(self, text: str) -> Iterator[TextAnnotation]:
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.active, self.max_active)
+        time.sleep(random.random() * 0.01)
+        with self.lock:
+            self.active -= 1
+        return iter([TextAnnotation(object_id=text)])
+
+
+class TestBatchAnnotator(unittest.TestCase):
+
+    def test_read_documents(self):
+        lines = io.StringIO('{"pmid": 5, "abstract": "nucleus"}\n\n{"abstract": "cytoplasm"}\n')
+        self.assertEqual([('5', 'nucleus'), ('3', 'cytoplasm')],
+                         list(read_documents(lines, format='jsonl', id_field='pmid', text_field='abstract')))
+        lines = io.StringIO('nucleus\ncytoplasm\n')
+        self.assertEqual([('1', 'nucleus'), ('2', 'cytoplasm')], list(read_documents(lines)))
+
+    def test_bounded_concurrency(self):
+        oi = SlowAnnotator()
+        documents = [(str(i), f'text{i}') for i in range(50)]
+        results = list(annotate_documents(oi, iter(documents), concurrency=3))
+        # results are in document order, whatever order they finish in
+        self.assertEqual([doc_id for doc_id, _ in documents], [doc_id for doc_id, _ in results])
+        for doc_id, anns in results:
+            self.assertEqual(f'text{doc_id}', anns[0].object_id)
+            self.assertEqual(doc_id, anns[0].subject_text_id)
+        self.assertLessEqual(oi.max_active, 3)
@@ -1,12 +1,14 @@
+import itertools
 import json
 import logging
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 
 from linkml_runtime.loaders import yaml_loader
 from oaklib.implementations.pronto.pronto_implementation import ProntoImplementation
 from oaklib.resource import OntologyResource
 from oaklib.utilities.graph.relationship_walker import walk_up
-from oaklib.utilities.iterator_utils import chunk
+from oaklib.utilities.iterator_utils import chunk, ordered_map
 from oaklib.utilities.lexical.lexical_indexer import create_lexical_index, save_lexical_index, lexical_index_to_sssom, \
     add_labels_from_uris, load_mapping_rules
 from oaklib.utilities.obograph_utils import as_multi_digraph, graph_as_dict
@@ -31,3 +33,17 @@ class TestChunker(unittest.TestCase):
             assert l[0] == n*100
             n += 1
         assert n == 10
+
+    def test_ordered_map(self):
+        consumed = []
+
+        def items():
+            for i in itertools.count():
+                consumed.append(i)
+                yield i
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = list(itertools.islice(ordered_map(executor, lambda x: x * 2, items(), 4), 10))
+        self.assertEqual([i * 2 for i in range(10)], results)
+        # items are only taken from an unbounded stream as results are consumed
+        self.assertLessEqual(len(consumed), 10 + 4)
@@ -1,13 +1,36 @@
+import copy
+import csv
+import io
+import itertools
+import json
+import sys
 import unittest
+from array import array
 
+from oaklib.datamodels.vocabulary import SKOS_EXACT_MATCH, SKOS_CLOSE_MATCH, LABEL_PREDICATE
+from oaklib.datamodels.lexical_index import LexicalGrouping, RelationshipToTerm, LexicalTransformation, LexicalTransformationPipeline, TransformationType
 from oaklib.implementations.pronto.pronto_implementation import ProntoImplementation
 from oaklib.resource import OntologyResource
-from oaklib.utilities.lexical.lexical_indexer import create_lexical_index, save_lexical_index
+from oaklib.utilities.lexical.binary_lexical_index import is_binary_lexical_index, BinaryLexicalIndexReader, MAGIC, \
+    SECTIONS
+from oaklib.utilities.lexical.lexical_indexer import create_lexical_index, save_lexical_index, load_lexical_index, \
+    lexical_index_to_sssom, lexical_index_to_mappings, load_mapping_rules, inferred_mapping, MappingRuleEngine, \
+    inverse_logit, incremental_lexmatch, lexical_index_to_fuzzy_mappings
+from oaklib.utilities.lexical.ngram_index import similar_term_pairs, ngrams, jaccard_similarity
+from oaklib.utilities.mapping.sssom_utils import StreamingSssomWriter, LEXICAL_MAPPING_COLUMNS
+from oaklib.utilities.lexical.transformations import compile_pipeline, benchmark_pipelines
+from sssom import Mapping
+from sssom.sssom_datamodel import MatchTypeEnum
 
-from tests import OUTPUT_DIR, INPUT_DIR
+from tests import OUTPUT_DIR, INPUT_DIR, NUCLEUS
 
 TEST_ONT = INPUT_DIR / 'go-nucleus.obo'
 TEST_OUT = OUTPUT_DIR / 'go-nucleus.lexical.yaml'
+TEST_BINARY_OUT = OUTPUT_DIR / 'go-nucleus.lexindex'
+TEST_OTHER_OUT = OUTPUT_DIR / 'go-nucleus.index'
+TEST_SWAPPED_OUT = OUTPUT_DIR / 'go-nucleus.swapped.lexindex'
+TEST_RULES = INPUT_DIR / 'matcher_rules.yaml'
+TEST_SSSOM_OUT = OUTPUT_DIR / 'go-nucleus.lexmatch.sssom.tsv'
 
 
 class TestLexicalIndex(unittest.TestCase):
@@ -23,6 +46,188 @@ class TestLexicalIndex(unittest.TestCase):
         self.assertEqual(len(groupings.relationships), 2)
         self.assertCountEqual(['GO:0005938', 'GO:0071944'], [r.element for r in groupings.relationships])
 
+    def test_pipelines(self):
+        def pipeline(*types, params=None):
+            return LexicalTransformationPipeline(name='_'.join(types),
+                                                 transformations=[LexicalTransformation(t, params=params)
+                                                                  for t in types])
+        default = compile_pipeline(pipeline(TransformationType.CaseNormalization.text,
+                                            TransformationType.WhitespaceNormalization.text))
+        self.assertEqual('nuclear envelope', default(' Nuclear  Envelope'))
+        f = compile_pipeline(pipeline(TransformationType.Depluralization.text,
+                                      TransformationType.WordOrderNormalization.text))
+        self.assertEqual(f('nuclear bodies'), f('body nuclear'))
+        self.assertEqual('body nuclear', f('nuclear bodies'))
+        f = compile_pipeline(pipeline(TransformationType.Stemming.text))
+        self.assertEqual('gener membran', f('generalizations membranes'))
+        f = compile_pipeline(pipeline(TransformationType.TermExpanson.text,
+                                      params=json.dumps({'ER': 'endoplasmic reticulum'})))
+        self.assertEqual('endoplasmic reticulum membrane', f('ER membrane'))
+        self.assertEqual('ERK', f('ERK'))
+        with self.assertRaises(NotImplementedError):
+            compile_pipeline(pipeline(TransformationType.Lemmatization.text))
+        terms = [r.element_term for g in self.lexical_index.groupings.values() for r in g.relationships]
+        pipelines = [pipeline(t) for t in ['Stemming', 'Depluralization', 'WordOrderNormalization']]
+        results = benchmark_pipelines(terms, pipelines, min_seconds=0.01)
+        self.assertCountEqual([p.name for p in pipelines], results.keys())
+
+    def test_parallel(self):
+        ix = create_lexical_index(self.oi, processes=2, chunk_size=50)
+        self.assertEqual(self.lexical_index, ix)
+        self.assertEqual(list(self.lexical_index.groupings), list(ix.groupings))
+
+    def test_mappings(self):
+        msdf = lexical_index_to_sssom(self.oi, self.lexical_index)
+        with open(TEST_SSSOM_OUT, 'w') as stream:
+            writer = StreamingSssomWriter(stream, columns=LEXICAL_MAPPING_COLUMNS, mapping_set_id='default')
+            for m in lexical_index_to_mappings(self.oi, self.lexical_index):
+                writer.emit(m)
+            writer.close()
+        with open(TEST_SSSOM_OUT) as stream:
+            rows = list(csv.DictReader((line for line in stream if not line.startswith('#')), delimiter='\t'))
+        self.assertEqual(len(msdf.df), len(rows))
+        self.assertGreater(len(rows), 0)
+        self.assertEqual('skos:closeMatch', rows[0]['predicate_id'])
+        # 'cell periphery' is shared by two entities
+        mappings = list(lexical_index_to_mappings(self.oi, self.lexical_index, max_bucket_size=2))
+        self.assertIn(('GO:0005938', 'GO:0071944'), [(m.subject_id, m.object_id) for m in mappings])
+        self.assertEqual([], list(lexical_index_to_mappings(self.oi, self.lexical_index, max_bucket_size=1)))
+
+    def test_load_binary_foreign_byte_order(self):
+        save_lexical_index(self.lexical_index, TEST_BINARY_OUT)
+        # rewrite the file as if it had been saved on a machine with the other byte order
+        with open(TEST_BINARY_OUT, 'rb') as stream:
+            reader = BinaryLexicalIndexReader(stream.read())
+        header = dict(reader.header, byteorder='big' if sys.byteorder == 'little' else 'little')
+        header_bytes = json.dumps(header).encode('utf-8')
+        with open(TEST_SWAPPED_OUT, 'wb') as stream:
+            stream.write(MAGIC)
+            stream.write(len(header_bytes).to_bytes(8, 'little'))
+            stream.write(header_bytes)
+            stream.write(b'\0' * (-len(header_bytes) % 8))
+            for name, typecode in SECTIONS:
+                section = array(typecode, getattr(reader, name))
+                section.byteswap()
+                data = section.tobytes()
+                stream.write(data)
+                stream.write(b'\0' * (-len(data) % 8))
+        for mmap in [False, True]:
+            ix = load_lexical_index(TEST_SWAPPED_OUT, mmap=mmap)
+            self.assertEqual(self.lexical_index.groupings, dict(ix.groupings.items()))
+
+    def test_streaming_sssom_special_characters(self):
+        stream = io.StringIO()
+        writer = StreamingSssomWriter(stream, columns=LEXICAL_MAPPING_COLUMNS, mapping_set_id='default')
+        writer.emit(Mapping(subject_id='X:1', predicate_id=SKOS_EXACT_MATCH, object_id='Y:1',
+                            match_type=MatchTypeEnum.Lexical, subject_label='a\tb', object_label='c\nd\r\ne', match_string=['"x"', 'y']))
+        writer.close()
+        lines = [line for line in stream.getvalue().splitlines(keepends=True) if not line.startswith('#')]
+        rows = list(csv.DictReader(lines, delimiter='\t'))
+        self.assertEqual(1, len(rows))
+        self.assertEqual('a\tb', rows[0]['subject_label'])
+        self.assertEqual('c\nd\r\ne', rows[0]['object_label'])
+        self.assertEqual('"x"|y', rows[0]['match_string'])
+
+    def test_cross_source_mappings(self):
+        all_pairs = [(m.subject_id, m.object_id) for m in lexical_index_to_mappings(self.oi, self.lexical_index)]
+        mappings = list(lexical_index_to_mappings(self.oi, self.lexical_index, source_sets=[{'BFO'}, {'CHEBI'}]))
+        self.assertEqual([('BFO:0000023', 'CHEBI:50906')], [(m.subject_id, m.object_id) for m in mappings])
+        # subjects are taken from the first source
+        mappings = list(lexical_index_to_mappings(self.oi, self.lexical_index,
+                                                  source_sets=[{'NCBITaxon_Union'}, {'NCBITaxon', 'BFO'}]))
+        self.assertGreater(len(mappings), 0)
+        for m in mappings:
+            self.assertTrue(m.subject_id.startswith('NCBITaxon_Union:'))
+            self.assertIn((m.object_id, m.subject_id), all_pairs)
+        with self.assertRaises(ValueError):
+            list(lexical_index_to_mappings(self.oi, self.lexical_index, source_sets=[{'GO'}]))
+
+    def test_fuzzy_mappings(self):
+        terms = list(self.lexical_index.groupings.keys())
+        pairs = {(t1, t2) for t1, t2, _ in similar_term_pairs(terms, threshold=0.7)}
+        grams = {t: ngrams(t) for t in terms}
+        self.assertEqual({(t1, t2) for t1, t2 in itertools.combinations(sorted(terms), 2)
+                          if jaccard_similarity(grams[t1], grams[t2]) >= 0.7}, pairs)
+        self.assertEqual(1.0, jaccard_similarity(ngrams('nuclear-envelope'), ngrams('nuclear envelope')))
+        ix = copy.deepcopy(self.lexical_index)
+        ix.groupings['nucleous'] = LexicalGrouping(term='nucleous', relationships=[
+            RelationshipToTerm(predicate=LABEL_PREDICATE, element='X:1', element_term='Nucleous', pipeline='default')])
+        mappings = list(lexical_index_to_fuzzy_mappings(self.oi, ix, threshold=0.5))
+        m = [m for m in mappings if (m.subject_id, m.object_id) == (NUCLEUS, 'X:1')][0]
+        self.assertEqual(SKOS_CLOSE_MATCH, m.predicate_id)
+        self.assertEqual(['nucleus', 'Nucleous'], m.match_string)
+        self.assertEqual('nucleus', m.subject_label)
+        exact_pairs = {(m.subject_id, m.object_id) for m in lexical_index_to_mappings(self.oi, ix)}
+        for m in mappings:
+            self.assertLess(m.confidence, 0.5)
+            self.assertNotIn((m.subject_id, m.object_id), exact_pairs)
+        mappings = list(lexical_index_to_fuzzy_mappings(self.oi, ix, threshold=0.5, source_sets=[{'X'}, {'GO'}]))
+        self.assertEqual([('X:1', NUCLEUS)], [(m.subject_id, m.object_id) for m in mappings])
+
+    def test_mapping_rules(self):
+        ruleset = load_mapping_rules(str(TEST_RULES))
+        engine = MappingRuleEngine(ruleset)
+        self.assertEqual((False, SKOS_EXACT_MATCH, inverse_logit(2.0)),
+                         engine.outcome(LABEL_PREDICATE, LABEL_PREDICATE))
+        self.assertEqual((False, SKOS_CLOSE_MATCH, inverse_logit(0.0)),
+                         engine.outcome(LABEL_PREDICATE, 'oio:hasRelatedSynonym'))
+        self.assertEqual((False, SKOS_CLOSE_MATCH, None), MappingRuleEngine().outcome(LABEL_PREDICATE, LABEL_PREDICATE))
+        grouping = self.lexical_index.groupings['cell periphery']
+        r1, r2 = grouping.relationships
+        m = inferred_mapping(self.oi, grouping.term, r1, r2, ruleset=ruleset)
+        mappings = list(lexical_index_to_mappings(self.oi, self.lexical_index, ruleset=ruleset))
+        self.assertIn(m, mappings)
+        self.assertEqual('cell periphery', m.object_label)
+
+    def test_incremental(self):
+        def as_sets(ix):
+            return {term: {(r.predicate, r.element, r.element_term, tuple(r.pipeline)) for r in g.relationships}
+                    for term, g in ix.groupings.items()}
+        # simulate an index built before edits to the ontology
+        ix = copy.deepcopy(self.lexical_index)
+        for g in ix.groupings.values():
+            g.relationships = [r for r in g.relationships if r.element != 'GO:0005938']
+        for t in [t for t, g in ix.groupings.items() if not g.relationships]:
+            del ix.groupings[t]
+        ix.groupings['cell periphery'].relationships.append(
+            RelationshipToTerm(predicate='rdfs:label', element='X:1', element_term='cell periphery', pipeline='default'))
+        self.oi.set_label_for_curie(NUCLEUS, 'Cell periphery')
+        changes, added, removed = incremental_lexmatch(self.oi, ix)
+        self.assertEqual({'GO:0005938'}, changes.added)
+        self.assertEqual({'X:1'}, changes.removed)
+        self.assertEqual({NUCLEUS}, changes.changed)
+        self.assertEqual(as_sets(create_lexical_index(self.oi)), as_sets(ix))
+        added_pairs = {(m.subject_id, m.object_id) for m in added}
+        self.assertEqual({('GO:0005938', 'GO:0071944'), (NUCLEUS, 'GO:0071944'), (NUCLEUS, 'GO:0005938')},
+                         added_pairs)
+        self.assertEqual({('GO:0071944', 'X:1')}, {(m.subject_id, m.object_id) for m in removed})
+        changes, added, removed = incremental_lexmatch(self.oi, ix)
+        self.assertEqual(set(), changes.entities())
+        self.assertEqual(([], []), (added, removed))
+
     def test_save(self):
         save_lexical_index(self.lexical_index, TEST_OUT)
 
+    def test_save_binary(self):
+        save_lexical_index(self.lexical_index, TEST_BINARY_OUT)
+        self.assertTrue(is_binary_lexical_index(TEST_BINARY_OUT))
+        ix = load_lexical_index(TEST_BINARY_OUT)
+        self.assertEqual(self.lexical_index.pipelines, ix.pipelines)
+        self.assertEqual(self.lexical_index.groupings, ix.groupings)
+        # memory-mapped groupings are read on access
+        ix = load_lexical_index(TEST_BINARY_OUT, mmap=True)
+        self.assertEqual(len(self.lexical_index.groupings), len(ix.groupings))
+        self.assertIn('cell periphery', ix.groupings)
+        self.assertNotIn('not a term', ix.groupings)
+        self.assertEqual(self.lexical_index.groupings['cell periphery'], ix.groupings['cell periphery'])
+        self.assertEqual(self.lexical_index.groupings, dict(ix.groupings.items()))
+        # YAML remains available as an export
+        save_lexical_index(ix, TEST_OUT)
+        self.assertFalse(is_binary_lexical_index(TEST_OUT))
+        self.assertEqual(self.lexical_index.groupings, load_lexical_index(TEST_OUT).groupings)
+        # other suffixes default to YAML, unless the format is given
+        save_lexical_index(self.lexical_index, TEST_OTHER_OUT)
+        self.assertFalse(is_binary_lexical_index(TEST_OTHER_OUT))
+        save_lexical_index(self.lexical_index, TEST_OTHER_OUT, format='binary')
+        self.assertTrue(is_binary_lexical_index(TEST_OTHER_OUT))
+        self.assertEqual(self.lexical_index.groupings, load_lexical_index(TEST_OTHER_OUT).groupings)
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import time
+import unittest
+from email.utils import formatdate
+
+from oaklib.implementations.sparql.sparql_implementation import SparqlImplementation
+from oaklib.resource import OntologyResource
+from oaklib.utilities.rate_limiter import TokenBucket, configure_rate_limit, bucket_for, rate_limit_stats, \
+    retry_delay, BACKOFF_SECONDS, limited_request
+
+from tests import INPUT_DIR, VACUOLE, NUCLEUS
+from tests.test_implementations.local_sparql_endpoint import LocalSparqlEndpoint
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_burst(self):
+        bucket = TokenBucket(rate=20, capacity=5)
+        start = time.monotonic()
+        for _ in range(5):
+            bucket.acquire()
+        self.assertLess(time.monotonic() - start, 0.05)
+        self.assertEqual(0, bucket.throttled_calls)
+        for _ in range(4):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.18)
+        self.assertEqual(4, bucket.throttled_calls)
+        self.assertGreater(bucket.throttled_seconds, 0.0)
+
+    def test_threads_and_coroutines(self):
+        bucket = TokenBucket(rate=50, capacity=1)
+        start = time.monotonic()
+        threads = [threading.Thread(target=bucket.acquire) for _ in range(11)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # one token available immediately, the remaining 10 at 50 per second
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+        async def acquire_all():
+            await asyncio.gather(*[bucket.aacquire() for _ in range(10)])
+
+        start = time.monotonic()
+        asyncio.run(acquire_all())
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+        self.assertGreaterEqual(bucket.throttled_calls, 20)
+
+    def test_hosts(self):
+        a = configure_rate_limit('http://a.example.org/sparql', calls=1, period=60)
+        self.assertIs(a, bucket_for('http://a.example.org/other'))
+        self.assertIsNot(a, bucket_for('http://b.example.org/sparql'))
+        a.acquire()
+        start = time.monotonic()
+        bucket_for('http://b.example.org/sparql').acquire()
+        self.assertLess(time.monotonic() - start, 0.05)
+        self.assertIn('a.example.org', rate_limit_stats())
+
+    def test_retry_delay(self):
+        self.assertEqual(2.0, retry_delay({'Retry-After': '2'}, 0))
+        self.assertEqual(BACKOFF_SECONDS * 4, retry_delay({}, 2))
+        self.assertEqual(BACKOFF_SECONDS, retry_delay({'Retry-After': 'soon'}, 0))
+        delay = retry_delay({'Retry-After': formatdate(time.time() + 30, usegmt=True)}, 0)
+        self.assertGreater(delay, 25)
+        self.assertLessEqual(delay, 30)
+
+    def test_retried_responses_closed(self):
+        class Response:
+            def __init__(self, status_code: int):
+                self.status_code = status_code
+                self.headers = {'Retry-After': '0'}
+                self.closed = False
+
+            def close(self):
+                self.closed = True
+
+        class Session:
+            def __init__(self):
+                self.responses = []
+
+            def request(self, method, url, **kwargs):
+                self.responses.append(Response(429 if not self.responses else 200))
+                return self.responses[-1]
+
+        session = Session()
+        response = limited_request('GET', 'http://retry.example.org/sparql', session=session, stream=True)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([True, False], [r.closed for r in session.responses])
+
+    def test_too_many_requests(self):
+        with LocalSparqlEndpoint(INPUT_DIR / 'go-nucleus.owl') as endpoint:
+            oi = SparqlImplementation(OntologyResource(url=endpoint.url), query_cache=None)
+            bucket = bucket_for(endpoint.url)
+            endpoint.refusals = 2
+            start = time.monotonic()
+            self.assertEqual('vacuole', oi.get_label_by_curie(VACUOLE))
+            self.assertGreaterEqual(time.monotonic() - start, 2 * endpoint.retry_after)
+            self.assertEqual(3, endpoint.request_count)
+            self.assertEqual(2, bucket.retries)
+
+            endpoint.refusals = 1
+            self.assertEqual('nucleus', asyncio.run(oi.aget_label_by_curie(NUCLEUS)))
+            self.assertEqual(5, endpoint.request_count)
+            self.assertEqual(3, bucket.retries)